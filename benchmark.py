@@ -0,0 +1,333 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import cv2
+import numpy as np
+import PIL
+
+# === CONFIGURATION ===
+SAMPLE_TEXT_FILES = ["khmer_cleaned.txt", "kh_data_cleaned.txt"]  # Bundled sample words
+SAMPLE_WORDS = 20000     # Sample words are repeated up to this many
+REPEATS = 3              # Timed runs per case (after one warm-up run)
+LABEL_REPEATS = 20       # Timed runs per label/encoding case
+E2E_IMAGES_PER_FONT = 2  # Plan size of the end-to-end run
+TOLERANCE = 0.10         # Allowed pages/sec drop against the baseline
+OUTPUT_FILE = "benchmark_results.json"
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def get_peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size so far, in MB"""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+def load_sample_words(count):
+    """Read the bundled sample text files and repeat them to count words"""
+    words = []
+    for text_file in SAMPLE_TEXT_FILES:
+        with open(os.path.join(REPO_DIR, text_file), "r", encoding="utf-8") as f:
+            words.extend(line.strip() for line in f if line.strip())
+    
+    if not words:
+        raise Exception("No sample words found")
+    return (words * (count // len(words) + 1))[:count]
+
+def time_case(func, repeats):
+    """
+    Run func once to warm up, then time it repeats times
+    Returns:
+        tuple: (median seconds per run, result of the last run)
+    """
+    result = func()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), result
+
+def make_entry(seconds, pages, words, **extra):
+    """Benchmark result entry with throughput figures"""
+    return {
+        'seconds': round(seconds, 6),
+        'pages': pages,
+        'words': words,
+        'pages_per_sec': round(pages / seconds, 3) if seconds else None,
+        'words_per_sec': round(words / seconds, 1) if seconds else None,
+        'peak_rss_mb': get_peak_rss_mb(),
+        **extra
+    }
+
+def sum_entries(entries):
+    """Combine case entries into one stage entry"""
+    seconds = sum(entry['seconds'] for entry in entries)
+    pages = sum(entry['pages'] for entry in entries)
+    words = sum(entry['words'] for entry in entries)
+    return make_entry(seconds, pages, words, cases=len(entries))
+
+def bench_generate_image(image_generator, fonts, words, repeats):
+    """Time generate_image per font, page size and min/max font size"""
+    from process.config import PAGE_SIZES, FONT_SIZE_MIN, FONT_SIZE_MAX, RANDOM_SEED
+    
+    cases = {}
+    for font_path in fonts:
+        font_name = os.path.splitext(os.path.basename(font_path))[0]
+        for page_size in PAGE_SIZES:
+            for font_size in (FONT_SIZE_MIN, FONT_SIZE_MAX):
+                def run():
+                    # Same margins on every run
+                    rng = random.Random(RANDOM_SEED)
+                    return image_generator.generate_image(words, font_path, font_size, rng, tuple(page_size))
+                
+                seconds, (_, _, words_used, _, _) = time_case(run, repeats)
+                name = f"generate_image/{font_name}/{page_size[0]}x{page_size[1]}/{font_size}px"
+                cases[name] = make_entry(seconds, 1, words_used)
+                print(f"  {name:60s} {seconds * 1000:8.1f} ms  {words_used:4d} words")
+    return cases
+
+def bench_labels(word_boxes, image_name, width, height, repeats):
+    """Time the YOLO and XML formatters on one page"""
+    from process.yolo_format import YoloFormatter
+    from process.xml_format import XmlFormatter
+    
+    yolo_formatter = YoloFormatter()
+    xml_formatter = XmlFormatter()
+    filename = os.path.splitext(image_name)[0]
+    
+    cases = {}
+    seconds, _ = time_case(lambda: yolo_formatter.generate_yolo_label(word_boxes, filename, width, height), repeats)
+    cases['yolo'] = make_entry(seconds, 1, len(word_boxes), word_box_bytes=word_boxes.nbytes())
+    seconds, _ = time_case(lambda: xml_formatter.generate_xml_label(word_boxes, image_name, filename, width, height), repeats)
+    cases['xml'] = make_entry(seconds, 1, len(word_boxes))
+    
+    # The ElementTree reference must produce the same bytes as the streaming formatter
+    seconds, data = time_case(lambda: xml_formatter.format_xml_label_etree(word_boxes, image_name, width, height), repeats)
+    if data != xml_formatter.format_xml_label(word_boxes, image_name, width, height):
+        raise Exception("Streaming XML label differs from the ElementTree reference")
+    cases['xml_etree'] = make_entry(seconds, 1, len(word_boxes))
+    
+    for name, entry in cases.items():
+        print(f"  {name:60s} {entry['seconds'] * 1000:8.1f} ms")
+    return cases
+
+def bench_encoding(font_manager, metrics_cache, font_path, words, repeats):
+    """Time the image encoder for every output format and color mode"""
+    from process.config import PAGE_SIZES, FONT_SIZE_MIN, RANDOM_SEED, OUTPUT_IMAGE_DIR
+    from process.image_processing import ImageGenerator
+    from process.image_output import ImageEncoder
+    
+    settings = [("png", "RGB"), ("webp", "RGB"), ("jpg", "RGB"), ("png", "L"), ("png", "1")]
+    cases = {}
+    for image_format, color_mode in settings:
+        image_generator = ImageGenerator(font_manager, metrics_cache, color_mode=color_mode)
+        rng = random.Random(RANDOM_SEED)
+        img_cv, word_boxes, _, _, _ = image_generator.generate_image(
+            words, font_path, FONT_SIZE_MIN, rng, tuple(PAGE_SIZES[0])
+        )
+        
+        encoder = ImageEncoder(image_format, color_mode)
+        image_path = os.path.join(OUTPUT_IMAGE_DIR, f"bench_{color_mode}{encoder.extension}")
+        seconds, data = time_case(lambda: encoder.write(image_path, img_cv), repeats)
+        
+        name = f"encode/{image_format}/{color_mode}"
+        cases[name] = make_entry(seconds, 1, len(word_boxes), bytes=len(data))
+        print(f"  {name:60s} {seconds * 1000:8.1f} ms  {len(data) / 1024:8.1f} KB")
+    return cases
+
+def bench_end_to_end(text_file, images_per_font, num_workers):
+    """
+    Time main() on a small generation plan
+    The per-stage times come from the stats file main() writes; they are
+    summed over all processes and writer threads, so they show where the
+    time goes rather than adding up to the wall time.
+    """
+    import main as generator
+    from process.config import MANIFEST_FILE, STATS_FILE
+    from process.manifest import GenerationManifest
+    
+    generator.TEXT_FILE = text_file
+    generator.IMAGES_PER_FONT = images_per_font
+    generator.NUM_WORKERS = num_workers
+    
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        generator.main()
+    seconds = time.perf_counter() - start
+    
+    _, records = GenerationManifest(MANIFEST_FILE).load()
+    words = sum(record['word_count'] for record in records.values())
+    entry = make_entry(
+        seconds, len(records), words,
+        workers=num_workers,
+        children_peak_rss_mb=get_peak_rss_mb(resource.RUSAGE_CHILDREN)
+    )
+    print(f"  {'end_to_end':60s} {seconds:8.2f} s   {len(records)} pages, {words} words")
+    
+    stages = {}
+    if os.path.exists(STATS_FILE):
+        with open(STATS_FILE, "r", encoding="utf-8") as f:
+            stages = json.load(f).get('stages', {})
+    entry['stages'] = stages
+    total = sum(stage['seconds'] for stage in stages.values())
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]['seconds']):
+        print(f"    {name:58s} {stage['seconds']:8.2f} s   {stage['seconds'] / max(total, 1e-9) * 100:5.1f}%  "
+              f"{stage['mean_ms']:8.2f} ms x {stage['calls']}")
+    return entry
+
+def run_benchmarks(repeats, num_fonts, images_per_font, num_workers, skip_end_to_end):
+    """
+    Run the benchmark suite in a scratch directory
+    Everything is written below a temporary directory that links the bundled
+    fonts, so the repository's own outputs, caches and manifest are untouched.
+    Returns:
+        dict: {'meta', 'stages', 'cases', 'peak_rss_mb'}
+    """
+    work_dir = tempfile.mkdtemp(prefix="khmer_bench_")
+    cwd = os.getcwd()
+    try:
+        os.symlink(os.path.join(REPO_DIR, "fonts"), os.path.join(work_dir, "fonts"))
+        os.chdir(work_dir)
+        
+        # Output directories are created relative to the scratch directory
+        from process.config import FONT_SIZE_MIN, FONT_SIZE_MAX, MAX_WORDS_PER_IMAGE, RENDER_ENGINE
+        from process.config import METRICS_CACHE_SIZE, METRICS_CACHE_DIR
+        from process.random_fonts import FontManager
+        from process.metrics_cache import WordMetricsCache
+        from process.image_processing import ImageGenerator
+        
+        words = load_sample_words(SAMPLE_WORDS)
+        text_file = os.path.join(work_dir, "sample_words.txt")
+        with open(text_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(words) + "\n")
+        
+        font_manager = FontManager(verbose=False)
+        fonts = font_manager.get_all_fonts()
+        if not fonts:
+            raise Exception("No fonts found in fonts/")
+        if num_fonts:
+            fonts = fonts[:num_fonts]
+        font_manager.warm_up(fonts, range(FONT_SIZE_MIN, FONT_SIZE_MAX + 1))
+        
+        metrics_cache = WordMetricsCache(METRICS_CACHE_SIZE, METRICS_CACHE_DIR)
+        image_generator = ImageGenerator(font_manager, metrics_cache)
+        page_words = words[:MAX_WORDS_PER_IMAGE]
+        
+        print(f"Benchmarking {len(fonts)} font(s), {repeats} run(s) per case, engine: {RENDER_ENGINE}")
+        cases = bench_generate_image(image_generator, fonts, page_words, repeats)
+        stages = {'generate_image': sum_entries(list(cases.values()))}
+        
+        _, word_boxes, _, width, height = image_generator.generate_image(
+            page_words, fonts[0], FONT_SIZE_MIN, random.Random(0)
+        )
+        label_cases = bench_labels(word_boxes, "bench.png", width, height, LABEL_REPEATS)
+        stages.update(label_cases)
+        
+        encode_cases = bench_encoding(font_manager, metrics_cache, fonts[0], page_words, LABEL_REPEATS)
+        cases.update(encode_cases)
+        stages['encode'] = sum_entries(list(encode_cases.values()))
+        
+        if not skip_end_to_end:
+            stages['end_to_end'] = bench_end_to_end(text_file, images_per_font, num_workers)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    meta = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'opencv': cv2.__version__,
+        'render_engine': RENDER_ENGINE,
+        'fonts': len(fonts),
+        'repeats': repeats
+    }
+    return {'meta': meta, 'stages': stages, 'cases': cases, 'peak_rss_mb': get_peak_rss_mb()}
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compare pages/sec against a baseline
+    Stages gate the comparison; single cases are noisier and only reported.
+    Returns:
+        list: Names of stages slower than the baseline by more than tolerance
+    """
+    regressions = []
+    print(f"\nComparison with baseline from {baseline['meta'].get('timestamp', 'unknown')}:")
+    for section in ('stages', 'cases'):
+        for name, entry in results[section].items():
+            base_entry = baseline.get(section, {}).get(name)
+            if not base_entry or not base_entry['pages_per_sec'] or not entry['pages_per_sec']:
+                continue
+            
+            ratio = entry['pages_per_sec'] / base_entry['pages_per_sec']
+            slower = ratio < 1 - tolerance
+            if section == 'stages':
+                status = "REGRESSION" if slower else "ok"
+                if slower:
+                    regressions.append(name)
+            elif slower:
+                status = "slower"
+            else:
+                continue
+            print(f"  {name:60s} {base_entry['pages_per_sec']:9.2f} -> "
+                  f"{entry['pages_per_sec']:9.2f} pages/sec ({ratio:5.2f}x) {status}")
+    return regressions
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the Khmer text image generation pipeline")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help=f"JSON results file (default: {OUTPUT_FILE})")
+    parser.add_argument("--baseline",
+                        help="baseline JSON to compare against; exits with 1 on a regression")
+    parser.add_argument("--save-baseline",
+                        help="also save the results as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"allowed pages/sec drop against the baseline (default: {TOLERANCE})")
+    parser.add_argument("--repeats", type=int, default=REPEATS,
+                        help=f"timed runs per generate_image case (default: {REPEATS})")
+    parser.add_argument("--fonts", type=int, default=0,
+                        help="benchmark generate_image on the first N fonts only (default: all)")
+    parser.add_argument("--images-per-font", type=int, default=E2E_IMAGES_PER_FONT,
+                        help=f"images per font of the end-to-end run (default: {E2E_IMAGES_PER_FONT})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes of the end-to-end run (default: 1)")
+    parser.add_argument("--skip-end-to-end", action="store_true",
+                        help="skip the end-to-end main() run")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_benchmarks(args.repeats, args.fonts, args.images_per_font, args.workers, args.skip_end_to_end)
+    
+    print(f"\nStages:")
+    for name, entry in results['stages'].items():
+        print(f"  {name:20s} {entry['pages_per_sec']:9.2f} pages/sec  {entry['words_per_sec']:10.1f} words/sec")
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+    
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {path}")
+    
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
@@ -0,0 +1,187 @@
+import os
+import time
+import hashlib
+import argparse
+from collections import Counter, deque
+from multiprocessing import Pool
+from khmernltk import word_tokenize
+from khmer_segmentstion import clean_tokens, find_input_files
+from process.config import TEXT_FILE
+
+# === CONFIGURATION ===
+INPUT_DIR = "kh_data_100"                # News dumps (*_orig.txt)
+WORD_FREQ_FILE = "word_frequencies.tsv"  # word<TAB>count, most frequent first
+NUM_WORKERS = os.cpu_count() or 1        # Tokeniser processes (1 = serial, no pool)
+CHUNK_MB = 4                             # Text per tokeniser task, in whole paragraphs
+DEDUPE = True                            # Drop paragraphs already seen in an earlier file or line
+
+def read_paragraphs(input_paths, dedupe, stats):
+    """
+    Yield the paragraphs (lines) of the input files in order
+    Blank lines are skipped; with dedupe, a paragraph whose stripped text
+    was already seen is skipped too. Only a 16-byte digest per paragraph is
+    kept, not the text.
+    Args:
+        input_paths: Input files, in corpus order
+        dedupe: Skip repeated paragraphs
+        stats: Dict receiving 'paragraphs', 'duplicates' and 'bytes'
+    """
+    seen = set()
+    for input_path in input_paths:
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line in f:
+                stats['bytes'] += len(line.encode("utf-8"))
+                text = line.strip()
+                if not text:
+                    continue
+                if dedupe:
+                    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+                    if digest in seen:
+                        stats['duplicates'] += 1
+                        continue
+                    seen.add(digest)
+                stats['paragraphs'] += 1
+                yield line if line.endswith("\n") else line + "\n"
+
+def read_chunks(paragraphs, chunk_bytes):
+    """Group paragraphs into chunks of about chunk_bytes characters"""
+    lines = []
+    size = 0
+    for line in paragraphs:
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield "".join(lines)
+
+def tokenize_chunk(text):
+    """
+    Tokenise and clean one chunk (pool task)
+    Returns:
+        tuple: (cleaned tokens joined line by line, Counter of the tokens)
+    """
+    tokens = clean_tokens(word_tokenize(text))
+    return "\n".join(tokens), Counter(tokens)
+
+def write_frequencies(counts, path):
+    """Write word counts as word<TAB>count lines, most frequent first"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("word\tcount\n")
+        for word, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            f.write(f"{word}\t{count}\n")
+    os.replace(tmp_path, path)
+
+def main(input_dir=INPUT_DIR, output_file=TEXT_FILE, freq_file=WORD_FREQ_FILE,
+         workers=NUM_WORKERS, chunk_mb=CHUNK_MB, dedupe=DEDUPE):
+    """
+    Build the generator's word file from the news dumps in one pass
+    Replaces khmer_segmentstion.py followed by clean_data.py: every paragraph
+    is tokenised once, cleaned with the same rules, and the tokens are
+    streamed straight into output_file (one word per line, the format
+    process.config.TEXT_FILE expects), with word frequencies counted on the
+    way. No intermediate combined file is written. Chunks are tokenised
+    across a process pool but written in input order, so the output does not
+    depend on the number of workers; at most two chunks per worker are in
+    flight, which bounds memory.
+    Args:
+        input_dir: Directory of *_orig.txt files (read in sorted order)
+        output_file: Word file to write
+        freq_file: Word frequency table to write
+        workers: Number of tokeniser processes (1 = serial)
+        chunk_mb: Text per tokeniser task in MB
+        dedupe: Drop repeated paragraphs
+    """
+    print("=" * 70)
+    print("CORPUS BUILD")
+    print("=" * 70)
+    
+    input_paths = [os.path.join(input_dir, filename) for filename in find_input_files(input_dir)]
+    total_bytes = sum(os.path.getsize(path) for path in input_paths)
+    print(f"Input: {len(input_paths)} files ({total_bytes / 1024 / 1024:.1f} MB) from {input_dir}, "
+          f"{workers} worker(s), dedupe {'on' if dedupe else 'off'}")
+    
+    stats = {'paragraphs': 0, 'duplicates': 0, 'bytes': 0}
+    chunks = read_chunks(read_paragraphs(input_paths, dedupe, stats), int(chunk_mb * 1024 * 1024))
+    
+    counts = Counter()
+    num_tokens = 0
+    start_time = time.perf_counter()
+    last_report = start_time
+    tmp_file = f"{output_file}.tmp"
+    
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as out:
+            in_flight = deque()
+            while True:
+                # Keep the pool fed without reading the whole input ahead
+                while pool and len(in_flight) < workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    in_flight.append(pool.apply_async(tokenize_chunk, (chunk,)))
+                
+                if pool:
+                    if not in_flight:
+                        break
+                    cleaned_text, chunk_counts = in_flight.popleft().get()
+                else:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    cleaned_text, chunk_counts = tokenize_chunk(chunk)
+                
+                if cleaned_text:
+                    if num_tokens:
+                        out.write("\n")
+                    out.write(cleaned_text)
+                    num_tokens += sum(chunk_counts.values())
+                counts.update(chunk_counts)
+                
+                now = time.perf_counter()
+                if now - last_report >= 10:
+                    last_report = now
+                    done_mb = stats['bytes'] / 1024 / 1024
+                    print(f"  read {done_mb:.1f}/{total_bytes / 1024 / 1024:.1f} MB, {num_tokens} tokens, "
+                          f"{len(counts)} unique words ({done_mb / (now - start_time):.2f} MB/s)")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    
+    os.replace(tmp_file, output_file)
+    write_frequencies(counts, freq_file)
+    
+    elapsed = time.perf_counter() - start_time
+    print(f"\nParagraphs: {stats['paragraphs']} kept, {stats['duplicates']} duplicates dropped")
+    print(f"Tokens: {num_tokens}, unique words: {len(counts)}")
+    for word, count in counts.most_common(10):
+        print(f"  {word}\t{count}")
+    print(f"Built in {elapsed:.1f}s ({total_bytes / 1024 / 1024 / max(elapsed, 1e-9):.2f} MB/s)")
+    print(f"Words saved to {output_file}, frequencies to {freq_file}")
+    print("=" * 70)
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Tokenise the news dumps once into the generator's word file")
+    parser.add_argument("--input-dir", default=INPUT_DIR,
+                        help=f"directory of *_orig.txt files (default: {INPUT_DIR})")
+    parser.add_argument("--output", default=TEXT_FILE,
+                        help=f"word file to write (default: {TEXT_FILE})")
+    parser.add_argument("--freq-file", default=WORD_FREQ_FILE,
+                        help=f"word frequency table (default: {WORD_FREQ_FILE})")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS,
+                        help=f"tokeniser processes, 1 = serial (default: {NUM_WORKERS})")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB,
+                        help=f"text per tokeniser task (default: {CHUNK_MB})")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="keep repeated paragraphs")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.input_dir, args.output, args.freq_file, max(1, args.workers), args.chunk_mb, not args.no_dedupe)
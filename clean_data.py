@@ -1,32 +1,93 @@
-import re
+import os
+import argparse
 from khmernltk import word_tokenize
+from khmer_segmentstion import clean_tokens
 
+# === CONFIGURATION ===
 input_file = "combine_clean.txt"
 output_file = "combine_cleaned.txt"
 
-# Step 1: Read text
-with open(input_file, "r", encoding="utf-8") as f:
-    text = f.read()
+CHUNK_MB = 0  # Text tokenised per step (0 = whole file at once); chunks cut the
+              # tokeniser context, so the output can change
 
-# Step 2: Tokenize
-tokens = word_tokenize(text)
+def read_chunks(path, chunk_bytes):
+    """
+    Yield the text of a file in chunks of whole lines
+    Args:
+        path: Text file to read
+        chunk_bytes: Approximate chunk size (0 = the whole file as one chunk)
+    Yields:
+        tuple: (chunk text, its size in bytes)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if chunk_bytes <= 0:
+            text = f.read()
+            yield text, len(text.encode("utf-8"))
+            return
 
-clean_tokens = []
-for t in tokens:
+        lines = []
+        size = 0
+        for line in f:
+            lines.append(line)
+            size += len(line.encode("utf-8"))
+            if size >= chunk_bytes:
+                yield "".join(lines), size
+                lines = []
+                size = 0
+        if lines:
+            yield "".join(lines), size
 
-    # Strip leading/trailing spaces
-    t = t.strip()
-    t = re.sub(r"\.+", "", t)
-    t = t.replace("…", "")  # remove unicode ellipsis
+def main(input_path=input_file, output_path=output_file, chunk_mb=CHUNK_MB):
+    """
+    Re-tokenise and clean a token file into one cleaned token per line
+    By default the whole file is tokenised at once. With chunk_mb > 0 the
+    file is streamed in chunks of whole lines, each tokenised, cleaned and
+    appended before the next one is read, so memory does not grow with the
+    input; the tokeniser then loses the context across chunk boundaries, so
+    the output can differ from whole-file tokenisation.
+    Args:
+        input_path: Input text file
+        output_path: Output file, one token per line
+        chunk_mb: Chunk size in MB (0 = whole file)
+    """
+    total_bytes = os.path.getsize(input_path)
+    chunk_bytes = int(chunk_mb * 1024 * 1024)
+    if chunk_bytes > 0:
+        print(f"Warning: tokenising in {chunk_mb:g} MB chunks; "
+              f"words at chunk boundaries can differ from whole-file tokenisation")
 
-    # Remove if empty after cleaning
-    if t == "":
-        continue
+    num_tokens = 0
+    read_bytes = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        for chunk, size in read_chunks(input_path, chunk_bytes):
+            # Step 1: Tokenize and clean the chunk
+            tokens = clean_tokens(word_tokenize(chunk))
 
-    clean_tokens.append(t)
+            # Step 2: Append to the output, one token per line
+            if tokens:
+                if num_tokens:
+                    out.write("\n")
+                out.write("\n".join(tokens))
+                num_tokens += len(tokens)
 
-# Step 3: Save clean output
-with open(output_file, "w", encoding="utf-8") as f:
-    f.write("\n".join(clean_tokens))
+            read_bytes += size
+            if chunk_bytes > 0:
+                print(f"  {read_bytes / 1024 / 1024:.1f}/{total_bytes / 1024 / 1024:.1f} MB, {num_tokens} tokens")
 
-print("Cleaned text saved to", output_file)
+    print("Cleaned text saved to", output_path)
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Re-tokenise and clean the combined token file")
+    parser.add_argument("--input", default=input_file,
+                        help=f"input text file (default: {input_file})")
+    parser.add_argument("--output", default=output_file,
+                        help=f"output token file (default: {output_file})")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB,
+                        help=f"text tokenised per step, 0 = whole file; chunking can change the output "
+                             f"(default: {CHUNK_MB})")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.input, args.output, args.chunk_mb)
@@ -1,7 +1,19 @@
 import os
+import json
+import errno
 import shutil
 import random
+import hashlib
+import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dataset_index import build_index, INDEX_FILE, VALIDATE_WORKERS
+from process.manifest import GenerationManifest
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, copies are used instead
+    fcntl = None
 
 # === CONFIGURATION ===
 SOURCE_IMAGE_DIR = "images"
@@ -15,6 +27,34 @@ TEST_RATIO = 0.1   # 10%
 
 RANDOM_SEED = 42  # For reproducibility
 
+# How images are assigned to splits:
+#   "shuffle" - shuffle all files with RANDOM_SEED (original behaviour; adding
+#               images reshuffles everything)
+#   "hash"    - by a hash of each image's content (the SHA-256 recorded by
+#               dataset_index.py), so existing images never move and new
+#               images only add files, even when a new run reuses the names
+SPLIT_METHOD = "shuffle"
+STRATIFY = False  # With "hash": balance the ratios per font and page size
+MANIFEST_FILE = "generation_manifest.jsonl"  # Font/page size of each image (main.py)
+ASSIGNMENTS_FILE = "split_assignments.json"  # Split and stratum of every image, kept in OUTPUT_DIR
+
+# How split files are materialised:
+#   "copy"     - full copies (original behaviour)
+#   "hardlink" - hard links, no extra disk space (same filesystem only)
+#   "symlink"  - symbolic links to the source files
+#   "reflink"  - copy-on-write clones (Btrfs, XFS, ...)
+#   "list"     - no files at all: train.txt/val.txt/test.txt image lists
+#                referenced from data.yaml
+# Links that cannot be created fall back to copying.
+SPLIT_MODE = "copy"
+COPY_WORKERS = 8  # Threads copying/linking files in parallel
+
+# Leave out images whose files fail validation (see dataset_index.py);
+# by default they are kept, like before the index existed, and only reported
+SKIP_INVALID = False
+
+FICLONE = 0x40049409  # Linux ioctl cloning a whole file (reflink)
+
 def create_directory_structure(output_dir):
     """Create train/val/test directory structure"""
     splits = ['train', 'val', 'test']
@@ -26,16 +66,20 @@ def create_directory_structure(output_dir):
             os.makedirs(path, exist_ok=True)
             print(f"Created: {path}")
 
-def get_image_files(image_dir):
-    """Get all image files from directory"""
-    valid_extensions = {'.png', '.jpg', '.jpeg'}
+def get_image_files(entries, skip_invalid=SKIP_INVALID):
+    """
+    Get the image files of the dataset index
+    Kept images whose stem clashes with another image are all listed.
+    Returns:
+        tuple: (sorted image filenames, {stem: errors} of invalid images)
+    """
+    invalid = {stem: entry['errors'] for stem, entry in entries.items() if entry['errors']}
     image_files = []
-    
-    for file in os.listdir(image_dir):
-        if Path(file).suffix.lower() in valid_extensions:
-            image_files.append(file)
-    
-    return sorted(image_files)
+    for stem, entry in entries.items():
+        if skip_invalid and stem in invalid:
+            continue
+        image_files.extend(entry['clashes'] or [entry['image']['name']])
+    return sorted(image_files), invalid
 
 def split_dataset(image_files, train_ratio, val_ratio, test_ratio, seed=42):
     """Split files into train/val/test sets"""
@@ -55,16 +99,180 @@ def split_dataset(image_files, train_ratio, val_ratio, test_ratio, seed=42):
     
     return train_files, val_files, test_files
 
-def copy_files(file_list, split_name, source_dirs, output_dir):
-    """Copy images, labels, and XML files to respective split directories"""
+def get_image_ids(entries):
+    """
+    Stable id of every indexed image: the SHA-256 of its content
+    Image names are reused by every generator run (img_00001.png, ...), so
+    a name does not identify an image across runs; its content does. Images
+    that could not be hashed (unreadable, or sharing a stem with the indexed
+    image) fall back to their filename.
+    Returns:
+        dict: {image filename: id}
+    """
+    image_ids = {}
+    for entry in entries.values():
+        for name in entry['clashes'] or [entry['image']['name']]:
+            image_ids[name] = name
+        image_ids[entry['image']['name']] = entry['image'].get('sha256') or entry['image']['name']
+    return image_ids
+
+def get_hash_fraction(stable_id, seed):
+    """Map an image id to a fixed number in [0, 1)"""
+    digest = hashlib.sha256(f"{seed}:{stable_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def hash_split_dataset(image_files, train_ratio, val_ratio, test_ratio, seed=42, image_ids=None):
+    """
+    Split files into train/val/test by a hash of their id
+    An image always lands in the same split, whatever other images exist.
+    The ratios are met on average rather than exactly.
+    Args:
+        image_ids: {image filename: id} from get_image_ids (None = file stems)
+    """
+    image_ids = image_ids or {}
+    train_files, val_files, test_files = [], [], []
+    for image_file in image_files:
+        fraction = get_hash_fraction(image_ids.get(image_file, Path(image_file).stem), seed)
+        if fraction < train_ratio:
+            train_files.append(image_file)
+        elif fraction < train_ratio + val_ratio:
+            val_files.append(image_file)
+        else:
+            test_files.append(image_file)
+    return train_files, val_files, test_files
+
+def load_strata(manifest_file, by_content=False):
+    """
+    Font and page size of each generated image from the generation manifest
+    Args:
+        by_content: Key the images by the SHA-256 of their image file instead
+                    of their stem (records without an image file are left out)
+    Returns:
+        dict: {image stem or SHA-256: (font, "WxH")}
+    """
+    _, records = GenerationManifest(manifest_file).load()
+    strata = {}
+    for image_number, record in records.items():
+        stratum = (record['font'], f"{record['width']}x{record['height']}")
+        if not by_content:
+            strata[f"img_{image_number:05d}"] = stratum
+        elif 'image' in record.get('files', {}):
+            strata[record['files']['image']['sha256']] = stratum
+    return strata
+
+def get_image_strata(image_files, image_ids, strata, previous):
+    """
+    Stratum of every image
+    The manifest only describes the images of the latest generator run, so
+    images of earlier runs keep the stratum recorded with their split.
+    Args:
+        image_files: Image filenames
+        image_ids: {image filename: id} from get_image_ids
+        strata: {image id: stratum} from load_strata(by_content=True)
+        previous: {image id: {'split', 'stratum'}} from load_assignments
+    Returns:
+        dict: {image filename: (font, "WxH")}, ("unknown", "unknown") if neither knows it
+    """
+    image_strata = {}
+    for image_file in image_files:
+        image_id = image_ids[image_file]
+        stratum = strata.get(image_id)
+        if stratum is None and image_id in previous:
+            stratum = previous[image_id]['stratum']
+        image_strata[image_file] = tuple(stratum or ("unknown", "unknown"))
+    return image_strata
+
+def stratified_hash_split(image_files, train_ratio, val_ratio, test_ratio, seed, image_strata, previous, image_ids):
+    """
+    Split files per (font, page size) stratum without moving earlier assignments
+    Strata are walked one after another; images already assigned in a
+    previous run keep their split, new images of a stratum follow in hash
+    order and each goes to the split furthest below its target share of the
+    images walked so far. Every stratum thus gets its share of each split,
+    and rounding left over by small strata carries into the next one.
+    Args:
+        image_files: Image filenames
+        image_strata: {image filename: stratum} from get_image_strata
+        previous: {image id: {'split', 'stratum'}} of the previous run
+        image_ids: {image filename: id} from get_image_ids
+    Returns:
+        tuple: (train_files, val_files, test_files)
+    """
+    ratios = {'train': train_ratio, 'val': val_ratio, 'test': test_ratio}
+    groups = {}
+    for image_file in image_files:
+        groups.setdefault(image_strata[image_file], []).append(image_file)
+    
+    splits = {split: [] for split in ratios}
+    counts = {split: 0 for split in ratios}
+    seen = 0
+    for stratum in sorted(groups):
+        new_files = []
+        for image_file in groups[stratum]:
+            split = previous.get(image_ids[image_file], {}).get('split')
+            if split in splits:
+                splits[split].append(image_file)
+                counts[split] += 1
+                seen += 1
+            else:
+                new_files.append(image_file)
+        
+        new_files.sort(key=lambda image_file: get_hash_fraction(image_ids[image_file], seed))
+        for image_file in new_files:
+            seen += 1
+            # Largest deficit first; ties go to train, then val
+            split = max(ratios, key=lambda split: ratios[split] * seen - counts[split])
+            splits[split].append(image_file)
+            counts[split] += 1
+    
+    return tuple(sorted(splits[split]) for split in ('train', 'val', 'test'))
+
+def load_assignments(output_dir):
+    """
+    Split and stratum of every image in the previous runs
+    Assignments of older versions, keyed by image name, are ignored.
+    Returns:
+        dict: {image id: {'split', 'stratum'}}
+    """
+    path = os.path.join(output_dir, ASSIGNMENTS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        assignments = json.load(f)
+    return {image_id: value for image_id, value in assignments.items() if isinstance(value, dict)}
+
+def save_assignments(output_dir, train_files, val_files, test_files, image_ids, image_strata=None, previous=None):
+    """
+    Record the split of every image for the next incremental run
+    Images of previous runs that are no longer in the source directories
+    keep their record, so they return to their split if they come back.
+    Args:
+        image_ids: {image filename: id} from get_image_ids
+        image_strata: {image filename: stratum}, recorded when known
+        previous: Assignments from load_assignments
+    """
+    assignments = dict(previous or {})
+    image_strata = image_strata or {}
+    for split, files in (('train', train_files), ('val', val_files), ('test', test_files)):
+        for image_file in files:
+            stratum = image_strata.get(image_file, ("unknown", "unknown"))
+            assignments[image_ids[image_file]] = {'split': split, 'stratum': list(stratum)}
+    
+    path = os.path.join(output_dir, ASSIGNMENTS_FILE)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(assignments, f, indent=0, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+def collect_split_files(file_list, source_dirs, entries):
+    """
+    Find the image, label and XML files of a split
+    Uses the dataset index, so no file has to be checked on disk again.
+    Returns:
+        tuple: (list of (subdir, source path, filename), missing_files dict)
+    """
     source_image_dir, source_label_dir, source_xml_dir = source_dirs
     
-    copied_count = {
-        'images': 0,
-        'labels': 0,
-        'xml_labels': 0
-    }
-    
+    split_files = []
     missing_files = {
         'labels': [],
         'xml_labels': []
@@ -73,45 +281,197 @@ def copy_files(file_list, split_name, source_dirs, output_dir):
     for image_file in file_list:
         # Get base filename without extension
         base_name = Path(image_file).stem
+        entry = entries[base_name]
         
-        # Copy image
-        src_image = os.path.join(source_image_dir, image_file)
-        dst_image = os.path.join(output_dir, split_name, 'images', image_file)
-        if os.path.exists(src_image):
-            shutil.copy2(src_image, dst_image)
-            copied_count['images'] += 1
+        split_files.append(('images', os.path.join(source_image_dir, image_file), image_file))
         
-        # Copy YOLO label
         label_file = f"{base_name}.txt"
-        src_label = os.path.join(source_label_dir, label_file)
-        dst_label = os.path.join(output_dir, split_name, 'labels', label_file)
-        if os.path.exists(src_label):
-            shutil.copy2(src_label, dst_label)
-            copied_count['labels'] += 1
+        if entry['label'] is not None:
+            split_files.append(('labels', os.path.join(source_label_dir, label_file), label_file))
         else:
             missing_files['labels'].append(label_file)
         
-        # Copy XML label
         xml_file = f"{base_name}.xml"
-        src_xml = os.path.join(source_xml_dir, xml_file)
-        dst_xml = os.path.join(output_dir, split_name, 'xml_labels', xml_file)
-        if os.path.exists(src_xml):
-            shutil.copy2(src_xml, dst_xml)
-            copied_count['xml_labels'] += 1
+        if entry['xml'] is not None:
+            split_files.append(('xml_labels', os.path.join(source_xml_dir, xml_file), xml_file))
         else:
             missing_files['xml_labels'].append(xml_file)
     
-    return copied_count, missing_files
+    return split_files, missing_files
+
+def reflink_file(src, dst):
+    """Clone src to dst with copy-on-write (raises OSError if unsupported)"""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    
+    with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+        fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+    shutil.copystat(src, dst)
+
+def is_current(src, dst, mode):
+    """True if dst already holds src from an earlier run with the same mode"""
+    if not os.path.lexists(dst):
+        return False
+    if mode == 'symlink':
+        return os.path.islink(dst) and os.readlink(dst) == os.path.abspath(src)
+    if os.path.islink(dst):
+        return False
+    if os.path.samefile(src, dst):
+        # A hard link is current only when hard links are wanted
+        return mode == 'hardlink'
+    
+    # Copies (and copy fallbacks) keep the source size and mtime
+    src_stat, dst_stat = os.stat(src), os.stat(dst)
+    return src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+
+def transfer_file(src, dst, mode):
+    """
+    Materialise src at dst with the given split mode
+    Returns:
+        str: "unchanged" if dst was already current, "written", or
+             "fallback" if a link could not be made and src was copied
+    """
+    if is_current(src, dst, mode):
+        return 'unchanged'
+    
+    # Re-running a split replaces what an earlier run left behind
+    if os.path.lexists(dst):
+        os.remove(dst)
+    
+    try:
+        if mode == 'hardlink':
+            os.link(src, dst)
+            return 'written'
+        if mode == 'symlink':
+            os.symlink(os.path.abspath(src), dst)
+            return 'written'
+        if mode == 'reflink':
+            reflink_file(src, dst)
+            return 'written'
+    except OSError:
+        # Different filesystem, no link support, ...
+        if os.path.lexists(dst):
+            os.remove(dst)
+        shutil.copy2(src, dst)
+        return 'fallback'
+    
+    shutil.copy2(src, dst)
+    return 'written'
+
+def remove_stale_files(split_dir, expected):
+    """
+    Remove files of a split directory that no longer belong to the split
+    Args:
+        split_dir: e.g. dataset/train
+        expected: {subdir: set of filenames} that should be there
+    Returns:
+        int: Number of removed files
+    """
+    removed = 0
+    for subdir, filenames in expected.items():
+        directory = os.path.join(split_dir, subdir)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name not in filenames:
+                    os.remove(entry.path)
+                    removed += 1
+    return removed
+
+def copy_files(file_list, split_name, source_dirs, output_dir, entries, mode=SPLIT_MODE, workers=COPY_WORKERS):
+    """
+    Copy (or link) images, labels, and XML files to respective split directories
+    Files are transferred by a thread pool; copies and links are I/O bound
+    and release the GIL.
+    Args:
+        file_list: Image filenames of the split
+        split_name: "train", "val" or "test"
+        source_dirs: (image dir, label dir, XML dir)
+        output_dir: Dataset root
+        entries: Dataset index from build_index
+        mode: "copy", "hardlink", "symlink" or "reflink"
+        workers: Number of transfer threads
+    Files already current from an earlier run are left alone and files that
+    no longer belong to the split are removed, so an incremental re-split
+    only touches what changed.
+    Returns:
+        tuple: (copied_count, missing_files, transfers) where transfers counts
+               'written', 'unchanged', 'fallback' and 'removed' files
+    """
+    split_files, missing_files = collect_split_files(file_list, source_dirs, entries)
+    
+    copied_count = {
+        'images': 0,
+        'labels': 0,
+        'xml_labels': 0
+    }
+    transfers = {'written': 0, 'unchanged': 0, 'fallback': 0, 'removed': 0}
+    
+    jobs = [
+        (subdir, src, os.path.join(output_dir, split_name, subdir, filename))
+        for subdir, src, filename in split_files
+    ]
+    total = len(jobs)
+    report_every = max(1, total // 10)
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(lambda job: transfer_file(job[1], job[2], mode), jobs)
+        for done, ((subdir, _, _), status) in enumerate(zip(jobs, results), 1):
+            copied_count[subdir] += 1
+            transfers[status] += 1
+            if done % report_every == 0 or done == total:
+                print(f"  {split_name}: {done}/{total} files ({done / total * 100:5.1f}%)")
+    
+    expected = {subdir: set() for subdir in copied_count}
+    for subdir, _, filename in split_files:
+        expected[subdir].add(filename)
+    transfers['removed'] = remove_stale_files(os.path.join(output_dir, split_name), expected)
+    
+    return copied_count, missing_files, transfers
+
+def write_image_list(file_list, split_name, source_dirs, output_dir, entries):
+    """
+    Write <split>.txt listing the absolute source image paths of a split
+    YOLO finds each label by replacing /images/ with /labels/ in the path,
+    so the source layout is used as is and no file is copied.
+    Returns:
+        tuple: (file counts, missing_files)
+    """
+    split_files, missing_files = collect_split_files(file_list, source_dirs, entries)
+    
+    counts = {
+        'images': 0,
+        'labels': 0,
+        'xml_labels': 0
+    }
+    image_paths = []
+    for subdir, src, _ in split_files:
+        counts[subdir] += 1
+        if subdir == 'images':
+            image_paths.append(os.path.abspath(src))
+    
+    list_path = os.path.join(output_dir, f"{split_name}.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(image_paths) + "\n")
+    print(f"  {split_name}: {len(image_paths)} images listed in {list_path}")
+    
+    return counts, missing_files
 
-def create_yaml_file(output_dir, train_count, val_count, test_count):
+def create_yaml_file(output_dir, train_count, val_count, test_count, image_lists=False):
     """Create YOLO dataset configuration file"""
+    if image_lists:
+        splits = """train: train.txt    # train image list (relative to 'path')
+val: val.txt        # val image list (relative to 'path')
+test: test.txt      # test image list (relative to 'path')"""
+    else:
+        splits = """train: train/images  # train images (relative to 'path')
+val: val/images      # val images (relative to 'path')
+test: test/images    # test images (relative to 'path')"""
+
     yaml_content = f"""# Khmer Text Detection Dataset
 # Auto-generated by split_dataset.py
 
 path: {os.path.abspath(output_dir)}  # dataset root dir
-train: train/images  # train images (relative to 'path')
-val: val/images      # val images (relative to 'path')
-test: test/images    # test images (relative to 'path')
+{splits}
 
 # Classes
 names:
@@ -128,7 +488,7 @@ train_ratio: {TRAIN_RATIO}
 val_ratio: {VAL_RATIO}
 test_ratio: {TEST_RATIO}
 """
-    
+
     yaml_path = os.path.join(output_dir, 'data.yaml')
     with open(yaml_path, 'w', encoding='utf-8') as f:
         f.write(yaml_content)
@@ -180,11 +540,38 @@ def create_summary_file(output_dir, stats):
                         f.write(f"  - {missing}\n")
                     if len(stats['missing'][split]['xml_labels']) > 10:
                         f.write(f"  ... and {len(stats['missing'][split]['xml_labels']) - 10} more\n")
+        
+        if stats['invalid']:
+            f.write("\n" + "=" * 70 + "\n")
+            f.write(f"INVALID FILES ({len(stats['invalid'])}, {'skipped' if SKIP_INVALID else 'kept'})\n")
+            f.write("=" * 70 + "\n\n")
+            
+            for stem, errors in list(stats['invalid'].items())[:50]:
+                f.write(f"  - {stem}: {'; '.join(errors)}\n")
+            if len(stats['invalid']) > 50:
+                f.write(f"  ... and {len(stats['invalid']) - 50} more\n")
     
     print(f"Created summary: {summary_path}")
 
-def main():
-    """Main function to split dataset"""
+def main(mode=SPLIT_MODE, workers=COPY_WORKERS, validate_workers=VALIDATE_WORKERS,
+         split_method=SPLIT_METHOD, stratify=STRATIFY):
+    """
+    Main function to split dataset
+    Args:
+        mode: "copy", "hardlink", "symlink", "reflink" or "list"
+        workers: Number of threads copying/linking files
+        validate_workers: Number of processes validating new or changed files
+        split_method: "shuffle" or "hash"
+        stratify: With "hash", balance the split ratios per font and page size
+    """
+    if mode not in ('copy', 'hardlink', 'symlink', 'reflink', 'list'):
+        raise ValueError(f"Unknown split mode: {mode}")
+    if split_method not in ('shuffle', 'hash'):
+        raise ValueError(f"Unknown split method: {split_method}")
+    if stratify and split_method != 'hash':
+        # Shuffling ignores strata; a silently unstratified split would be misleading
+        raise ValueError("Stratified splitting needs the hash split method (--split-method hash)")
+    
     print("=" * 70)
     print("DATASET SPLITTER FOR TEXT DETECTION")
     print("=" * 70)
@@ -203,8 +590,10 @@ def main():
         return
     
     # Get all image files
-    print(f"\n[1] Scanning source directory: {SOURCE_IMAGE_DIR}")
-    image_files = get_image_files(SOURCE_IMAGE_DIR)
+    print(f"\n[1] Scanning and validating source directory: {SOURCE_IMAGE_DIR}")
+    source_dirs = (SOURCE_IMAGE_DIR, SOURCE_LABEL_DIR, SOURCE_XML_DIR)
+    entries = build_index(source_dirs, INDEX_FILE, validate_workers)
+    image_files, invalid = get_image_files(entries)
     total_images = len(image_files)
     
     if total_images == 0:
@@ -212,41 +601,85 @@ def main():
         return
     
     print(f"Found {total_images} images")
+    if invalid:
+        action = "skipped" if SKIP_INVALID else "kept"
+        print(f"  {len(invalid)} images failed validation ({action}), e.g.:")
+        for stem, errors in list(invalid.items())[:5]:
+            print(f"    - {stem}: {'; '.join(errors)}")
     
     # Create directory structure
     print(f"\n[2] Creating directory structure in: {OUTPUT_DIR}")
-    create_directory_structure(OUTPUT_DIR)
+    if mode == 'list':
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+    else:
+        create_directory_structure(OUTPUT_DIR)
     
     # Split dataset
+    image_ids = get_image_ids(entries)
+    previous = load_assignments(OUTPUT_DIR)
+    image_strata = None
     print(f"\n[3] Splitting dataset ({TRAIN_RATIO*100:.0f}% train, {VAL_RATIO*100:.0f}% val, {TEST_RATIO*100:.0f}% test)")
-    train_files, val_files, test_files = split_dataset(
-        image_files, TRAIN_RATIO, VAL_RATIO, TEST_RATIO, RANDOM_SEED
-    )
+    if split_method == 'shuffle':
+        train_files, val_files, test_files = split_dataset(
+            image_files, TRAIN_RATIO, VAL_RATIO, TEST_RATIO, RANDOM_SEED
+        )
+    elif stratify:
+        strata = load_strata(MANIFEST_FILE, by_content=True)
+        image_strata = get_image_strata(image_files, image_ids, strata, previous)
+        kept = sum(1 for image_file in image_files if image_ids[image_file] in previous)
+        print(f"  Hash split stratified by font and page size: {len(set(image_strata.values()))} strata, "
+              f"{kept} images keep their split, {len(image_files) - kept} new")
+        train_files, val_files, test_files = stratified_hash_split(
+            image_files, TRAIN_RATIO, VAL_RATIO, TEST_RATIO, RANDOM_SEED, image_strata, previous, image_ids
+        )
+    else:
+        print(f"  Hash split by image content: images keep their split across runs")
+        train_files, val_files, test_files = hash_split_dataset(
+            image_files, TRAIN_RATIO, VAL_RATIO, TEST_RATIO, RANDOM_SEED, image_ids
+        )
+    save_assignments(OUTPUT_DIR, train_files, val_files, test_files, image_ids, image_strata, previous)
     
     print(f"  Train: {len(train_files)} images")
     print(f"  Val:   {len(val_files)} images")
     print(f"  Test:  {len(test_files)} images")
     
     # Copy files
-    source_dirs = (SOURCE_IMAGE_DIR, SOURCE_LABEL_DIR, SOURCE_XML_DIR)
-    
-    print(f"\n[4] Copying files...")
-    print("-" * 70)
-    
-    # Copy train files
-    print("Copying TRAIN set...")
-    train_copied, train_missing = copy_files(train_files, 'train', source_dirs, OUTPUT_DIR)
-    print(f"  ✓ Images: {train_copied['images']}, Labels: {train_copied['labels']}, XML: {train_copied['xml_labels']}")
-    
-    # Copy val files
-    print("Copying VAL set...")
-    val_copied, val_missing = copy_files(val_files, 'val', source_dirs, OUTPUT_DIR)
-    print(f"  ✓ Images: {val_copied['images']}, Labels: {val_copied['labels']}, XML: {val_copied['xml_labels']}")
-    
-    # Copy test files
-    print("Copying TEST set...")
-    test_copied, test_missing = copy_files(test_files, 'test', source_dirs, OUTPUT_DIR)
-    print(f"  ✓ Images: {test_copied['images']}, Labels: {test_copied['labels']}, XML: {test_copied['xml_labels']}")
+    if mode == 'list':
+        print(f"\n[4] Writing image lists (no files copied)...")
+        print("-" * 70)
+        train_copied, train_missing = write_image_list(train_files, 'train', source_dirs, OUTPUT_DIR, entries)
+        val_copied, val_missing = write_image_list(val_files, 'val', source_dirs, OUTPUT_DIR, entries)
+        test_copied, test_missing = write_image_list(test_files, 'test', source_dirs, OUTPUT_DIR, entries)
+    else:
+        print(f"\n[4] Transferring files (mode: {mode}, {workers} threads)...")
+        print("-" * 70)
+        transfers = {}
+        
+        # Copy train files
+        print("Copying TRAIN set...")
+        train_copied, train_missing, split_transfers = copy_files(train_files, 'train', source_dirs, OUTPUT_DIR, entries, mode, workers)
+        for status, count in split_transfers.items():
+            transfers[status] = transfers.get(status, 0) + count
+        print(f"  ✓ Images: {train_copied['images']}, Labels: {train_copied['labels']}, XML: {train_copied['xml_labels']}")
+        
+        # Copy val files
+        print("Copying VAL set...")
+        val_copied, val_missing, split_transfers = copy_files(val_files, 'val', source_dirs, OUTPUT_DIR, entries, mode, workers)
+        for status, count in split_transfers.items():
+            transfers[status] = transfers.get(status, 0) + count
+        print(f"  ✓ Images: {val_copied['images']}, Labels: {val_copied['labels']}, XML: {val_copied['xml_labels']}")
+        
+        # Copy test files
+        print("Copying TEST set...")
+        test_copied, test_missing, split_transfers = copy_files(test_files, 'test', source_dirs, OUTPUT_DIR, entries, mode, workers)
+        for status, count in split_transfers.items():
+            transfers[status] = transfers.get(status, 0) + count
+        print(f"  ✓ Images: {test_copied['images']}, Labels: {test_copied['labels']}, XML: {test_copied['xml_labels']}")
+        
+        print(f"  Files written: {transfers['written'] + transfers['fallback']}, unchanged: {transfers['unchanged']}, "
+              f"removed from a split: {transfers['removed']}")
+        if transfers['fallback']:
+            print(f"  Note: {transfers['fallback']} files could not be {mode}ed and were copied instead")
     
     # Create statistics
     stats = {
@@ -258,12 +691,13 @@ def main():
             'train': train_missing,
             'val': val_missing,
             'test': test_missing
-        }
+        },
+        'invalid': invalid
     }
     
     # Create YAML config file for YOLO
     print(f"\n[5] Creating configuration files...")
-    create_yaml_file(OUTPUT_DIR, len(train_files), len(val_files), len(test_files))
+    create_yaml_file(OUTPUT_DIR, len(train_files), len(val_files), len(test_files), image_lists=(mode == 'list'))
     
     # Create summary file
     create_summary_file(OUTPUT_DIR, stats)
@@ -274,18 +708,23 @@ def main():
     print("=" * 70)
     print(f"\nDataset structure:")
     print(f"  {OUTPUT_DIR}/")
-    print(f"  ├── train/")
-    print(f"  │   ├── images/     ({train_copied['images']} files)")
-    print(f"  │   ├── labels/     ({train_copied['labels']} files)")
-    print(f"  │   └── xml_labels/ ({train_copied['xml_labels']} files)")
-    print(f"  ├── val/")
-    print(f"  │   ├── images/     ({val_copied['images']} files)")
-    print(f"  │   ├── labels/     ({val_copied['labels']} files)")
-    print(f"  │   └── xml_labels/ ({val_copied['xml_labels']} files)")
-    print(f"  ├── test/")
-    print(f"  │   ├── images/     ({test_copied['images']} files)")
-    print(f"  │   ├── labels/     ({test_copied['labels']} files)")
-    print(f"  │   └── xml_labels/ ({test_copied['xml_labels']} files)")
+    if mode == 'list':
+        print(f"  ├── train.txt       ({train_copied['images']} images)")
+        print(f"  ├── val.txt         ({val_copied['images']} images)")
+        print(f"  ├── test.txt        ({test_copied['images']} images)")
+    else:
+        print(f"  ├── train/")
+        print(f"  │   ├── images/     ({train_copied['images']} files)")
+        print(f"  │   ├── labels/     ({train_copied['labels']} files)")
+        print(f"  │   └── xml_labels/ ({train_copied['xml_labels']} files)")
+        print(f"  ├── val/")
+        print(f"  │   ├── images/     ({val_copied['images']} files)")
+        print(f"  │   ├── labels/     ({val_copied['labels']} files)")
+        print(f"  │   └── xml_labels/ ({val_copied['xml_labels']} files)")
+        print(f"  ├── test/")
+        print(f"  │   ├── images/     ({test_copied['images']} files)")
+        print(f"  │   ├── labels/     ({test_copied['labels']} files)")
+        print(f"  │   └── xml_labels/ ({test_copied['xml_labels']} files)")
     print(f"  ├── data.yaml")
     print(f"  └── dataset_summary.txt")
     
@@ -293,8 +732,10 @@ def main():
     total_missing_labels = len(train_missing['labels']) + len(val_missing['labels']) + len(test_missing['labels'])
     total_missing_xml = len(train_missing['xml_labels']) + len(val_missing['xml_labels']) + len(test_missing['xml_labels'])
     
-    if total_missing_labels > 0 or total_missing_xml > 0:
+    if total_missing_labels > 0 or total_missing_xml > 0 or invalid:
         print("\nWARNINGS:")
+        if invalid:
+            print(f"  - {len(invalid)} images failed validation")
         if total_missing_labels > 0:
             print(f"  - {total_missing_labels} missing label files")
         if total_missing_xml > 0:
@@ -305,9 +746,27 @@ def main():
     print(f"  Use this config with YOLO: {OUTPUT_DIR}/data.yaml")
     print("=" * 70)
 
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Split generated images and labels into train/val/test")
+    parser.add_argument("--mode", choices=('copy', 'hardlink', 'symlink', 'reflink', 'list'), default=SPLIT_MODE,
+                        help=f"how split files are created (default: {SPLIT_MODE})")
+    parser.add_argument("--workers", type=int, default=COPY_WORKERS,
+                        help=f"threads copying/linking files (default: {COPY_WORKERS})")
+    parser.add_argument("--split-method", choices=('shuffle', 'hash'), default=SPLIT_METHOD,
+                        help=f"shuffle all files, or assign each image by a hash of its content (default: {SPLIT_METHOD})")
+    parser.add_argument("--stratify", action="store_true", default=STRATIFY,
+                        help=f"balance splits per font and page size from {MANIFEST_FILE} "
+                             f"(requires --split-method hash)")
+    parser.add_argument("--validate-workers", type=int, default=VALIDATE_WORKERS,
+                        help=f"processes validating new or changed files (default: {VALIDATE_WORKERS})")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        main()
+        main(mode=args.mode, workers=args.workers, validate_workers=args.validate_workers,
+             split_method=args.split_method, stratify=args.stratify)
     except KeyboardInterrupt:
         print("\n\nProcess interrupted by user.")
     except Exception as e:
@@ -0,0 +1,312 @@
+import os
+import json
+import hashlib
+import argparse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# === CONFIGURATION ===
+SOURCE_IMAGE_DIR = "images"
+SOURCE_LABEL_DIR = "labels"
+SOURCE_XML_DIR = "xml_labels"
+
+INDEX_FILE = "dataset_index.json"
+INDEX_VERSION = 2
+VALIDATE_WORKERS = os.cpu_count() or 1
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+HASH_BLOCK_SIZE = 1 << 20
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_END = b'IEND\xaeB`\x82'  # IEND chunk type and CRC, the last bytes of a PNG
+
+def scan_dir(directory, extensions):
+    """
+    List files of a directory with os.scandir
+    Files sharing a stem (e.g. page.png and page.jpg) would share their
+    labels; the first name in sorted order is listed and the stem is
+    reported as a clash.
+    Returns:
+        tuple: ({stem: {'name', 'size', 'mtime_ns'}} of files with one of
+               extensions, {stem: sorted names} of clashing stems)
+    """
+    files = {}
+    clashes = {}
+    if not os.path.isdir(directory):
+        return files, clashes
+    
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() not in extensions or not entry.is_file():
+                continue
+            stat = entry.stat()
+            file_info = {'name': entry.name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            if stem in files:
+                clashes.setdefault(stem, [files[stem]['name']]).append(entry.name)
+                if entry.name > files[stem]['name']:
+                    continue
+            files[stem] = file_info
+    return files, {stem: sorted(names) for stem, names in clashes.items()}
+
+def read_file(path, file_info):
+    """
+    Read a file and add its SHA-256 to file_info
+    Returns:
+        tuple: (first block, last 16 bytes) of the file for format checks
+    """
+    digest = hashlib.sha256()
+    head = tail = b""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            if not head:
+                head = block
+            tail = (tail + block)[-16:]
+            digest.update(block)
+    file_info['sha256'] = digest.hexdigest()
+    return head, tail
+
+def get_image_size(head, tail):
+    """
+    Check the header (and for PNG/JPEG the end) of a PNG, JPEG or WebP image
+    A missing end marker means the file was truncated, e.g. by an
+    interrupted write.
+    Returns:
+        tuple: (width, height) for PNG, (None, None) for other valid formats
+    Raises:
+        ValueError: If the header is not a known image format
+    """
+    if head.startswith(PNG_SIGNATURE):
+        # The IHDR chunk must come first and holds the image size
+        if len(head) < 24 or head[12:16] != b'IHDR':
+            raise ValueError("PNG without IHDR chunk")
+        if not tail.endswith(PNG_END):
+            raise ValueError("truncated PNG (no IEND chunk)")
+        return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    if head.startswith(b'\xff\xd8\xff'):
+        if not tail.endswith(b'\xff\xd9'):
+            raise ValueError("truncated JPEG (no end marker)")
+        return None, None
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return None, None
+    raise ValueError("unknown or corrupt image header")
+
+def validate_label(path, file_info, errors):
+    """
+    Check a YOLO label: 5 fields per line, class id, boxes normalised to [0, 1]
+    Returns:
+        int: Number of boxes
+    """
+    read_file(path, file_info)
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    
+    for line_number, line in enumerate(lines, 1):
+        fields = line.split()
+        if len(fields) != 5:
+            errors.append(f"label line {line_number}: expected 5 fields, got {len(fields)}")
+            break
+        try:
+            int(fields[0])
+            values = [float(value) for value in fields[1:]]
+        except ValueError:
+            errors.append(f"label line {line_number}: not a number")
+            break
+        if not all(0.0 <= value <= 1.0 for value in values):
+            errors.append(f"label line {line_number}: box outside [0, 1]")
+            break
+    return len(lines)
+
+def validate_xml(path, file_info, errors):
+    """
+    Check that an XML label parses
+    Returns:
+        tuple: (number of words, width, height)
+    """
+    read_file(path, file_info)
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError as e:
+        errors.append(f"XML does not parse: {e}")
+        return None, None, None
+    
+    width = root.findtext("width")
+    height = root.findtext("height")
+    return (
+        len(root.findall(".//word")),
+        int(width) if width and width.isdigit() else None,
+        int(height) if height and height.isdigit() else None
+    )
+
+def validate_entry(entry, source_dirs):
+    """
+    Hash and validate the image, YOLO label and XML label of one image
+    Args:
+        entry: Index entry with 'image', 'label' and 'xml' file info (or None)
+               and 'clashes', the image names sharing the stem
+        source_dirs: (image dir, label dir, XML dir)
+    Returns:
+        dict: The entry with hashes, 'num_boxes' and 'errors' filled in
+    """
+    image_dir, label_dir, xml_dir = source_dirs
+    errors = []
+    if entry['clashes']:
+        errors.append(f"files share the stem: {', '.join(entry['clashes'])}")
+    
+    image_size = (None, None)
+    try:
+        head, tail = read_file(os.path.join(image_dir, entry['image']['name']), entry['image'])
+        image_size = get_image_size(head, tail)
+    except (OSError, ValueError) as e:
+        errors.append(f"image: {e}")
+    
+    num_boxes = None
+    if entry['label'] is None:
+        errors.append("missing label")
+    else:
+        num_boxes = validate_label(os.path.join(label_dir, entry['label']['name']), entry['label'], errors)
+    
+    if entry['xml'] is None:
+        errors.append("missing XML")
+    else:
+        num_words, width, height = validate_xml(os.path.join(xml_dir, entry['xml']['name']), entry['xml'], errors)
+        if num_words is not None and num_boxes is not None and num_words != num_boxes:
+            errors.append(f"XML has {num_words} words, label has {num_boxes} boxes")
+        if image_size[0] is not None and width is not None and (width, height) != image_size:
+            errors.append(f"XML size {width}x{height} does not match image {image_size[0]}x{image_size[1]}")
+    
+    entry['num_boxes'] = num_boxes
+    entry['errors'] = errors
+    return entry
+
+def validate_batch(entries, source_dirs):
+    """Validate a batch of entries (one task of the process pool)"""
+    return [validate_entry(entry, source_dirs) for entry in entries]
+
+def is_unchanged(entry, cached):
+    """True if all files of an entry have the size and mtime of the cached entry"""
+    if cached is None or entry['clashes'] != cached.get('clashes'):
+        return False
+    for kind in ('image', 'label', 'xml'):
+        new, old = entry[kind], cached.get(kind)
+        if (new is None) != (old is None):
+            return False
+        if new is not None and (new['size'], new['mtime_ns']) != (old['size'], old['mtime_ns']):
+            return False
+    return True
+
+def load_index(index_file, source_dirs):
+    """Load a cached index built from the same source directories"""
+    if not index_file or not os.path.exists(index_file):
+        return {}
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except ValueError:
+        return {}
+    if index.get('version') != INDEX_VERSION or index.get('source_dirs') != list(source_dirs):
+        return {}
+    return index['entries']
+
+def save_index(index_file, source_dirs, entries):
+    """Write the index atomically"""
+    index = {'version': INDEX_VERSION, 'source_dirs': list(source_dirs), 'entries': entries}
+    tmp_file = f"{index_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_file, index_file)
+
+def build_index(source_dirs=(SOURCE_IMAGE_DIR, SOURCE_LABEL_DIR, SOURCE_XML_DIR), index_file=INDEX_FILE,
+                workers=VALIDATE_WORKERS, verbose=True):
+    """
+    Build or update the dataset index
+    The three directories are scanned concurrently with os.scandir. Images
+    whose image, label and XML files kept their size and mtime since the
+    cached index are reused as they are; the others are hashed and validated
+    in a process pool. Images sharing a stem are not dropped: the entry lists
+    them all under 'clashes' and is marked invalid.
+    Args:
+        source_dirs: (image dir, label dir, XML dir)
+        index_file: Cache file of the index (None = no cache)
+        workers: Number of validation processes
+        verbose: Print progress
+    Returns:
+        dict: {stem: entry} with 'image', 'label', 'xml' ({'name', 'size',
+              'mtime_ns', 'sha256'} or None), 'clashes', 'num_boxes' and
+              'errors'
+    """
+    source_dirs = tuple(source_dirs)
+    image_dir, label_dir, xml_dir = source_dirs
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        (images, clashes), (labels, _), (xmls, _) = executor.map(
+            lambda args: scan_dir(*args),
+            [(image_dir, IMAGE_EXTENSIONS), (label_dir, {'.txt'}), (xml_dir, {'.xml'})]
+        )
+    
+    cached = load_index(index_file, source_dirs)
+    entries = {}
+    changed = []
+    for stem in sorted(images):
+        entry = {
+            'image': images[stem], 'label': labels.get(stem), 'xml': xmls.get(stem),
+            'clashes': clashes.get(stem, [])
+        }
+        if is_unchanged(entry, cached.get(stem)):
+            entries[stem] = cached[stem]
+        else:
+            changed.append(entry)
+    
+    if verbose:
+        print(f"  Indexed {len(images)} images: {len(entries)} unchanged, {len(changed)} to validate")
+    
+    if changed:
+        # Batches keep the pool overhead per image small
+        batch_size = max(1, min(256, len(changed) // (max(1, workers) * 4)))
+        batches = [changed[i:i + batch_size] for i in range(0, len(changed), batch_size)]
+        
+        validated = 0
+        report_every = max(1, len(batches) // 10)
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = executor.map(validate_batch, batches, [source_dirs] * len(batches))
+            for i, batch in enumerate(results, 1):
+                for entry in batch:
+                    entries[os.path.splitext(entry['image']['name'])[0]] = entry
+                validated += len(batch)
+                if verbose and (i % report_every == 0 or i == len(batches)):
+                    print(f"  Validated {validated}/{len(changed)} ({validated / len(changed) * 100:5.1f}%)")
+        
+        entries = dict(sorted(entries.items()))
+    
+    if index_file:
+        save_index(index_file, source_dirs, entries)
+    return entries
+
+def main(workers=VALIDATE_WORKERS, index_file=INDEX_FILE):
+    """Build the dataset index and report invalid images"""
+    print("=" * 70)
+    print("DATASET INDEX AND INTEGRITY CHECK")
+    print("=" * 70)
+    
+    entries = build_index(index_file=index_file, workers=workers)
+    invalid = {stem: entry['errors'] for stem, entry in entries.items() if entry['errors']}
+    
+    print(f"\nImages: {len(entries)}, valid: {len(entries) - len(invalid)}, invalid: {len(invalid)}")
+    for stem, errors in list(invalid.items())[:20]:
+        print(f"  - {stem}: {'; '.join(errors)}")
+    if len(invalid) > 20:
+        print(f"  ... and {len(invalid) - 20} more")
+    print(f"Index saved to {index_file}")
+    print("=" * 70)
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Index and validate generated images and labels")
+    parser.add_argument("--workers", type=int, default=VALIDATE_WORKERS,
+                        help=f"validation processes (default: {VALIDATE_WORKERS})")
+    parser.add_argument("--index-file", default=INDEX_FILE,
+                        help=f"index cache file (default: {INDEX_FILE})")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(workers=args.workers, index_file=args.index_file)
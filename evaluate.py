@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from data_split import load_strata
+from process.config import INFERENCE_CONF
+from process.evaluation import evaluate_image, EvaluationResults
+from process.inference import find_images
+
+# === CONFIGURATION ===
+PRED_DIR = "predictions/labels"       # YOLO labels with confidences, written by predict.py
+GT_DIR = "dataset/test/labels"        # Ground truth: YOLO labels or xml_labels
+IMAGE_DIR = "dataset/test/images"     # Page sizes when neither the manifest nor XML has them
+MANIFEST_FILE = "generation_manifest.jsonl"  # Font and page size of each generated image
+REPORT_FILE = "evaluation_report.json"
+NUM_WORKERS = os.cpu_count() or 1     # Matching processes (1 = serial)
+CHUNK_SIZE = 16                       # Pages per pool task
+
+def get_gt_files(gt_dir):
+    """
+    Ground-truth labels of a directory
+    Returns:
+        tuple: ({stem: path}, "yolo" or "xml")
+    """
+    names = sorted(os.listdir(gt_dir))
+    xml_files = {os.path.splitext(name)[0]: name for name in names if name.endswith(".xml")}
+    yolo_files = {os.path.splitext(name)[0]: name for name in names if name.endswith(".txt")}
+    gt_format, files = ("xml", xml_files) if len(xml_files) > len(yolo_files) else ("yolo", yolo_files)
+    return {stem: os.path.join(gt_dir, name) for stem, name in files.items()}, gt_format
+
+def get_page_groups(stems, page_results, manifest_file, image_dir):
+    """
+    Font and page size of every evaluated page
+    The generation manifest knows both; without it, the page size comes
+    from the XML labels or the image headers and the font is unknown.
+    Returns:
+        tuple: ({stem: font}, {stem: "WxH"})
+    """
+    strata = load_strata(manifest_file) if os.path.exists(manifest_file) else {}
+    fonts = {stem: strata[stem][0] for stem in stems if stem in strata}
+    page_sizes = {stem: strata[stem][1] for stem in stems if stem in strata}
+    
+    images = {}
+    if os.path.isdir(image_dir):
+        images = {os.path.splitext(os.path.basename(path))[0]: path for path in find_images(image_dir)}
+    for result in page_results:
+        stem = result['stem']
+        if stem in page_sizes:
+            continue
+        if result['width']:
+            page_sizes[stem] = f"{result['width']}x{result['height']}"
+        elif stem in images:
+            # Only the header is read
+            with Image.open(images[stem]) as image:
+                page_sizes[stem] = f"{image.width}x{image.height}"
+    return fonts, page_sizes
+
+def print_table(title, rows):
+    """Print metrics as a table, one row per group"""
+    print(f"\n{title}")
+    print(f"  {'':28s} {'images':>7s} {'boxes':>8s} {'P':>7s} {'R':>7s} {'F1':>7s} {'mAP50':>7s} {'mAP50-95':>9s}")
+    for name, metrics in rows.items():
+        print(f"  {name[:28]:28s} {metrics['images']:7d} {metrics['ground_truth']:8d} "
+              f"{metrics['precision']:7.4f} {metrics['recall']:7.4f} {metrics['f1']:7.4f} "
+              f"{metrics['map50']:7.4f} {metrics['map50_95']:9.4f}")
+
+def main(pred_dir=PRED_DIR, gt_dir=GT_DIR, image_dir=IMAGE_DIR, manifest_file=MANIFEST_FILE,
+         report_file=REPORT_FILE, workers=NUM_WORKERS, conf=INFERENCE_CONF):
+    """
+    Evaluate predicted labels against the ground truth of a whole split
+    Every ground-truth page is evaluated; a page without a prediction file
+    counts as a page without detections. Pages are matched in parallel
+    (see process.evaluation), then precision, recall and F1 at IoU 0.5 and
+    conf, mAP@0.5 and mAP@0.5:0.95 are computed overall, per font and per
+    page size.
+    Args:
+        pred_dir: Predicted YOLO labels (with confidences)
+        gt_dir: Ground-truth YOLO labels or XML labels
+        image_dir: Images of the split, for page sizes
+        manifest_file: Generation manifest, for fonts and page sizes
+        report_file: JSON report to write
+        workers: Matching processes
+        conf: Confidence threshold of precision, recall and F1
+    """
+    print("=" * 70)
+    print("EVALUATION")
+    print("=" * 70)
+    
+    if not os.path.isdir(gt_dir):
+        print(f"Error: Ground truth not found at {gt_dir}")
+        return
+    gt_files, gt_format = get_gt_files(gt_dir)
+    if not gt_files:
+        print(f"No labels found in {gt_dir}")
+        return
+    
+    stems = sorted(gt_files)
+    tasks = [(stem, os.path.join(pred_dir, f"{stem}.txt"), gt_files[stem], gt_format) for stem in stems]
+    missing = sum(1 for task in tasks if not os.path.exists(task[1]))
+    print(f"Ground truth: {len(stems)} pages ({gt_format}) from {gt_dir}")
+    print(f"Predictions: {pred_dir} ({missing} page(s) without predictions), {workers} worker(s)")
+    
+    start_time = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            page_results = list(executor.map(evaluate_image, tasks, chunksize=CHUNK_SIZE))
+    else:
+        page_results = [evaluate_image(task) for task in tasks]
+    match_seconds = time.perf_counter() - start_time
+    
+    results = EvaluationResults(page_results)
+    fonts, page_sizes = get_page_groups(stems, page_results, manifest_file, image_dir)
+    report = {
+        'pred_dir': pred_dir,
+        'gt_dir': gt_dir,
+        'conf': conf,
+        'overall': results.metrics(conf=conf),
+        'per_font': results.grouped_metrics(fonts, conf),
+        'per_page_size': results.grouped_metrics(page_sizes, conf)
+    }
+    seconds = time.perf_counter() - start_time
+    report['seconds'] = round(seconds, 3)
+    
+    print_table("Overall", {'all': report['overall']})
+    if report['per_font']:
+        print_table("Per font", report['per_font'])
+    if report['per_page_size']:
+        print_table("Per page size", report['per_page_size'])
+    
+    tmp_file = f"{report_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, report_file)
+    
+    print(f"\nEvaluated {len(stems)} pages, {len(results.scores)} predictions in {seconds:.2f}s "
+          f"(matching {match_seconds:.2f}s)")
+    print(f"Report saved to {report_file}")
+    print("=" * 70)
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Evaluate predicted word boxes against the ground truth")
+    parser.add_argument("--pred-dir", default=PRED_DIR,
+                        help=f"predicted YOLO labels with confidences (default: {PRED_DIR})")
+    parser.add_argument("--gt-dir", default=GT_DIR,
+                        help=f"ground-truth labels/ or xml_labels/ (default: {GT_DIR})")
+    parser.add_argument("--image-dir", default=IMAGE_DIR,
+                        help=f"images of the split, for page sizes (default: {IMAGE_DIR})")
+    parser.add_argument("--manifest", default=MANIFEST_FILE,
+                        help=f"generation manifest, for fonts and page sizes (default: {MANIFEST_FILE})")
+    parser.add_argument("--report", default=REPORT_FILE,
+                        help=f"JSON report (default: {REPORT_FILE})")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS,
+                        help=f"matching processes, 1 = serial (default: {NUM_WORKERS})")
+    parser.add_argument("--conf", type=float, default=INFERENCE_CONF,
+                        help=f"confidence threshold of P/R/F1 (default: {INFERENCE_CONF})")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.pred_dir, args.gt_dir, args.image_dir, args.manifest, args.report, max(1, args.workers), args.conf)
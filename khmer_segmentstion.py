@@ -1,56 +1,326 @@
 import os
 import re
+import time
+import shutil
+import hashlib
+import argparse
+from multiprocessing import Pool
 from khmernltk import word_tokenize
 
+# === CONFIGURATION ===
 # Input and output directories
 input_dir = "kh_data_100"
 output_dir = "data_clean"
 combine_file = os.path.join(output_dir, "combine_clean.txt")
 
-# Create output folder if not exists
-os.makedirs(output_dir, exist_ok=True)
+NUM_WORKERS = os.cpu_count() or 1  # Tokeniser processes (1 = serial, no pool)
+CHUNK_MB = 0                       # Tokenise files larger than this in line-aligned chunks (0 = whole files);
+                                   # chunks cut the tokeniser context, so the output can change
 
-# Prepare a list to store all combined cleaned text
-all_clean_texts = []
+# Cleaned output of every tokenised file, keyed by content hash, tokeniser version and cleaning rules
+CACHE_DIR = "token_cache"
+CLEANING_VERSION = 1  # Bump whenever clean_tokens changes
 
-# Loop through all files in the input folder
-for filename in os.listdir(input_dir):
-    if filename.endswith("_orig.txt"):
-        input_path = os.path.join(input_dir, filename)
-        output_filename = filename.replace("_orig.txt", "_clean.txt")
-        output_path = os.path.join(output_dir, output_filename)
+HASH_BLOCK_SIZE = 1 << 20
 
-        # Step 1: Read text
-        with open(input_path, "r", encoding="utf-8") as f:
-            text = f.read()
+DOTS_PATTERN = re.compile(r"\.+")
 
-        # Step 2: Tokenize text
-        tokens = word_tokenize(text)
+def clean_tokens(tokens):
+    """
+    Strip tokens, remove dots and ellipses, and drop empty tokens
+    Returns:
+        list: Cleaned tokens
+    """
+    clean = []
+    for t in tokens:
+        t = t.strip()
+        t = DOTS_PATTERN.sub("", t)
+        t = t.replace("…", "")
 
-        # Step 3: Clean tokens
-        clean_tokens = []
-        for t in tokens:
-            t = t.strip()                    
-            t = re.sub(r"\.+", "", t)         
-            t = t.replace("…", "")           
+        if t != "":
+            clean.append(t)
+    return clean
 
-            if t != "":
-                clean_tokens.append(t)
+def get_tokenizer_version():
+    """Installed khmernltk version, part of every cache key"""
+    try:
+        from importlib.metadata import version
+        return version("khmernltk")
+    except Exception:
+        return "unknown"
 
-        # Step 4: Join tokens line by line
-        cleaned_text = "\n".join(clean_tokens)
+def get_cache_key(path, chunk_bytes, tokenizer_version):
+    """
+    Content address of a file's cleaned output
+    Hash of the tokeniser version, the cleaning rules, the chunk size (only
+    for files that are split, as chunking can change tokens at chunk edges)
+    and the file content. A new article, a khmernltk upgrade or a change of
+    the cleaning rules therefore never reuses a stale output.
+    Returns:
+        str: SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(f"khmernltk={tokenizer_version}\0cleaning={CLEANING_VERSION}:{DOTS_PATTERN.pattern}\0".encode("utf-8"))
+    digest.update(f"chunk_bytes={chunk_bytes}\0".encode("utf-8"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-        # Step 5: Save result to a file
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(cleaned_text)
+def get_cache_path(cache_dir, key):
+    """Path of a cache entry, fanned out over 256 subdirectories"""
+    return os.path.join(cache_dir, key[:2], f"{key}.txt")
 
-        print(f"Cleaned text saved to {output_path}")
+def save_cache_entry(cache_dir, key, output_path):
+    """Copy a finished _clean.txt into the cache (atomically)"""
+    cache_path = get_cache_path(cache_dir, key)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    shutil.copyfile(output_path, cache_path + ".tmp")
+    os.replace(cache_path + ".tmp", cache_path)
 
-        # Step 6: Add cleaned text to combined list
-        all_clean_texts.append(cleaned_text)
+def list_cache_entries(cache_dir):
+    """
+    All entries of the cache
+    Returns:
+        dict: {key: (path, size in bytes)}
+    """
+    entries = {}
+    if not os.path.isdir(cache_dir):
+        return entries
+    for subdir in os.scandir(cache_dir):
+        if not subdir.is_dir():
+            continue
+        for entry in os.scandir(subdir.path):
+            if entry.name.endswith(".txt"):
+                entries[entry.name[:-4]] = (entry.path, entry.stat().st_size)
+    return entries
 
-# Step 7: Combine all cleaned texts into one file
-with open(combine_file, "w", encoding="utf-8") as f:
-    f.write("\n".join(all_clean_texts))
+def find_input_files(directory):
+    """The *_orig.txt files of a directory, sorted by name for a stable combined file"""
+    return sorted(filename for filename in os.listdir(directory) if filename.endswith("_orig.txt"))
 
-print("All cleaned texts combined into:", combine_file)
+def get_chunks(path, chunk_bytes):
+    """
+    Split a file into byte ranges that end on a line break
+    Every paragraph is one line in the news dumps, so a chunk never cuts a
+    paragraph (or a UTF-8 character) in two. The tokeniser sees each chunk on
+    its own, so only the first and last words of a chunk lose the context of
+    the neighbouring paragraph; chunk_bytes = 0 tokenises whole files.
+    Returns:
+        list: (start, end) byte offsets covering the whole file
+    """
+    size = os.path.getsize(path)
+    if chunk_bytes <= 0 or size <= chunk_bytes:
+        return [(0, size)]
+
+    chunks = []
+    start = 0
+    with open(path, "rb") as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # Move to the end of the current line
+            end = min(f.tell(), size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def tokenize_chunk(task):
+    """
+    Read, tokenise and clean one byte range of a file (pool task)
+    Args:
+        task: (file index, chunk index, path, start, end)
+    Returns:
+        tuple: (file index, chunk index, cleaned tokens joined line by line,
+                number of tokens, seconds)
+    """
+    file_index, chunk_index, path, start, end = task
+    start_time = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    # One string pickles much faster than a list of tokens
+    tokens = clean_tokens(word_tokenize(text))
+    return file_index, chunk_index, "\n".join(tokens), len(tokens), time.perf_counter() - start_time
+
+def write_combined(output_paths, combine_path):
+    """Concatenate the per-file outputs in order, one line break between files"""
+    with open(combine_path, "w", encoding="utf-8") as out:
+        for i, output_path in enumerate(output_paths):
+            if i:
+                out.write("\n")
+            with open(output_path, "r", encoding="utf-8") as f:
+                shutil.copyfileobj(f, out)
+
+def get_input_keys(input_paths, chunk_bytes):
+    """
+    Chunks and cache keys of the input files
+    Returns:
+        tuple: (list of chunk lists, list of cache keys)
+    """
+    tokenizer_version = get_tokenizer_version()
+    all_chunks = []
+    keys = []
+    for input_path in input_paths:
+        chunks = get_chunks(input_path, chunk_bytes)
+        all_chunks.append(chunks)
+        keys.append(get_cache_key(input_path, chunk_bytes if len(chunks) > 1 else 0, tokenizer_version))
+    return all_chunks, keys
+
+def get_current_keys(chunk_mb):
+    """Cache keys of the files currently in input_dir"""
+    input_paths = [os.path.join(input_dir, filename) for filename in find_input_files(input_dir)]
+    return set(get_input_keys(input_paths, int(chunk_mb * 1024 * 1024))[1])
+
+def show_cache_stats(cache_dir=CACHE_DIR, chunk_mb=CHUNK_MB):
+    """Print the size of the cache and how much of it the current inputs use"""
+    entries = list_cache_entries(cache_dir)
+    current = get_current_keys(chunk_mb)
+    used = [size for key, (_, size) in entries.items() if key in current]
+    total_size = sum(size for _, size in entries.values())
+
+    print(f"Cache {cache_dir}: {len(entries)} entries, {total_size / 1024 / 1024:.1f} MB")
+    print(f"  Used by the current inputs: {len(used)} entries, {sum(used) / 1024 / 1024:.1f} MB")
+    print(f"  Unused (removed by --prune): {len(entries) - len(used)} entries, "
+          f"{(total_size - sum(used)) / 1024 / 1024:.1f} MB")
+    print(f"  Current inputs not cached: {len(current - set(entries))}")
+
+def prune_cache(cache_dir=CACHE_DIR, chunk_mb=CHUNK_MB):
+    """
+    Remove cache entries no current input file maps to
+    Entries of deleted or edited articles, of an older khmernltk or older
+    cleaning rules, and of another chunk size are removed.
+    """
+    current = get_current_keys(chunk_mb)
+    removed = 0
+    freed = 0
+    for key, (path, size) in list_cache_entries(cache_dir).items():
+        if key not in current:
+            os.remove(path)
+            removed += 1
+            freed += size
+    print(f"Pruned {removed} entries ({freed / 1024 / 1024:.1f} MB) from {cache_dir}")
+
+def main(workers=NUM_WORKERS, chunk_mb=CHUNK_MB, cache_dir=CACHE_DIR):
+    """
+    Tokenise and clean every *_orig.txt file into *_clean.txt and the combined file
+    Whole files are tokenised across a process pool. With chunk_mb > 0,
+    large files are split into chunks as well; the tokeniser then loses the
+    context across chunk boundaries, so the output can differ from whole-file
+    tokenisation.
+    A file's output is written once all its chunks are done, with the chunk
+    tokens in file order, and the combined file follows the sorted file
+    names, so the outputs do not depend on the number of workers.
+    Files whose cache key is already in the cache are not tokenised again;
+    their output is copied from the cache.
+    Args:
+        workers: Number of tokeniser processes (1 = serial)
+        chunk_mb: Chunk size in MB for large files (0 = whole files)
+        cache_dir: Tokenisation cache directory (None = no cache)
+    """
+    # Create output folder if not exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    filenames = find_input_files(input_dir)
+    input_paths = [os.path.join(input_dir, filename) for filename in filenames]
+    output_paths = [
+        os.path.join(output_dir, filename.replace("_orig.txt", "_clean.txt")) for filename in filenames
+    ]
+
+    if chunk_mb > 0:
+        print(f"Warning: files over {chunk_mb:g} MB are tokenised in chunks; "
+              f"words at chunk boundaries can differ from whole-file tokenisation")
+
+    start_time = time.perf_counter()
+    all_chunks, keys = get_input_keys(input_paths, int(chunk_mb * 1024 * 1024))
+    cached = list_cache_entries(cache_dir) if cache_dir else {}
+
+    tasks = []
+    num_chunks = []
+    cache_hits = 0
+    for file_index, (input_path, chunks) in enumerate(zip(input_paths, all_chunks)):
+        num_chunks.append(len(chunks))
+        if keys[file_index] in cached:
+            # Unchanged file: reuse the cleaned output
+            shutil.copyfile(cached[keys[file_index]][0], output_paths[file_index])
+            cache_hits += 1
+            continue
+        tasks.extend((file_index, chunk_index, input_path, start, end) for chunk_index, (start, end) in enumerate(chunks))
+    # Largest chunks first keeps all workers busy until the end
+    tasks.sort(key=lambda task: task[4] - task[3], reverse=True)
+    files_done = cache_hits
+
+    total_bytes = sum(os.path.getsize(path) for path in input_paths)
+    tokenise_bytes = sum(task[4] - task[3] for task in tasks)
+    print(f"{len(filenames)} files ({total_bytes / 1024 / 1024:.1f} MB): {cache_hits} cached, "
+          f"{len(filenames) - cache_hits} to tokenise ({tokenise_bytes / 1024 / 1024:.1f} MB) in {len(tasks)} chunks "
+          f"with {workers} worker(s)")
+
+    pending = {}
+
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(tokenize_chunk, tasks) if pool else map(tokenize_chunk, tasks)
+        for file_index, chunk_index, cleaned_text, num_tokens, seconds in results:
+            parts = pending.setdefault(file_index, {'chunks': {}, 'tokens': 0, 'seconds': 0.0})
+            parts['chunks'][chunk_index] = cleaned_text
+            parts['tokens'] += num_tokens
+            parts['seconds'] += seconds
+            if len(parts['chunks']) < num_chunks[file_index]:
+                continue
+
+            # All chunks of the file are done: join tokens line by line and save
+            del pending[file_index]
+            chunk_texts = [parts['chunks'][i] for i in range(num_chunks[file_index])]
+            with open(output_paths[file_index], "w", encoding="utf-8") as f:
+                f.write("\n".join(text for text in chunk_texts if text))
+            if cache_dir:
+                save_cache_entry(cache_dir, keys[file_index], output_paths[file_index])
+
+            files_done += 1
+            print(f"  [{files_done}/{len(filenames)}] {output_paths[file_index]}: {parts['tokens']} tokens, "
+                  f"{num_chunks[file_index]} chunk(s), {parts['seconds']:.2f}s tokenising "
+                  f"({time.perf_counter() - start_time:.1f}s elapsed)")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    # Combine all cleaned texts into one file
+    write_combined(output_paths, combine_file)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Tokenised {tokenise_bytes / 1024 / 1024:.1f} MB in {elapsed:.1f}s "
+          f"({tokenise_bytes / 1024 / 1024 / max(elapsed, 1e-9):.2f} MB/s)")
+    if cache_dir:
+        print(f"Cache: {cache_hits} hits, {len(filenames) - cache_hits} misses "
+              f"({cache_hits / max(len(filenames), 1) * 100:.1f}% hit rate)")
+    print("All cleaned texts combined into:", combine_file)
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Tokenise and clean the Khmer news dumps")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS,
+                        help=f"tokeniser processes, 1 = serial (default: {NUM_WORKERS})")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB,
+                        help=f"tokenise files larger than this in line-aligned chunks, 0 = whole files; "
+                             f"chunking can change the output (default: {CHUNK_MB})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"tokenisation cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="tokenise every file and leave the cache untouched")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="print cache statistics and exit")
+    parser.add_argument("--prune", action="store_true",
+                        help="remove cache entries not used by the current inputs and exit")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.cache_stats:
+        show_cache_stats(args.cache_dir, args.chunk_mb)
+    elif args.prune:
+        prune_cache(args.cache_dir, args.chunk_mb)
+    else:
+        main(workers=max(1, args.workers), chunk_mb=args.chunk_mb,
+             cache_dir=None if args.no_cache else args.cache_dir)
@@ -1,17 +1,274 @@
 import os
 import cv2
+import glob
+import json
+import cProfile
 import random
-from process.config import TEXT_FILE, OUTPUT_IMAGE_DIR, IMAGES_PER_FONT, FONT_SIZE_MIN, FONT_SIZE_MAX, MIN_WORDS_PER_IMAGE, MAX_WORDS_PER_IMAGE, PAGE_SIZES
+import signal
+import argparse
+import multiprocessing
+from multiprocessing.util import Finalize
+from process.config import TEXT_FILE, OUTPUT_IMAGE_DIR, IMAGES_PER_FONT, PAGE_SIZES, NUM_WORKERS, RANDOM_SEED
+from process.config import FONT_SIZE_MIN, FONT_SIZE_MAX
+from process.config import METRICS_CACHE_SIZE, METRICS_CACHE_DIR
+from process.config import RENDER_ENGINE, SPRITE_CACHE_MB, OUTPUT_COLOR_MODE, IMAGE_FORMAT
+from process.config import PNG_COMPRESSION, JPEG_QUALITY
+from process.config import MANIFEST_FILE, OUTPUT_FORMAT, SHARD_DIR, SHARD_MAX_PAGES
+from process.config import COLLECT_STATS, STATS_FILE, STATS_REPORT_EVERY, PROFILE_DIR
 from process.random_fonts import FontManager
 from process.image_processing import ImageGenerator
 from process.yolo_format import YoloFormatter
 from process.xml_format import XmlFormatter
+from process.generation_plan import GenerationPlan
+from process.metrics_cache import WordMetricsCache
+from process.sprite_renderer import SpriteRenderer
+from process.image_output import ImageEncoder
+from process.page_writer import PageWriter
+from process.manifest import GenerationManifest
+from process.corpus import Corpus
+from process.shards import ShardWriter
+from process.pipeline_stats import PipelineStats, ThroughputReporter
 
-def main():
+# Per-process rendering state, filled by init_worker
+_worker_state = {}
+
+# Font manager warmed up in the parent; inherited by forked workers
+_parent_font_manager = None
+
+def exit_on_sigterm(signum, frame):
+    """Turn Pool.terminate() into a normal exit so queued pages get written"""
+    raise SystemExit(1)
+
+def get_worker_stats_path(pid):
+    """Path a worker process dumps its pipeline stats to on exit"""
+    return f"{os.path.splitext(STATS_FILE)[0]}.worker-{pid}.json"
+
+def dump_profile(profiler):
+    """Stop a cProfile profiler and write its stats to PROFILE_DIR"""
+    profiler.disable()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"profile_{os.getpid()}.prof"))
+
+def init_worker(corpus_prefix, manifest_path, layout_only=False, pool_worker=False, profile=False,
+                output_format=OUTPUT_FORMAT):
+    """
+    Initialize the rendering state of a worker process
+    Each worker owns its FontManager/ImageGenerator and its page writer; the
+    memory-mapped corpus is shared with all other workers through the page cache
+    Args:
+        corpus_prefix: Path prefix of the built corpus
+        manifest_path: Generation manifest that completed pages are appended to
+        layout_only: Write labels only, without rasterising pages
+        pool_worker: True in a multiprocessing pool worker
+        profile: Run the process under cProfile and dump it on exit
+        output_format: "files" for loose files, "shards" for packed shards
+    """
+    # One process per core already; keep OpenCV from spawning its own threads
+    cv2.setNumThreads(1)
+    
+    if pool_worker:
+        # Ctrl-C is handled by the parent, which terminates the pool
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, exit_on_sigterm)
+    
+    font_manager = _parent_font_manager or FontManager(verbose=False)
+    # The planner already measured and saved every planned word; rendering
+    # processes only read the store, so they never rewrite it concurrently
+    metrics_cache = WordMetricsCache(METRICS_CACHE_SIZE, METRICS_CACHE_DIR, read_only=True)
+    stats = PipelineStats(COLLECT_STATS)
+    _worker_state['corpus'] = Corpus(corpus_prefix)
+    sprite_renderer = SpriteRenderer(SPRITE_CACHE_MB * 1024 * 1024) if RENDER_ENGINE == "sprite" else None
+    _worker_state['image_generator'] = ImageGenerator(font_manager, metrics_cache, RENDER_ENGINE, sprite_renderer,
+                                                      stats=stats)
+    manifest = GenerationManifest(manifest_path)
+    if output_format == "shards":
+        # Each process fills its own shards; records are appended per finished shard
+        shard_writer = ShardWriter(manifest=manifest)
+        page_writer = PageWriter(ImageEncoder(), YoloFormatter(), XmlFormatter(), manifest=manifest, stats=stats,
+                                 shard_writer=shard_writer)
+    else:
+        page_writer = PageWriter(ImageEncoder(), YoloFormatter(), XmlFormatter(), manifest=manifest, stats=stats)
+    _worker_state['page_writer'] = page_writer
+    _worker_state['layout_only'] = layout_only
+    
+    # On exit, write queued pages
+    Finalize(page_writer, page_writer.close, exitpriority=20)
+    if pool_worker:
+        # Collected by the parent once the pool has exited
+        Finalize(stats, stats.dump, args=(get_worker_stats_path(os.getpid()),), exitpriority=5)
+    
+    if profile:
+        # Dumped on exit, after the writer threads have finished
+        profiler = cProfile.Profile()
+        Finalize(profiler, dump_profile, args=(profiler,), exitpriority=5)
+        profiler.enable()
+
+def render_page(page, corpus, image_generator, page_writer, layout_only=False):
+    """
+    Render one planned page and queue its image, YOLO and XML files for writing
+    Args:
+        page: Page entry from GenerationPlan
+        corpus: Corpus instance
+        image_generator: ImageGenerator instance
+        page_writer: PageWriter instance
+        layout_only: Lay out the page and write its labels, but no image
+    Returns:
+        dict: Statistics of the rendered page
+    """
+    start = page['word_start']
+    limited_words = corpus.window(start, page['word_count'])
+    
+    # Page size and margins come from the per-image seed
+    rng = random.Random(page['seed'])
+    if layout_only:
+        img_cv = None
+        word_boxes, words_used, img_width, img_height = image_generator.generate_layout(
+            limited_words,
+            page['font_path'],
+            page['font_size'],
+            rng=rng
+        )
+    else:
+        img_cv, word_boxes, words_used, img_width, img_height = image_generator.generate_image(
+            limited_words,
+            page['font_path'],
+            page['font_size'],
+            rng=rng
+        )
+    
+    # Create unique filename with zero-padded numbering
+    output_filename = f"img_{page['image_number']:05d}"
+    image_name = f"{output_filename}{page_writer.image_encoder.extension}"
+    
+    # Manifest entry, written once all three files are on disk
+    record = {
+        'image_number': page['image_number'],
+        'font': os.path.splitext(os.path.basename(page['font_path']))[0],
+        'font_size': page['font_size'],
+        'width': img_width,
+        'height': img_height,
+        'word_start': start,
+        'word_end': start + words_used,
+        'word_count': len(word_boxes),
+        'seed': page['seed']
+    }
+    
+    # Save image, YOLO and XML labels on the write-behind threads
+    page_writer.submit(img_cv, word_boxes, image_name, output_filename, img_width, img_height, record)
+    
+    return {
+        'image_number': page['image_number'],
+        'img_num': page['img_num'],
+        'font_idx': page['font_idx'],
+        'font_size': page['font_size'],
+        'output_filename': output_filename,
+        'image_name': image_name,
+        'word_count': len(word_boxes),
+        'words_used': words_used,
+        'width': img_width,
+        'height': img_height
+    }
+
+def count_page_words(page, corpus, image_generator):
+    """
+    Number of words of a planned window that fit on the page
+    Lays the page out with its own seed, exactly as render_page will, but
+    without rasterising it.
+    """
+    words = corpus.window(page['word_start'], page['word_count'])
+    layout, _, _, _ = image_generator.plan_layout(
+        words,
+        page['font_path'],
+        page['font_size'],
+        rng=random.Random(page['seed'])
+    )
+    return layout['words_used']
+
+def render_worker(page):
+    """Render a page with the state of the current worker process"""
+    font_manager = _worker_state['image_generator'].font_manager
+    pool_hits, pool_misses = font_manager.pool_hits, font_manager.pool_misses
+    
+    result = render_page(page, **_worker_state)
+    
+    # Font pool usage of this page, summed up by the parent
+    result['font_pool_hits'] = font_manager.pool_hits - pool_hits
+    result['font_pool_misses'] = font_manager.pool_misses - pool_misses
+    return result
+
+def iter_results(pages, corpus_prefix, num_workers, font_manager=None, layout_only=False, profile=False,
+                 output_format=OUTPUT_FORMAT):
+    """
+    Render pages of the plan, yielding results in plan order
+    Args:
+        pages: Page entries from GenerationPlan
+        corpus_prefix: Path prefix of the built corpus
+        num_workers: Number of rendering processes (1 = render in this process)
+        font_manager: Optional warmed-up FontManager shared with the workers
+        layout_only: Write labels only, without rasterising pages
+        profile: Run every rendering process under cProfile
+        output_format: "files" for loose files, "shards" for packed shards
+    """
+    global _parent_font_manager
+    _parent_font_manager = font_manager
+    
+    if num_workers == 1:
+        init_worker(corpus_prefix, MANIFEST_FILE, layout_only, profile=profile, output_format=output_format)
+        try:
+            for page in pages:
+                yield render_worker(page)
+        finally:
+            # Flush queued pages on completion, Ctrl-C and errors alike
+            _worker_state['page_writer'].close()
+        return
+    
+    # Contiguous shards keep each worker on one font for a while
+    chunksize = max(1, min(32, len(pages) // (num_workers * 8)))
+    pool = multiprocessing.Pool(num_workers, initializer=init_worker,
+                                initargs=(corpus_prefix, MANIFEST_FILE, layout_only, True, profile, output_format))
+    try:
+        yield from pool.imap(render_worker, pages, chunksize=chunksize)
+        # Let workers exit normally so they flush their writers and caches
+        pool.close()
+    except BaseException:
+        # Workers turn SIGTERM into a normal exit and still flush
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def collect_stats():
+    """
+    Merge the pipeline stats of this process and of all exited workers
+    Returns:
+        PipelineStats: Summed timings and counters
+    """
+    stats = PipelineStats()
+    if 'image_generator' in _worker_state:
+        stats.merge(_worker_state['image_generator'].stats.to_dict())
+    
+    for path in glob.glob(get_worker_stats_path("*")):
+        with open(path, "r", encoding="utf-8") as f:
+            stats.merge(json.load(f))
+        os.remove(path)
+    return stats
+
+def main(resume=False, verify_hashes=False, layout_only=False, profile=False, output_format=OUTPUT_FORMAT):
     """
     Main function to generate images with YOLO and XML annotations
     Generates specified number of images per font with random page sizes
+    Args:
+        resume: Skip images already recorded as complete in the manifest
+        verify_hashes: When resuming, re-hash files instead of checking sizes
+        layout_only: Write YOLO and XML labels without rasterising images
+        profile: Dump a cProfile file per rendering process to PROFILE_DIR
+        output_format: "files" for loose files, "shards" for packed shards
     """
+    if output_format not in ("files", "shards"):
+        raise ValueError(f"Unknown output format: {output_format}")
+    # Invalid image settings fail here rather than in every worker
+    ImageEncoder()
+    
     print("=" * 70)
     print("KHMER TEXT IMAGE GENERATOR (Font-Based Generation)")
     print("=" * 70)
@@ -22,101 +279,143 @@ def main():
     all_fonts = font_manager.get_all_fonts()
     total_fonts = font_manager.get_font_count()
     
-    print("\n[2] Initializing Image Generator...")
-    image_generator = ImageGenerator(font_manager)
+    # Load font files and pooled sizes once, before any worker is forked
+    font_manager.warm_up(all_fonts, range(FONT_SIZE_MIN, FONT_SIZE_MAX + 1))
+    print(f"Font pool warmed up with {len(font_manager.font_pool)} font/size pairs")
     
-    print("\n[3] Loading Khmer text data...")
-    with open(TEXT_FILE, "r", encoding="utf-8") as f:
-        all_words = [line.strip() for line in f if line.strip()]
-    print(f"Loaded {len(all_words)} words from {TEXT_FILE}")
+    num_workers = NUM_WORKERS or os.cpu_count()
+    print(f"\n[2] Rendering with {num_workers} worker process(es), engine: {RENDER_ENGINE}...")
+    if layout_only:
+        print("    Output: layout only (labels, no images)")
+    else:
+        print(f"    Output: {OUTPUT_COLOR_MODE} {IMAGE_FORMAT.upper()}")
+    if output_format == "shards":
+        print(f"    Packed into shards of up to {SHARD_MAX_PAGES} pages in {SHARD_DIR}/")
     
-    # Initialize formatters
-    yolo_formatter = YoloFormatter()
-    xml_formatter = XmlFormatter()
+    print("\n[3] Loading Khmer text data...")
+    corpus = Corpus.open(TEXT_FILE)
+    print(f"Loaded {len(corpus)} words ({len(corpus.vocab)} unique) from {TEXT_FILE}")
     
-    # Calculate total images to generate
-    total_images = total_fonts * IMAGES_PER_FONT
+    # Calculate total images to generate; every page is laid out once to advance the corpus cursor
+    print("    Laying out pages to plan the corpus windows...")
+    planner_metrics = WordMetricsCache(METRICS_CACHE_SIZE, METRICS_CACHE_DIR)
+    planner = ImageGenerator(font_manager, planner_metrics, "draw")
+    plan = GenerationPlan(all_fonts, IMAGES_PER_FONT, len(corpus), RANDOM_SEED,
+                          lambda page: count_page_words(page, corpus, planner))
+    # The planner is the only writer of the store; rendering processes read it
+    planner_metrics.save()
+    total_images = len(plan)
     print(f"\n[4] Generation Plan:")
     print(f"    Total fonts: {total_fonts}")
     print(f"    Images per font: {IMAGES_PER_FONT}")
     print(f"    Total images to generate: {total_images}")
     print(f"    Page sizes: {PAGE_SIZES[0]} (Landscape) and {PAGE_SIZES[1]} (Portrait)")
+    print(f"    Random seed: {RANDOM_SEED}")
+    
+    # Same plan, corpus content and output settings are required to resume
+    plan_info = plan.describe()
+    plan_info['corpus_sha256'] = corpus.meta['source_sha256']
+    plan_info['image_format'] = IMAGE_FORMAT
+    plan_info['color_mode'] = OUTPUT_COLOR_MODE
+    plan_info['png_compression'] = PNG_COMPRESSION
+    plan_info['jpeg_quality'] = JPEG_QUALITY
+    plan_info['layout_only'] = layout_only
+    plan_info['output_format'] = output_format
+    
+    manifest = GenerationManifest(MANIFEST_FILE)
+    completed = {}
+    if resume:
+        completed = manifest.load_completed(plan_info, verify_hashes)
+        print(f"    Resuming: {len(completed)} images already complete, "
+              f"{total_images - len(completed)} to generate")
+    else:
+        manifest.start(plan_info)
+    pages = [page for page in plan if page['image_number'] not in completed]
     
     # Generate images
     print("\n[5] Starting image generation...")
     print("-" * 70)
     
-    overall_image_count = 0
+    overall_image_count = len(completed)
     total_words_processed = 0
-    word_index = 0
+    font_pool_hits = 0
+    font_pool_misses = 0
     size_counts = {str(size): 0 for size in PAGE_SIZES}
+    current_font_idx = None
     
-    # Generate images for each font
-    for font_idx, font_path in enumerate(all_fonts, 1):
-        font_name = font_manager.get_font_name(font_path)
+    # Images completed by an earlier run still count towards the summary
+    for record in completed.values():
+        size_counts[str((record['width'], record['height']))] += 1
+        total_words_processed += record['word_count']
+    
+    # Stats left behind by workers of an interrupted run
+    for path in glob.glob(get_worker_stats_path("*")):
+        os.remove(path)
+    
+    reporter = ThroughputReporter(total_images, STATS_REPORT_EVERY, len(completed))
+    for result in iter_results(pages, corpus.prefix, num_workers, font_manager, layout_only, profile, output_format):
+        overall_image_count += 1
+        reporter.update(result['word_count'])
+        img_num = result['img_num']
         
-        print(f"\n--- Font {font_idx}/{total_fonts}: {font_name} ---")
+        if result['font_idx'] != current_font_idx:
+            current_font_idx = result['font_idx']
+            font_name = font_manager.get_font_name(all_fonts[result['font_idx'] - 1])
+            print(f"\n--- Font {result['font_idx']}/{total_fonts}: {font_name} ---")
         
-        for img_num in range(1, IMAGES_PER_FONT + 1):
-            overall_image_count += 1
-            
-            # Reset to beginning of words if we run out
-            if word_index >= len(all_words):
-                word_index = 0
-            
-            # Get remaining words to process
-            remaining_words = all_words[word_index:]
-            
-            words_to_use = random.randint(MIN_WORDS_PER_IMAGE, MAX_WORDS_PER_IMAGE)
-            limited_words = remaining_words[:words_to_use]
-
-            # Random font size for each image
-            font_size = random.randint(FONT_SIZE_MIN, FONT_SIZE_MAX)
-            
-            # Generate image with random page size
-            img_cv, word_boxes, words_used, img_width, img_height = image_generator.generate_image(
-                limited_words, 
-                font_path,
-                font_size
-            )
-            
-            # Track page size usage
-            size_counts[str((img_width, img_height))] += 1
-            
-            # Create unique filename with zero-padded numbering
-            output_filename = f"img_{overall_image_count:05d}"
-            image_name = f"{output_filename}.png"
-            image_path = os.path.join(OUTPUT_IMAGE_DIR, image_name)
-            
-            # Save image
-            cv2.imwrite(image_path, img_cv)
-            
-            # Generate YOLO label with image dimensions
-            yolo_formatter.generate_yolo_label(word_boxes, output_filename, img_width, img_height)
-            
-            # Generate XML label with image dimensions
-            xml_formatter.generate_xml_label(word_boxes, image_name, output_filename, img_width, img_height)
-            
-            # Update statistics
-            word_index += words_used
-            total_words_processed += len(word_boxes)
-            
-            # Print progress every 500 images or on first/last of each font
-            if img_num == 1 or img_num == IMAGES_PER_FONT or img_num % 500 == 0:
-                progress = (overall_image_count / total_images) * 100
-                print(f"  [{progress:5.1f}%] Image {img_num:4d}/{IMAGES_PER_FONT} | "
-                      f"Words: {len(word_boxes):3d} | Size: {font_size}pt | "
-                      f"Dims: {img_width}x{img_height} | "
-                      f"File: {output_filename}.png")
+        # Track page size usage
+        size_counts[str((result['width'], result['height']))] += 1
+        
+        # Update statistics
+        total_words_processed += result['word_count']
+        font_pool_hits += result['font_pool_hits']
+        font_pool_misses += result['font_pool_misses']
+        
+        # Print progress every 500 images or on first/last of each font
+        if img_num == 1 or img_num == IMAGES_PER_FONT or img_num % 500 == 0:
+            progress = (overall_image_count / total_images) * 100
+            print(f"  [{progress:5.1f}%] Image {img_num:4d}/{IMAGES_PER_FONT} | "
+                  f"Words: {result['word_count']:3d} | Size: {result['font_size']}pt | "
+                  f"Dims: {result['width']}x{result['height']} | "
+                  f"File: {result['image_name']}")
+    
+    elapsed = reporter.get_elapsed()
+    stats = collect_stats()
+    run_stats = {
+        'elapsed_seconds': round(elapsed, 3),
+        'workers': num_workers,
+        'render_engine': RENDER_ENGINE,
+        'layout_only': layout_only,
+        'pages': reporter.pages,
+        'words': reporter.words,
+        'pages_per_sec': round(reporter.pages / elapsed, 3) if elapsed else None,
+        'words_per_sec': round(reporter.words / elapsed, 1) if elapsed else None,
+        'font_pool': {'hits': font_pool_hits, 'misses': font_pool_misses},
+        **stats.to_dict()
+    }
+    with open(STATS_FILE, "w", encoding="utf-8") as f:
+        json.dump(run_stats, f, indent=2)
     
     # Final summary
     print("\n" + "-" * 70)
     print("\n[6] Generation Complete!")
     print(f"    Total fonts processed: {total_fonts}")
     print(f"    Images per font: {IMAGES_PER_FONT}")
-    print(f"    Total images generated: {overall_image_count}")
+    print(f"    Total images {'laid out' if layout_only else 'generated'}: {overall_image_count}")
     print(f"    Total words processed: {total_words_processed}")
-    print(f"    Word recycling cycles: {word_index // len(all_words)}")
+    print(f"    Word recycling cycles: {plan.recycle_count}")
+    print(f"    Font pool: {font_pool_hits} hits, {font_pool_misses} misses")
+    print(f"    {reporter.format_report()}")
+    
+    # Time per stage, summed over all rendering processes and writer threads
+    if stats.seconds:
+        total_seconds = sum(stats.seconds.values())
+        print(f"\n    Stage timings (all processes):")
+        for stage, seconds in sorted(stats.seconds.items(), key=lambda item: -item[1]):
+            print(f"      - {stage:12s} {seconds:9.2f} s ({seconds / total_seconds * 100:5.1f}%)")
+    print(f"    Stats written to {STATS_FILE}")
+    if profile:
+        print(f"    cProfile dumps: {PROFILE_DIR}/profile_<pid>.prof")
     
     # Page size distribution
     print(f"\n    Page size distribution:")
@@ -125,9 +424,12 @@ def main():
         print(f"      - {size}: {count} images ({percentage:.1f}%)")
     
     print(f"\n    Output directories:")
-    print(f"      - Images: {OUTPUT_IMAGE_DIR}/")
-    print(f"      - YOLO labels: labels/")
-    print(f"      - XML labels: xml_labels/")
+    if output_format == "shards":
+        print(f"      - Shards: {SHARD_DIR}/ (unpack with unpack_shards.py)")
+    else:
+        print(f"      - Images: {OUTPUT_IMAGE_DIR}/")
+        print(f"      - YOLO labels: labels/")
+        print(f"      - XML labels: xml_labels/")
     print("=" * 70)
     
     # Print per-font summary
@@ -137,9 +439,26 @@ def main():
         print(f"  {font_idx:2d}. {font_name:40s} - {IMAGES_PER_FONT} images")
     print("=" * 70)
 
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Generate Khmer text images with YOLO and XML labels")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"continue an interrupted run recorded in {MANIFEST_FILE}")
+    parser.add_argument("--verify-hashes", action="store_true",
+                        help="with --resume, re-hash existing files instead of checking sizes")
+    parser.add_argument("--layout-only", action="store_true",
+                        help="write YOLO and XML labels without rasterising images")
+    parser.add_argument("--output-format", choices=("files", "shards"), default=OUTPUT_FORMAT,
+                        help=f"loose files or packed shards in {SHARD_DIR}/ (default: {OUTPUT_FORMAT})")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"dump a cProfile file per rendering process to {PROFILE_DIR}/")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        main()
+        main(resume=args.resume, verify_hashes=args.verify_hashes, layout_only=args.layout_only,
+             profile=args.profile, output_format=args.output_format)
     except KeyboardInterrupt:
         print("\n\nProcess interrupted by user.")
     except Exception as e:
@@ -0,0 +1,328 @@
+import os
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from process.config import (
+    INFERENCE_MODEL_PATH, INFERENCE_IMAGE_SIZE, INFERENCE_BATCH_SIZE, INFERENCE_DECODE_WORKERS,
+    INFERENCE_CONF, INFERENCE_IOU, INFERENCE_MAX_DET, INFERENCE_DEVICE, INFERENCE_OUTPUT_DIR,
+    INFERENCE_TILED, INFERENCE_TILE_SIZE, INFERENCE_TILE_OVERLAP, INFERENCE_TILE_BATCH_SIZE, INFERENCE_TILE_MERGE,
+    INFERENCE_BACKEND, INFERENCE_ONNX_MODEL_PATH, INFERENCE_INTRA_OP_THREADS, INFERENCE_INTER_OP_THREADS
+)
+from process.inference import (
+    create_detector, TiledDetector, BatchRunner, find_images, load_image, write_prediction
+)
+from process.evaluation import match_predictions
+from process.pipeline_stats import PipelineStats
+
+try:
+    import resource
+except ImportError:  # Windows: no peak memory in --compare-backends
+    resource = None
+
+# === CONFIGURATION ===
+SOURCE = "dataset/test/images"  # Image directory or single image
+BENCHMARK_IMAGES = 20           # Pages timed per mode by --benchmark
+COMPARE_IMAGES = 20             # Pages run through both backends by --compare-backends
+PARITY_MIN_MATCH = 0.99         # Share of boxes the backends must agree on at IoU 0.5
+
+def run_inference(detector, image_paths, output_dir, batch_size=INFERENCE_BATCH_SIZE,
+                  decode_workers=INFERENCE_DECODE_WORKERS, save_conf=True, stats=None):
+    """
+    Run batched inference and write YOLO and XML labels
+    Args:
+        detector: Detector with predict(images), e.g. UltralyticsDetector
+        image_paths: Images to process
+        output_dir: Receives labels/ (YOLO, with confidences) and xml_labels/
+        batch_size: Pages per model call
+        decode_workers: Decoding threads
+        save_conf: Add the confidence as sixth column of the YOLO labels
+        stats: Optional PipelineStats, e.g. shared with a TiledDetector
+    Returns:
+        tuple: (PipelineStats, list of (path, error) of unreadable images, seconds)
+    """
+    label_dir = os.path.join(output_dir, "labels")
+    xml_dir = os.path.join(output_dir, "xml_labels")
+    os.makedirs(label_dir, exist_ok=True)
+    os.makedirs(xml_dir, exist_ok=True)
+
+    stats = stats or PipelineStats()
+    runner = BatchRunner(detector, batch_size, decode_workers, stats)
+
+    start_time = time.perf_counter()
+    last_report = start_time
+    for result in runner.run(image_paths):
+        with stats.timer('write'):
+            write_prediction(result, label_dir, xml_dir, save_conf)
+
+        now = time.perf_counter()
+        if now - last_report >= 10:
+            last_report = now
+            pages = stats.counters.get('pages', 0)
+            print(f"  {pages}/{len(image_paths)} images ({pages / (now - start_time):.2f} images/sec)")
+
+    return stats, runner.errors, time.perf_counter() - start_time
+
+def print_summary(stats, seconds):
+    """Print throughput and per-stage times of an inference run"""
+    data = stats.to_dict()
+    pages = data['counters'].get('pages', 0)
+    detections = data['counters'].get('detections', 0)
+    print(f"\nProcessed {pages} images in {seconds:.1f}s ({pages / max(seconds, 1e-9):.2f} images/sec), "
+          f"{detections} detections ({detections / max(pages, 1):.0f} per image)")
+    for stage, entry in data['stages'].items():
+        print(f"  {stage:12s} {entry['seconds']:8.2f}s  {entry['mean_ms']:8.1f} ms/call")
+
+def benchmark(make_detector, image_paths, output_dir, image_size, batch_size, decode_workers,
+              iou, tile_size, tile_overlap, tile_batch_size, merge):
+    """
+    Time full-page (downscaled) and tiled inference on the same pages
+    Labels of each mode go to output_dir/full and output_dir/tiled, so the
+    two can be compared with the ground truth afterwards.
+    Args:
+        make_detector: Function of the inference size returning a detector
+    """
+    image_paths = image_paths[:BENCHMARK_IMAGES]
+    print(f"Benchmark on {len(image_paths)} images")
+    rows = []
+    for mode in ("full", "tiled"):
+        stats = PipelineStats()
+        if mode == "full":
+            detector = make_detector(image_size)
+            mode_batch_size = batch_size
+        else:
+            detector = TiledDetector(
+                make_detector(tile_size),
+                tile_size, tile_overlap, tile_batch_size, iou, merge, stats=stats
+            )
+            # Tiles are batched by the TiledDetector; one page per call keeps memory flat
+            mode_batch_size = 1
+
+        print(f"\n[{mode}]")
+        stats, errors, seconds = run_inference(
+            detector, image_paths, os.path.join(output_dir, mode), mode_batch_size, decode_workers, stats=stats
+        )
+        print_summary(stats, seconds)
+        pages = stats.counters.get('pages', 0)
+        rows.append((mode, pages / max(seconds, 1e-9), stats.counters.get('detections', 0) / max(pages, 1)))
+
+    print(f"\n{'mode':8s} {'images/sec':>12s} {'boxes/image':>12s}")
+    for mode, rate, boxes in rows:
+        print(f"{mode:8s} {rate:12.2f} {boxes:12.0f}")
+
+def measure_startup(backend, model_path, image_size, conf, iou, max_det, device, intra_op_threads, inter_op_threads):
+    """
+    Import and load time of a backend (run in a fresh process)
+    Returns:
+        tuple: (seconds, peak resident memory in MB or None)
+    """
+    start_time = time.perf_counter()
+    create_detector(backend, model_path, image_size, conf, iou, max_det, device, intra_op_threads, inter_op_threads)
+    seconds = time.perf_counter() - start_time
+    if resource is None:
+        return seconds, None
+    # ru_maxrss is in KB on Linux
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def compare_backends(model_path, onnx_model_path, image_paths, image_size, conf, iou, max_det, device,
+                     intra_op_threads, inter_op_threads):
+    """
+    Check the ONNX Runtime backend against the PyTorch (Ultralytics) one
+    Startup is measured in a fresh process per backend, so each pays its
+    own imports. Latency is the time of single-page predict calls after a
+    warm-up page. For accuracy, the PyTorch boxes of each page are the
+    reference and the ONNX boxes are matched to them as in evaluate.py.
+    Returns:
+        bool: True if the backends agree on at least PARITY_MIN_MATCH of
+              the boxes at IoU 0.5, in both directions
+    """
+    image_paths = image_paths[:COMPARE_IMAGES]
+    backends = [("ultralytics", model_path), ("onnx", onnx_model_path)]
+    print(f"Comparing backends on {len(image_paths)} images")
+
+    print("\nStartup (fresh process, imports and model load)")
+    context = multiprocessing.get_context("spawn")
+    for backend, path in backends:
+        with context.Pool(1) as pool:
+            seconds, peak_mb = pool.apply(measure_startup, (
+                backend, path, image_size, conf, iou, max_det, device, intra_op_threads, inter_op_threads
+            ))
+        memory = f", peak memory {peak_mb:.0f} MB" if peak_mb is not None else ""
+        print(f"  {backend:12s} {seconds:6.2f}s{memory}")
+
+    images = [load_image(path) for path in image_paths]
+    predictions = {}
+    print("\nLatency (one page per call)")
+    for backend, path in backends:
+        detector = create_detector(
+            backend, path, image_size, conf, iou, max_det, device, intra_op_threads, inter_op_threads
+        )
+        detector.predict(images[:1])
+        times = []
+        predictions[backend] = []
+        for image in images:
+            start_time = time.perf_counter()
+            predictions[backend].extend(detector.predict([image]))
+            times.append(time.perf_counter() - start_time)
+        times = np.array(times) * 1000
+        print(f"  {backend:12s} mean {times.mean():8.1f} ms, median {np.median(times):8.1f} ms, "
+              f"max {times.max():8.1f} ms")
+
+    # matched[k]: boxes of the ONNX backend matching a PyTorch box at IoU 0.5 and 0.95
+    reference_count = onnx_count = 0
+    matched = np.zeros(2, dtype=np.int64)
+    for (reference_boxes, _), (boxes, scores) in zip(predictions["ultralytics"], predictions["onnx"]):
+        order = np.argsort(-scores, kind="stable")
+        correct = match_predictions(reference_boxes, boxes[order])
+        matched += correct[:, [0, -1]].sum(axis=0)
+        reference_count += len(reference_boxes)
+        onnx_count += len(boxes)
+
+    recall = matched / max(reference_count, 1)
+    precision = matched / max(onnx_count, 1)
+    print(f"\nAccuracy (PyTorch boxes as reference): {reference_count} PyTorch, {onnx_count} ONNX boxes")
+    print(f"  IoU 0.50: {recall[0]:.2%} of PyTorch boxes found, {precision[0]:.2%} of ONNX boxes matched")
+    print(f"  IoU 0.95: {recall[1]:.2%} of PyTorch boxes found, {precision[1]:.2%} of ONNX boxes matched")
+
+    parity = min(recall[0], precision[0]) >= PARITY_MIN_MATCH
+    print(f"\nParity at IoU 0.5: {'OK' if parity else 'FAILED'} (minimum {PARITY_MIN_MATCH:.0%})")
+    return parity
+
+def main(model_path=INFERENCE_MODEL_PATH, source=SOURCE, output_dir=INFERENCE_OUTPUT_DIR,
+         image_size=INFERENCE_IMAGE_SIZE, batch_size=INFERENCE_BATCH_SIZE, decode_workers=INFERENCE_DECODE_WORKERS,
+         conf=INFERENCE_CONF, iou=INFERENCE_IOU, max_det=INFERENCE_MAX_DET, device=INFERENCE_DEVICE, save_conf=True,
+         tiled=INFERENCE_TILED, tile_size=INFERENCE_TILE_SIZE, tile_overlap=INFERENCE_TILE_OVERLAP,
+         tile_batch_size=INFERENCE_TILE_BATCH_SIZE, merge=INFERENCE_TILE_MERGE, run_benchmark=False,
+         backend=INFERENCE_BACKEND, onnx_model_path=INFERENCE_ONNX_MODEL_PATH,
+         intra_op_threads=INFERENCE_INTRA_OP_THREADS, inter_op_threads=INFERENCE_INTER_OP_THREADS,
+         run_compare=False):
+    """
+    Detect words on every page of source and write the predicted labels
+    The "ultralytics" backend loads model_path with PyTorch, the "onnx"
+    backend runs onnx_model_path with ONNX Runtime; run_compare checks the
+    two against each other instead.
+    """
+    print("=" * 70)
+    print("BATCH INFERENCE")
+    print("=" * 70)
+
+    needed = [model_path, onnx_model_path] if run_compare else [onnx_model_path if backend == "onnx" else model_path]
+    for path in needed:
+        if not os.path.exists(path):
+            print(f"Error: Model not found at {path}")
+            return
+    image_paths = find_images(source)
+    if not image_paths:
+        print(f"No images found in {source}")
+        return
+
+    if run_compare:
+        compare_backends(model_path, onnx_model_path, image_paths, image_size, conf, iou, max_det, device,
+                         intra_op_threads, inter_op_threads)
+        print("=" * 70)
+        return
+
+    device_info = device
+    if backend == "onnx":
+        model_path = onnx_model_path
+        device_info = f"cpu ({intra_op_threads or 'default'} intra-op / {inter_op_threads or 'default'} inter-op threads)"
+
+    def make_detector(size):
+        return create_detector(backend, model_path, size, conf, iou, max_det, device,
+                               intra_op_threads, inter_op_threads)
+
+    if run_benchmark:
+        benchmark(make_detector, image_paths, output_dir, image_size, batch_size, decode_workers,
+                  iou, tile_size, tile_overlap, tile_batch_size, merge)
+        print("=" * 70)
+        return
+
+    stats = PipelineStats()
+    start_time = time.perf_counter()
+    if tiled:
+        detector = TiledDetector(
+            make_detector(tile_size),
+            tile_size, tile_overlap, tile_batch_size, iou, merge, stats=stats
+        )
+        batch_size = 1
+    else:
+        detector = make_detector(image_size)
+    load_seconds = time.perf_counter() - start_time
+    if tiled:
+        print(f"Model: {model_path} ({backend}, loaded in {load_seconds:.1f}s), device {device_info}, "
+              f"{tile_size}px tiles, {tile_overlap}px overlap, {tile_batch_size} tiles per call, {merge} merge")
+    else:
+        print(f"Model: {model_path} ({backend}, loaded in {load_seconds:.1f}s), device {device_info}, "
+              f"imgsz {image_size}")
+    print(f"Images: {len(image_paths)} from {source}, batch size {batch_size}, {decode_workers} decode thread(s)")
+
+    stats, errors, seconds = run_inference(
+        detector, image_paths, output_dir, batch_size, decode_workers, save_conf, stats
+    )
+
+    print_summary(stats, seconds)
+    if errors:
+        print(f"\n{len(errors)} image(s) could not be read:")
+        for path, error in errors[:10]:
+            print(f"  - {path}: {error}")
+    print(f"\nLabels saved to {os.path.join(output_dir, 'labels')} and {os.path.join(output_dir, 'xml_labels')}")
+    print("=" * 70)
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Batched word detection on page images")
+    parser.add_argument("--model", default=INFERENCE_MODEL_PATH,
+                        help=f"PyTorch weights file (default: {INFERENCE_MODEL_PATH})")
+    parser.add_argument("--backend", choices=("ultralytics", "onnx"), default=INFERENCE_BACKEND,
+                        help=f"ultralytics runs --model, onnx runs --onnx-model on CPU (default: {INFERENCE_BACKEND})")
+    parser.add_argument("--onnx-model", default=INFERENCE_ONNX_MODEL_PATH,
+                        help=f"exported ONNX model (default: {INFERENCE_ONNX_MODEL_PATH})")
+    parser.add_argument("--intra-threads", type=int, default=INFERENCE_INTRA_OP_THREADS,
+                        help=f"ONNX Runtime threads per operator, 0 = default (default: {INFERENCE_INTRA_OP_THREADS})")
+    parser.add_argument("--inter-threads", type=int, default=INFERENCE_INTER_OP_THREADS,
+                        help=f"ONNX Runtime parallel operators, 0 = sequential (default: {INFERENCE_INTER_OP_THREADS})")
+    parser.add_argument("--source", default=SOURCE,
+                        help=f"image directory or image file (default: {SOURCE})")
+    parser.add_argument("--output-dir", default=INFERENCE_OUTPUT_DIR,
+                        help=f"output directory for labels/ and xml_labels/ (default: {INFERENCE_OUTPUT_DIR})")
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMAGE_SIZE,
+                        help=f"inference size (default: {INFERENCE_IMAGE_SIZE})")
+    parser.add_argument("--batch-size", type=int, default=INFERENCE_BATCH_SIZE,
+                        help=f"pages per model call (default: {INFERENCE_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=INFERENCE_DECODE_WORKERS,
+                        help=f"decoding threads (default: {INFERENCE_DECODE_WORKERS})")
+    parser.add_argument("--conf", type=float, default=INFERENCE_CONF,
+                        help=f"confidence threshold (default: {INFERENCE_CONF})")
+    parser.add_argument("--iou", type=float, default=INFERENCE_IOU,
+                        help=f"NMS IoU threshold (default: {INFERENCE_IOU})")
+    parser.add_argument("--max-det", type=int, default=INFERENCE_MAX_DET,
+                        help=f"maximum detections per page (default: {INFERENCE_MAX_DET})")
+    parser.add_argument("--device", default=INFERENCE_DEVICE,
+                        help=f"device (default: {INFERENCE_DEVICE})")
+    parser.add_argument("--no-conf", action="store_true",
+                        help="write 5-column YOLO labels without confidences")
+    parser.add_argument("--tiled", action="store_true", default=INFERENCE_TILED,
+                        help="run the model on native-resolution tiles instead of the downscaled page")
+    parser.add_argument("--tile-size", type=int, default=INFERENCE_TILE_SIZE,
+                        help=f"tile side in page pixels (default: {INFERENCE_TILE_SIZE})")
+    parser.add_argument("--tile-overlap", type=int, default=INFERENCE_TILE_OVERLAP,
+                        help=f"overlap of neighbouring tiles (default: {INFERENCE_TILE_OVERLAP})")
+    parser.add_argument("--tile-batch", type=int, default=INFERENCE_TILE_BATCH_SIZE,
+                        help=f"tiles per model call (default: {INFERENCE_TILE_BATCH_SIZE})")
+    parser.add_argument("--merge", choices=("nms", "fuse"), default=INFERENCE_TILE_MERGE,
+                        help=f"merge of duplicate boxes in tile overlaps (default: {INFERENCE_TILE_MERGE})")
+    parser.add_argument("--benchmark", action="store_true",
+                        help=f"time full-page and tiled inference on the first {BENCHMARK_IMAGES} images")
+    parser.add_argument("--compare-backends", action="store_true",
+                        help=f"check startup, latency and box parity of --onnx-model against --model "
+                             f"on the first {COMPARE_IMAGES} images")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.model, args.source, args.output_dir, args.imgsz, args.batch_size, args.workers,
+         args.conf, args.iou, args.max_det, args.device, save_conf=not args.no_conf,
+         tiled=args.tiled, tile_size=args.tile_size, tile_overlap=args.tile_overlap,
+         tile_batch_size=args.tile_batch, merge=args.merge, run_benchmark=args.benchmark,
+         backend=args.backend, onnx_model_path=args.onnx_model, intra_op_threads=args.intra_threads,
+         inter_op_threads=args.inter_threads, run_compare=args.compare_backends)
@@ -2,6 +2,7 @@ import os
 
 # === CONFIG ===
 TEXT_FILE = "combine_clean.txt"
+CORPUS_DIR = "corpus"  # Interned vocabulary + memory-mapped token ids built from TEXT_FILE
 FONT_DIR = "fonts"  # Folder containing all .ttf fonts
 OUTPUT_IMAGE_DIR = "images"
 OUTPUT_YOLO_DIR = "labels"
@@ -48,6 +49,75 @@ IMAGES_PER_FONT = 1000  # Number of images to generate per font
 # Words per image configuration
 MIN_WORDS_PER_IMAGE = 100
 MAX_WORDS_PER_IMAGE = 2000
+
+# Parallel generation
+NUM_WORKERS = 1   # Number of rendering processes (1 = serial, None = all cores)
+RANDOM_SEED = 42  # Seed of the generation plan; per-image seeds derive from it
+
+# Font pool: FreeTypeFont instances kept per (font file, size)
+FONT_POOL_SIZE = 512  # Enough for every bundled font at every size in range
+
+# Rendering engine: "draw" draws every word with ImageDraw.text,
+# "sprite" renders each (font, size, word) once and blits cached masks
+RENDER_ENGINE = "draw"
+SPRITE_CACHE_MB = 256  # Memory bound of the sprite cache per process
+
+# Layout engine: words are measured in chunks until the page is full
+LAYOUT_MEASURE_CHUNK = 512
+
+# Image output
+OUTPUT_COLOR_MODE = "RGB"  # "RGB", "L" (8-bit gray) or "1" (1-bit black/white, png only)
+IMAGE_FORMAT = "png"       # "png", "webp" (lossless) or "jpg"
+PNG_COMPRESSION = None     # None = OpenCV default (RLE), or 0 (fastest) .. 9 (smallest)
+JPEG_QUALITY = 95
+
+# Write-behind stage: encoding and file writes run on background threads
+WRITER_THREADS = 2     # Writer threads per rendering process (0 = write inline)
+WRITER_QUEUE_SIZE = 4  # Finished pages waiting to be written before rendering blocks
+
+# Output layout: "files" writes loose images/, labels/ and xml_labels/ files,
+# "shards" packs pages into indexed tar shards (see process/shards.py)
+OUTPUT_FORMAT = "files"
+SHARD_DIR = "shards"
+SHARD_MAX_PAGES = 1000  # Pages per shard
+SHARD_MAX_MB = 1024     # Shard size limit; whichever limit is reached first
+
+# Resumable generation: one JSON line per completed image (see main.py --resume)
+MANIFEST_FILE = "generation_manifest.jsonl"
+
+# Word-metrics cache (bbox offsets per font file, font size and word)
+METRICS_CACHE_SIZE = 200000         # In-memory LRU entries per process
+METRICS_CACHE_DIR = "cache/metrics"  # One JSON store per font, written by the planner; None = memory only
+
+# Pipeline statistics: per-stage timings and counters, written at the end of a run
+COLLECT_STATS = True                 # False turns stage timers into no-ops
+STATS_FILE = "generation_stats.json"
+STATS_REPORT_EVERY = 30              # Seconds between throughput/ETA lines (0 = off)
+PROFILE_DIR = "profiles"             # cProfile dumps of main.py --profile, one per process
+
+# Inference with the trained detector (see predict.py)
+INFERENCE_MODEL_PATH = "models/best.pt"
+INFERENCE_IMAGE_SIZE = 640        # Same as IMAGE_SIZE in train_model.ipynb
+INFERENCE_BATCH_SIZE = 8          # Pages per model call; a batch only holds pages of one size
+INFERENCE_DECODE_WORKERS = 4      # Threads decoding pages ahead of the model
+INFERENCE_CONF = 0.25
+INFERENCE_IOU = 0.45
+INFERENCE_MAX_DET = 3000          # A page holds up to ~2000 words; Ultralytics keeps 300 by default
+INFERENCE_DEVICE = "cpu"
+INFERENCE_OUTPUT_DIR = "predictions"
+
+# ONNX Runtime backend: the exported model on CPU, without PyTorch and Ultralytics
+INFERENCE_BACKEND = "ultralytics"                # "ultralytics" (.pt weights) or "onnx"
+INFERENCE_ONNX_MODEL_PATH = "models/best.onnx"   # best.pt exported by train_model.ipynb
+INFERENCE_INTRA_OP_THREADS = 0    # Threads inside one operator (0 = onnxruntime default, one per core)
+INFERENCE_INTER_OP_THREADS = 0    # Operators run side by side (0 or 1 = sequential graph execution)
+
+# Tiled inference: overlapping native-resolution tiles instead of one downscaled page
+INFERENCE_TILED = False           # predict.py default; tiles need a model that saw words at native size
+INFERENCE_TILE_SIZE = 640         # Tile side in page pixels, also the model's image size
+INFERENCE_TILE_OVERLAP = 160      # Should exceed the widest word, so each word is whole in some tile
+INFERENCE_TILE_BATCH_SIZE = 16    # Tiles per model call
+INFERENCE_TILE_MERGE = "nms"      # Duplicates in overlaps: "nms" keeps the best box, "fuse" averages them
 # === CREATE OUTPUT FOLDERS ===
 os.makedirs(OUTPUT_IMAGE_DIR, exist_ok=True)
 os.makedirs(OUTPUT_YOLO_DIR, exist_ok=True)
@@ -0,0 +1,140 @@
+import os
+import json
+import numpy as np
+from process.config import CORPUS_DIR
+from process.manifest import get_file_info
+
+TOKEN_DTYPE = np.dtype("<u4")
+BUILD_CHUNK = 1 << 20  # Token ids buffered before each write while building
+
+def get_corpus_prefix(text_file, corpus_dir=CORPUS_DIR):
+    """Path prefix of the built corpus files of a text file"""
+    name = os.path.splitext(os.path.basename(text_file))[0]
+    return os.path.join(corpus_dir, name)
+
+def build_corpus(text_file, prefix, source_info=None):
+    """
+    Build the interned corpus of a one-word-per-line text file
+    Writes prefix.vocab (one unique word per line, line number = id),
+    prefix.ids (uint32 token ids) and prefix.json (metadata, including the
+    SHA-256 of the text file), streaming the input so memory is bounded by
+    the vocabulary, not the corpus.
+    Args:
+        text_file: Cleaned text file, one word per line
+        prefix: Output path prefix
+        source_info: get_file_info of text_file, if already computed
+    """
+    source_info = source_info or get_file_info(text_file)
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    if os.path.exists(f"{prefix}.json"):
+        os.remove(f"{prefix}.json")
+    
+    vocab = {}
+    num_tokens = 0
+    buffer = []
+    
+    ids_tmp = f"{prefix}.ids.tmp"
+    with open(text_file, "r", encoding="utf-8") as f, open(ids_tmp, "wb") as ids_file:
+        for line in f:
+            word = line.strip()
+            if not word:
+                continue
+            
+            token_id = vocab.get(word)
+            if token_id is None:
+                token_id = vocab[word] = len(vocab)
+            buffer.append(token_id)
+            
+            if len(buffer) >= BUILD_CHUNK:
+                ids_file.write(np.array(buffer, dtype=TOKEN_DTYPE).tobytes())
+                num_tokens += len(buffer)
+                buffer = []
+        
+        ids_file.write(np.array(buffer, dtype=TOKEN_DTYPE).tobytes())
+        num_tokens += len(buffer)
+    
+    vocab_tmp = f"{prefix}.vocab.tmp"
+    with open(vocab_tmp, "w", encoding="utf-8") as f:
+        for word in vocab:
+            f.write(word + "\n")
+    
+    meta = {
+        'source': text_file,
+        'source_size': source_info['size'],
+        'source_sha256': source_info['sha256'],
+        'num_tokens': num_tokens,
+        'vocab_size': len(vocab)
+    }
+    
+    # Metadata goes last: a corpus without it is treated as not built
+    os.replace(ids_tmp, f"{prefix}.ids")
+    os.replace(vocab_tmp, f"{prefix}.vocab")
+    with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    
+    return meta
+
+class CorpusWindow:
+    """Zero-copy view of a run of token ids, resolved to words on access"""
+    def __init__(self, ids, vocab):
+        self.ids = ids
+        self.vocab = vocab
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CorpusWindow(self.ids[index], self.vocab)
+        return self.vocab[self.ids[index]]
+    
+    def __iter__(self):
+        vocab = self.vocab
+        return (vocab[token_id] for token_id in self.ids.tolist())
+
+class Corpus:
+    def __init__(self, prefix):
+        """
+        Interned word corpus: vocabulary in memory, token ids memory-mapped
+        Args:
+            prefix: Path prefix written by build_corpus
+        """
+        self.prefix = prefix
+        with open(f"{prefix}.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(f"{prefix}.vocab", "r", encoding="utf-8") as f:
+            self.vocab = [line.rstrip("\n") for line in f]
+        
+        if self.meta['num_tokens']:
+            self.ids = np.memmap(f"{prefix}.ids", dtype=TOKEN_DTYPE, mode="r")
+        else:
+            self.ids = np.zeros(0, dtype=TOKEN_DTYPE)
+    
+    @classmethod
+    def open(cls, text_file, corpus_dir=CORPUS_DIR, verbose=True):
+        """
+        Open the corpus of a text file, building it if missing or stale
+        The corpus is stale when the content hash of the text file changed;
+        touching or copying the file does not trigger a rebuild.
+        """
+        prefix = get_corpus_prefix(text_file, corpus_dir)
+        source_info = get_file_info(text_file)
+        
+        meta = None
+        if os.path.exists(f"{prefix}.json"):
+            with open(f"{prefix}.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        
+        if meta is None or meta.get('source_sha256') != source_info['sha256']:
+            if verbose:
+                print(f"Building corpus {prefix}.* from {text_file}...")
+            build_corpus(text_file, prefix, source_info)
+        
+        return cls(prefix)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def window(self, start, count):
+        """Return a zero-copy window of count words starting at start"""
+        return CorpusWindow(self.ids[start:start + count], self.vocab)
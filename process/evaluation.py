@@ -0,0 +1,268 @@
+import os
+import re
+import numpy as np
+from process.inference import get_overlapping_pairs, pair_iou
+
+# IoU thresholds of mAP@0.5:0.95; the first one gives mAP@0.5, precision and recall
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+XML_SIZE_PATTERN = re.compile(r"<width>(\d+)</width>\s*<height>(\d+)</height>")
+XML_BBOX_PATTERN = re.compile(r'<bbox x1="(-?\d+)" y1="(-?\d+)" x2="(-?\d+)" y2="(-?\d+)"')
+
+def load_yolo_boxes(path):
+    """
+    Read a YOLO label, with or without a confidence column
+    Ground truth has 5 columns; predictions written by predict.py (or
+    Ultralytics with save_conf) have the confidence as sixth column.
+    Returns:
+        tuple: (boxes, scores); boxes is a float array (n, 4) of normalised
+               (x1, y1, x2, y2), scores is None for 5-column labels
+    """
+    if not os.path.exists(path):
+        return np.zeros((0, 4)), None
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return np.zeros((0, 4)), None
+    
+    num_columns = len(lines[0].split())
+    values = np.array(" ".join(lines).split(), dtype=np.float64).reshape(-1, num_columns)
+    centers, sizes = values[:, 1:3], values[:, 3:5]
+    boxes = np.concatenate([centers - sizes / 2, centers + sizes / 2], axis=1)
+    scores = values[:, 5] if num_columns > 5 else None
+    return boxes, scores
+
+def load_xml_boxes(path):
+    """
+    Read the word boxes of an XML label (see XmlFormatter)
+    The attributes are matched with a regular expression instead of parsing
+    the tree; the generator and predict.py always write them in this form.
+    Returns:
+        tuple: (boxes, width, height); boxes is a float array (n, 4) of
+               (x1, y1, x2, y2) normalised by the page size
+    """
+    if not os.path.exists(path):
+        return np.zeros((0, 4)), None, None
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    
+    size = XML_SIZE_PATTERN.search(text)
+    if size is None:
+        raise ValueError(f"XML label without page size: {path}")
+    width, height = int(size.group(1)), int(size.group(2))
+    
+    boxes = np.array(XML_BBOX_PATTERN.findall(text), dtype=np.float64).reshape(-1, 4)
+    boxes /= np.array([width, height, width, height], dtype=np.float64)
+    return boxes, width, height
+
+def get_candidate_pairs(gt_boxes, pred_boxes):
+    """
+    Ground truth / prediction pairs that can reach IoU 0.5
+    Boxes with IoU 0.5 overlap by at least half the larger box in x and in
+    y, so the middle halves of their x ranges overlap and their centres are
+    less than half the tallest box apart in y. Boxes are put in line bands
+    of that height (twice, the second time shifted by half a band, so that
+    close centres share a band at least once) and the middle halves are
+    swept along x within the bands. Words of different lines are never
+    compared, unlike a sweep over the whole page.
+    Returns:
+        tuple: (gt_index, pred_index) int arrays, each pair listed once
+    """
+    num_gt = len(gt_boxes)
+    boxes = np.concatenate([gt_boxes, pred_boxes])
+    widths = boxes[:, 2] - boxes[:, 0]
+    # Just over the middle half, so pairs exactly at IoU 0.5 still overlap
+    x1 = boxes[:, 0] + widths * 0.24
+    x2 = boxes[:, 2] - widths * 0.24
+    centers = (boxes[:, 1] + boxes[:, 3]) / 2
+    band = max(float((boxes[:, 3] - boxes[:, 1]).max()), 1e-9) * 1.01
+    span = float(x2.max() - x1.min()) + 1.0
+    zeros = np.zeros(len(boxes))
+    
+    codes = []
+    for shift in (0.0, 0.5):
+        # Bands laid end to end along x, so one sweep covers all of them
+        offsets = np.floor(centers / band + shift) * span
+        i, j = get_overlapping_pairs(np.stack([x1 + offsets, zeros, x2 + offsets, zeros], axis=1))
+        cross = (i < num_gt) != (j < num_gt)
+        i, j = i[cross], j[cross]
+        codes.append(np.minimum(i, j) * len(pred_boxes) + np.maximum(i, j) - num_gt)
+    
+    codes = np.unique(np.concatenate(codes))
+    return codes // len(pred_boxes), codes % len(pred_boxes)
+
+def match_predictions(gt_boxes, pred_boxes, iou_thresholds=IOU_THRESHOLDS):
+    """
+    Match predictions to ground truth at every IoU threshold
+    Same matching as the Ultralytics validator, so the numbers compare with
+    model.val(): candidate pairs are taken by descending IoU, each
+    prediction keeps its best pair, then each ground-truth box keeps the
+    pair of its first prediction (pred_boxes must be sorted by descending
+    confidence). IoU is only computed for the pairs of get_candidate_pairs,
+    not as a full matrix.
+    Args:
+        gt_boxes: float array (m, 4) of (x1, y1, x2, y2)
+        pred_boxes: float array (n, 4), sorted by descending confidence
+        iou_thresholds: Increasing thresholds, all at least 0.5
+    Returns:
+        np.ndarray: bool array (n, len(iou_thresholds)), True where the
+                    prediction is a true positive at that threshold
+    """
+    correct = np.zeros((len(pred_boxes), len(iou_thresholds)), dtype=bool)
+    if not len(gt_boxes) or not len(pred_boxes):
+        return correct
+    
+    gt_index, pred_index = get_candidate_pairs(gt_boxes, pred_boxes)
+    ious = pair_iou(gt_boxes[gt_index], pred_boxes[pred_index])
+    order = np.argsort(-ious, kind="stable")
+    gt_index, pred_index, ious = gt_index[order], pred_index[order], ious[order]
+    
+    for k, threshold in enumerate(iou_thresholds):
+        # Pairs are sorted by IoU, so the pairs above the threshold are a prefix
+        count = np.searchsorted(-ious, -threshold, side="right")
+        if not count:
+            break
+        gt_k, pred_k = gt_index[:count], pred_index[:count]
+        _, first = np.unique(pred_k, return_index=True)
+        gt_k, pred_k = gt_k[first], pred_k[first]
+        _, first = np.unique(gt_k, return_index=True)
+        correct[pred_k[first], k] = True
+    return correct
+
+def evaluate_image(task):
+    """
+    Match the predictions of one page (pool task)
+    Args:
+        task: (stem, pred_path, gt_path, gt_format) with gt_format "yolo" or "xml"
+    Returns:
+        dict: {'stem', 'scores' (sorted descending), 'correct', 'num_gt',
+               'width', 'height'}; the page size is only known for XML
+               ground truth
+    """
+    stem, pred_path, gt_path, gt_format = task
+    width = height = None
+    if gt_format == "xml":
+        gt_boxes, width, height = load_xml_boxes(gt_path)
+    else:
+        gt_boxes, _ = load_yolo_boxes(gt_path)
+    
+    pred_boxes, scores = load_yolo_boxes(pred_path)
+    if scores is None:
+        scores = np.ones(len(pred_boxes))
+    order = np.argsort(-scores, kind="stable")
+    pred_boxes, scores = pred_boxes[order], scores[order]
+    
+    return {
+        'stem': stem,
+        'scores': scores.astype(np.float32),
+        'correct': match_predictions(gt_boxes, pred_boxes),
+        'num_gt': len(gt_boxes),
+        'width': width,
+        'height': height
+    }
+
+def compute_ap(recall, precision):
+    """
+    Average precision of one precision/recall curve
+    101-point interpolation of the precision envelope, as Ultralytics and
+    COCO compute it.
+    """
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    x = np.linspace(0, 1, 101)
+    y = np.interp(x, recall, precision)
+    return float(np.sum((y[1:] + y[:-1]) / 2 * np.diff(x)))
+
+def compute_metrics(scores, correct, num_gt, conf=0.0):
+    """
+    Detection metrics of a set of matched predictions
+    Args:
+        scores: Confidences of the predictions, sorted descending
+        correct: bool array (n, len(IOU_THRESHOLDS)) from match_predictions
+        num_gt: Number of ground-truth boxes
+        conf: Confidence threshold of precision, recall and F1
+    Returns:
+        dict: predictions, ground_truth, precision, recall and f1 (at IoU
+              0.5 and conf), map50 and map50_95
+    """
+    num_pred = int(np.count_nonzero(scores >= conf))
+    true_positives = int(np.count_nonzero(correct[:num_pred, 0]))
+    precision = true_positives / num_pred if num_pred else 0.0
+    recall = true_positives / num_gt if num_gt else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    
+    ap = np.zeros(correct.shape[1])
+    if num_gt and len(scores):
+        cumulative = np.cumsum(correct, axis=0)
+        recall_curve = cumulative / num_gt
+        precision_curve = cumulative / np.arange(1, len(scores) + 1)[:, None]
+        ap = np.array([
+            compute_ap(recall_curve[:, k], precision_curve[:, k]) for k in range(correct.shape[1])
+        ])
+    
+    return {
+        'predictions': num_pred,
+        'ground_truth': int(num_gt),
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'map50': float(ap[0]),
+        'map50_95': float(ap.mean())
+    }
+
+class EvaluationResults:
+    def __init__(self, page_results):
+        """
+        Matched predictions of a whole split, concatenated over pages
+        Predictions are sorted once by confidence over all pages; the metrics
+        of a group of pages then select its rows without sorting again.
+        Args:
+            page_results: Dicts returned by evaluate_image
+        """
+        self.stems = [result['stem'] for result in page_results]
+        self.num_gt = np.array([result['num_gt'] for result in page_results], dtype=np.int64)
+        
+        counts = [len(result['scores']) for result in page_results]
+        page_index = np.repeat(np.arange(len(page_results)), counts)
+        scores = np.concatenate([result['scores'] for result in page_results] + [np.zeros(0, np.float32)])
+        correct = np.concatenate(
+            [result['correct'] for result in page_results] + [np.zeros((0, len(IOU_THRESHOLDS)), bool)]
+        )
+        order = np.argsort(-scores, kind="stable")
+        self.scores = scores[order]
+        self.correct = correct[order]
+        self.page_index = page_index[order]
+    
+    def metrics(self, pages=None, conf=0.0):
+        """
+        Metrics of all pages, or of the pages whose indices are given
+        Returns:
+            dict: See compute_metrics, plus the number of images
+        """
+        if pages is None:
+            result = compute_metrics(self.scores, self.correct, self.num_gt.sum(), conf)
+            result['images'] = len(self.stems)
+            return result
+        
+        selected = np.zeros(len(self.stems), dtype=bool)
+        selected[pages] = True
+        rows = selected[self.page_index]
+        result = compute_metrics(self.scores[rows], self.correct[rows], self.num_gt[selected].sum(), conf)
+        result['images'] = int(selected.sum())
+        return result
+    
+    def grouped_metrics(self, groups, conf=0.0):
+        """
+        Metrics per group of pages
+        Args:
+            groups: {stem: group name}; pages without a group are left out
+        Returns:
+            dict: {group name: metrics}, sorted by name
+        """
+        pages = {}
+        for index, stem in enumerate(self.stems):
+            if stem in groups:
+                pages.setdefault(groups[stem], []).append(index)
+        return {name: self.metrics(pages[name], conf) for name in sorted(pages)}
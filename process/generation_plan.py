@@ -0,0 +1,100 @@
+import random
+import hashlib
+from process.config import (
+    FONT_SIZE_MIN, FONT_SIZE_MAX,
+    MIN_WORDS_PER_IMAGE, MAX_WORDS_PER_IMAGE
+)
+
+def image_seed(base_seed, image_number):
+    """
+    Derive a stable per-image seed from the run seed and the image number
+    Args:
+        base_seed: Seed of the whole generation run
+        image_number: 1-based overall image number
+    Returns:
+        int: 64-bit seed, identical in every process
+    """
+    digest = hashlib.sha256(f"{base_seed}:{image_number}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+class GenerationPlan:
+    def __init__(self, all_fonts, images_per_font, corpus_size, seed, count_words):
+        """
+        Build the full (font, image number) plan up front
+        Every random choice that links one image to the next (font size, word
+        count, corpus offset) is fixed here, so pages can be rendered in any
+        order and on any number of workers with identical output. As in the
+        original serial loop, the corpus cursor advances by the words that
+        fit on each page, not by the drawn word count, so no corpus text is
+        skipped; count_words lays a page out (without rasterising) to find
+        that number.
+        Args:
+            all_fonts: List of font paths
+            images_per_font: Number of images to generate per font
+            corpus_size: Number of words in the corpus
+            seed: Seed of the whole generation run
+            count_words: Function of a page entry returning how many words
+                         of its window fit on the page
+        """
+        self.all_fonts = all_fonts
+        self.images_per_font = images_per_font
+        self.corpus_size = corpus_size
+        self.seed = seed
+        self.count_words = count_words
+        self.recycle_count = 0
+        self.pages = []
+        self.build()
+    
+    def build(self):
+        """Assign font, size, seed and corpus window to every image"""
+        rng = random.Random(self.seed)
+        word_index = 0
+        image_number = 0
+        
+        for font_idx, font_path in enumerate(self.all_fonts, 1):
+            for img_num in range(1, self.images_per_font + 1):
+                image_number += 1
+                
+                # Reset to beginning of words if we run out
+                if word_index >= self.corpus_size:
+                    word_index = 0
+                    self.recycle_count += 1
+                
+                words_to_use = rng.randint(MIN_WORDS_PER_IMAGE, MAX_WORDS_PER_IMAGE)
+                word_count = min(words_to_use, self.corpus_size - word_index)
+                font_size = rng.randint(FONT_SIZE_MIN, FONT_SIZE_MAX)
+                
+                page = {
+                    'image_number': image_number,
+                    'font_idx': font_idx,
+                    'font_path': font_path,
+                    'img_num': img_num,
+                    'font_size': font_size,
+                    'word_start': word_index,
+                    'word_count': word_count,
+                    'seed': image_seed(self.seed, image_number)
+                }
+                
+                # Only the words that fit are rendered; the next page continues after them
+                words_used = self.count_words(page)
+                page['word_count'] = words_used
+                self.pages.append(page)
+                
+                word_index += words_used
+    
+    def describe(self):
+        """Parameters that fully determine the plan, as stored in the manifest"""
+        return {
+            'seed': self.seed,
+            'images_per_font': self.images_per_font,
+            'corpus_size': self.corpus_size,
+            'fonts': list(self.all_fonts),
+            'font_size_range': [FONT_SIZE_MIN, FONT_SIZE_MAX],
+            'words_per_image_range': [MIN_WORDS_PER_IMAGE, MAX_WORDS_PER_IMAGE]
+        }
+    
+    def __len__(self):
+        return len(self.pages)
+    
+    def __iter__(self):
+        return iter(self.pages)
@@ -0,0 +1,56 @@
+import cv2
+from process.config import OUTPUT_COLOR_MODE, IMAGE_FORMAT, PNG_COMPRESSION, JPEG_QUALITY
+
+class ImageEncoder:
+    def __init__(self, image_format=IMAGE_FORMAT, color_mode=OUTPUT_COLOR_MODE,
+                 png_compression=PNG_COMPRESSION, jpeg_quality=JPEG_QUALITY):
+        """
+        Encode rendered pages with a configurable format and settings
+        Args:
+            image_format: "png", "webp" (lossless) or "jpg"
+            color_mode: "RGB", "L" or "1"; "1" pages are written as 1-bit PNG,
+                        which only the png format supports
+            png_compression: PNG zlib level, 0 (fastest) to 9 (smallest);
+                             None keeps OpenCV's default (fast RLE)
+            jpeg_quality: JPEG quality, 0 to 100
+        Raises:
+            ValueError: If the format or color mode is unknown, or color mode
+                        "1" is combined with another format than png
+        """
+        if image_format not in ("png", "webp", "jpg"):
+            raise ValueError(f"Unknown image format: {image_format}")
+        if color_mode not in ("RGB", "L", "1"):
+            raise ValueError(f"Unknown color mode: {color_mode}")
+        if color_mode == "1" and image_format != "png":
+            # WebP and JPEG have no 1-bit mode: the page would silently become 8-bit gray
+            raise ValueError(f'Color mode "1" needs the png format, not {image_format}')
+        
+        self.image_format = image_format
+        self.color_mode = color_mode
+        self.extension = f".{image_format}"
+        
+        if image_format == "png":
+            self.params = []
+            if png_compression is not None:
+                self.params += [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+            if color_mode == "1":
+                self.params += [cv2.IMWRITE_PNG_BILEVEL, 1]
+        elif image_format == "webp":
+            # Quality above 100 selects lossless WebP
+            self.params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+        else:
+            self.params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+    
+    def encode(self, img_cv):
+        """Encode an image to bytes"""
+        ok, buffer = cv2.imencode(self.extension, img_cv, self.params)
+        if not ok:
+            raise RuntimeError(f"Failed to encode image as {self.image_format}")
+        return buffer.tobytes()
+    
+    def write(self, image_path, img_cv):
+        """Encode an image, write it to image_path and return the encoded bytes"""
+        data = self.encode(img_cv)
+        with open(image_path, "wb") as f:
+            f.write(data)
+        return data
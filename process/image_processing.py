@@ -1,101 +1,191 @@
 import random
 import numpy as np
 import cv2
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+from process.sprite_renderer import SpriteRenderer
+from process.layout_engine import layout_page
+from process.pipeline_stats import PipelineStats
+from process.word_boxes import WordBoxes
 from process.config import (
     PAGE_SIZES,
     LEFT_MARGIN_MIN, LEFT_MARGIN_MAX,
     RIGHT_MARGIN_MIN, RIGHT_MARGIN_MAX,
     TOP_MARGIN, BOTTOM_MARGIN,
-    LINE_SPACING
+    LINE_SPACING,
+    RENDER_ENGINE,
+    OUTPUT_COLOR_MODE,
+    LAYOUT_MEASURE_CHUNK
 )
 
 class ImageGenerator:
-    def __init__(self, font_manager):
+    def __init__(self, font_manager, metrics_cache=None, render_engine=RENDER_ENGINE, sprite_renderer=None,
+                 color_mode=OUTPUT_COLOR_MODE, stats=None):
+        """
+        Args:
+            font_manager: FontManager providing pooled fonts
+            metrics_cache: Optional WordMetricsCache for word bboxes
+            render_engine: "draw" (ImageDraw.text per word) or "sprite"
+                           (cached word masks blitted into a NumPy page)
+            sprite_renderer: SpriteRenderer used by the "sprite" engine
+            color_mode: "RGB" (BGR array), "L" (8-bit gray array) or
+                        "1" (gray page thresholded to black and white)
+            stats: Optional PipelineStats receiving stage timings and counters
+        """
+        if render_engine not in ("draw", "sprite"):
+            raise ValueError(f"Unknown render engine: {render_engine}")
+        if color_mode not in ("RGB", "L", "1"):
+            raise ValueError(f"Unknown color mode: {color_mode}")
+        
+        self.color_mode = color_mode
         self.font_manager = font_manager
+        self.metrics_cache = metrics_cache
+        self.render_engine = render_engine
+        self.sprite_renderer = sprite_renderer
+        self.stats = stats or PipelineStats(enabled=False)
+        if render_engine == "sprite" and sprite_renderer is None:
+            self.sprite_renderer = SpriteRenderer()
+        
+        # Scratch surface for measuring words when no metrics cache is used
+        self.measure_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
     
-    def generate_image(self, words, font_path, font_size):
+    def measure_words(self, words, font, font_path, font_size):
         """
-        Generate a single image with words and return image data + word boxes
-        Args:
-            words: List of words to render
-            font_path: Path to the font file to use
-            font_size: Size of the font
+        Get the (left, top, right, bottom) bbox offsets of words
+        Uses the word-metrics cache when available, otherwise textbbox
         Returns:
-            tuple: (img_cv, word_boxes, words_used, image_width, image_height)
+            np.ndarray: int array of shape (len(words), 4)
         """
+        if self.metrics_cache is None:
+            textbbox = self.measure_draw.textbbox
+            offsets = [textbbox((0, 0), word, font=font) for word in words]
+        else:
+            get_offsets = self.metrics_cache.get_offsets
+            offsets = [get_offsets(font, font_path, font_size, word) for word in words]
+        return np.array(offsets, dtype=np.int64).reshape(-1, 4)
+    
+    def plan_layout(self, words, font_path, font_size, rng=None, page_size=None):
+        """
+        Pick page size and margins and lay out words without rasterising
+        Words are measured in growing chunks, so a page that fills up after a
+        few hundred words does not measure the whole list.
+        page_size forces a (width, height) instead of drawing one from rng.
+        Returns:
+            tuple: (layout dict from layout_page, font, image_width, image_height)
+        """
+        rng = rng or random
+        
         # Randomly select page size
-        image_width, image_height = random.choice(PAGE_SIZES)
+        image_width, image_height = page_size or rng.choice(PAGE_SIZES)
         
         # Random parameters for this image
-        left_margin = random.randint(LEFT_MARGIN_MIN, LEFT_MARGIN_MAX)
-        right_margin = random.randint(RIGHT_MARGIN_MIN, RIGHT_MARGIN_MAX)
+        left_margin = rng.randint(LEFT_MARGIN_MIN, LEFT_MARGIN_MAX)
+        right_margin = rng.randint(RIGHT_MARGIN_MIN, RIGHT_MARGIN_MAX)
         
-        font = ImageFont.truetype(font_path, font_size)
-        img = Image.new("RGB", (image_width, image_height), (255, 255, 255))
-        draw = ImageDraw.Draw(img)
+        font = self.font_manager.get_font(font_path, font_size)
         
         # Calculate usable width
         usable_width = image_width - left_margin - right_margin
         
-        x, y = left_margin, TOP_MARGIN
-        word_boxes = []
-        line_id = 1
-        paragraph_id = 1
-        current_line_words = []
+        offsets = np.zeros((0, 4), dtype=np.int64)
+        while True:
+            measured = len(offsets)
+            chunk = words[measured:measured + max(LAYOUT_MEASURE_CHUNK, measured)]
+            with self.stats.timer('measure'):
+                offsets = np.concatenate([offsets, self.measure_words(chunk, font, font_path, font_size)])
+            
+            with self.stats.timer('layout'):
+                layout = layout_page(
+                    offsets, left_margin, usable_width,
+                    TOP_MARGIN, image_height - BOTTOM_MARGIN, LINE_SPACING
+                )
+            if layout['page_full'] or len(offsets) >= len(words):
+                break
+        
+        stats = self.stats
+        if stats.enabled:
+            stats.count('pages')
+            stats.count('words_measured', len(offsets))
+            stats.count('words_placed', layout['words_used'])
+            if layout['words_used']:
+                stats.count('line_wraps', int(layout['line_id'][-1]) - 1)
+            if layout['page_full']:
+                stats.count('pages_full')
+        return layout, font, image_width, image_height
+    
+    def get_word_boxes(self, words, layout):
+        """Build the columnar WordBoxes of a layout"""
+        return WordBoxes.from_layout(words, layout, paragraph_id=1)
+    
+    def generate_layout(self, words, font_path, font_size, rng=None, page_size=None):
+        """
+        Layout-only counterpart of generate_image: same boxes, no raster
+        Consumes rng exactly like generate_image, so a seeded page gets the
+        same size, margins and boxes in both modes.
+        Returns:
+            tuple: (word_boxes, words_used, image_width, image_height)
+        """
+        layout, _, image_width, image_height = self.plan_layout(words, font_path, font_size, rng, page_size)
+        with self.stats.timer('word_boxes'):
+            word_boxes = self.get_word_boxes(words, layout)
+        return word_boxes, layout['words_used'], image_width, image_height
+    
+    def generate_image(self, words, font_path, font_size, rng=None, page_size=None):
+        """
+        Generate a single image with words and return image data + word boxes
+        word_boxes is a WordBoxes; iterate it for per-word dictionaries.
+        Args:
+            words: List of words to render
+            font_path: Path to the font file to use
+            font_size: Size of the font
+            rng: Optional random.Random for page size and margins
+                 (defaults to the global random module)
+            page_size: Optional (width, height); random from PAGE_SIZES if None
+        Returns:
+            tuple: (img_cv, word_boxes, words_used, image_width, image_height)
+        """
+        layout, font, image_width, image_height = self.plan_layout(words, font_path, font_size, rng, page_size)
+        words_used = layout['words_used']
+        
+        with self.stats.timer('render'):
+            page = self.render_words(words, layout, font, font_path, font_size, image_width, image_height)
+        with self.stats.timer('convert'):
+            img_cv = self.convert_page(page)
+        with self.stats.timer('word_boxes'):
+            word_boxes = self.get_word_boxes(words, layout)
+        return img_cv, word_boxes, words_used, image_width, image_height
+    
+    def render_words(self, words, layout, font, font_path, font_size, image_width, image_height):
+        """Rasterise the placed words of a layout onto a white page array"""
+        positions = zip(words[:layout['words_used']], layout['xmin'].tolist(), layout['ymin'].tolist())
         
-        # Fill the page with words
-        page_full = False
-        word_index = 0
+        if self.render_engine == "sprite":
+            # Black text on white: one channel holds the whole page
+            page = self.sprite_renderer.new_page(image_width, image_height)
+            for word, x, y in positions:
+                self.sprite_renderer.draw_word(page, (x, y), word, font, font_path, font_size)
+            return page
         
-        while word_index < len(words) and not page_full:
-            word = words[word_index]
-            
-            # Get word dimensions
-            bbox = draw.textbbox((x, y), word, font=font)
-            word_width = bbox[2] - bbox[0]
-            word_height = bbox[3] - bbox[1]
-            
-            # Check if word fits on current line
-            if x + word_width > left_margin + usable_width:
-                # Move to next line
-                if current_line_words:
-                    line_id += 1
-                current_line_words = []
-                y += word_height + LINE_SPACING
-                x = left_margin
-                
-                # Check if we've reached bottom margin
-                if y + word_height > image_height - BOTTOM_MARGIN:
-                    page_full = True
-                    break
-                
-                # Recalculate bbox for new position
-                bbox = draw.textbbox((x, y), word, font=font)
-                word_width = bbox[2] - bbox[0]
-                word_height = bbox[3] - bbox[1]
-            
-            # Draw the word
-            draw.text((x, y), word, font=font, fill=(0, 0, 0))
-            
-            # Store word info
-            xmin = x
-            ymin = y
-            xmax = bbox[2]
-            ymax = bbox[3]
-            
-            word_boxes.append({
-                'text': word,
-                'bbox': (xmin, ymin, xmax, ymax),
-                'line_id': line_id,
-                'paragraph_id': paragraph_id
-            })
-            
-            current_line_words.append(word)
-            x += word_width  # No word padding
-            word_index += 1
+        if self.color_mode == "RGB":
+            img = Image.new("RGB", (image_width, image_height), (255, 255, 255))
+        else:
+            img = Image.new("L", (image_width, image_height), 255)
+        draw = ImageDraw.Draw(img)
+        for word, x, y in positions:
+            draw.text((x, y), word, font=font, fill=0)
+        return np.asarray(img)
+    
+    def convert_page(self, page):
+        """Convert a rendered page array to the OpenCV image of the color mode"""
+        if self.color_mode == "RGB":
+            if page.ndim == 2:
+                return cv2.cvtColor(page, cv2.COLOR_GRAY2BGR)
+            return cv2.cvtColor(page, cv2.COLOR_RGB2BGR)
         
-        # Convert PIL to OpenCV format
-        img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+        if self.color_mode == "1":
+            # Binarise in place; the encoder writes it as a 1-bit image
+            img_cv = page if page.flags.writeable else page.copy()
+            cv2.threshold(img_cv, 127, 255, cv2.THRESH_BINARY, dst=img_cv)
+            return img_cv
         
-        return img_cv, word_boxes, word_index, image_width, image_height
\ No newline at end of file
+        # Single-channel page goes to the encoder without another copy
+        return page
\ No newline at end of file
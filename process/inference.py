@@ -0,0 +1,713 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from process.config import (
+    INFERENCE_IMAGE_SIZE, INFERENCE_BATCH_SIZE, INFERENCE_DECODE_WORKERS,
+    INFERENCE_CONF, INFERENCE_IOU, INFERENCE_MAX_DET, INFERENCE_DEVICE,
+    INFERENCE_INTRA_OP_THREADS, INFERENCE_INTER_OP_THREADS,
+    INFERENCE_TILE_SIZE, INFERENCE_TILE_OVERLAP, INFERENCE_TILE_BATCH_SIZE, INFERENCE_TILE_MERGE
+)
+from process.word_boxes import WordBoxes
+from process.yolo_format import YOLO_LINE_FORMAT
+from process.xml_format import XmlFormatter
+from process.pipeline_stats import PipelineStats
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+LETTERBOX_COLOR = 114  # Padding gray of the Ultralytics letterbox
+MODEL_STRIDE = 32      # Largest stride of the YOLOv8 detection heads
+
+def find_images(source):
+    """Image paths of a directory (sorted) or a single image file"""
+    if os.path.isfile(source):
+        return [source]
+    return sorted(
+        os.path.join(source, name) for name in os.listdir(source)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+def load_image(path):
+    """
+    Decode an image as a BGR array (gray and 1-bit pages are expanded)
+    Raises:
+        ValueError: If the file cannot be decoded
+    """
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Cannot decode image: {path}")
+    return image
+
+class UltralyticsDetector:
+    def __init__(self, model_path, image_size=INFERENCE_IMAGE_SIZE, conf=INFERENCE_CONF, iou=INFERENCE_IOU,
+                 max_det=INFERENCE_MAX_DET, device=INFERENCE_DEVICE):
+        """
+        Trained YOLO detector run through Ultralytics
+        Ultralytics (and PyTorch) are imported here, not at module level, so
+        the generator never needs them.
+        Args:
+            model_path: Local weights file (e.g. models/best.pt)
+            image_size: Inference size, as used in training
+            conf: Confidence threshold
+            iou: NMS IoU threshold
+            max_det: Maximum detections per page
+            device: "cpu" or a CUDA device
+        """
+        from ultralytics import YOLO
+        
+        self.model = YOLO(model_path)
+        self.image_size = image_size
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.device = device
+    
+    def predict(self, images):
+        """
+        Detect words on a batch of pages
+        Args:
+            images: List of BGR arrays, all of the same shape
+        Returns:
+            list: (boxes, scores) per page; boxes is a float array (n, 4) of
+                  (x1, y1, x2, y2) in page pixels, scores a float array (n,)
+        """
+        results = self.model.predict(
+            source=list(images),
+            imgsz=self.image_size,
+            conf=self.conf,
+            iou=self.iou,
+            max_det=self.max_det,
+            device=self.device,
+            batch=len(images),
+            verbose=False
+        )
+        return [
+            (result.boxes.xyxy.cpu().numpy().astype(np.float32), result.boxes.conf.cpu().numpy().astype(np.float32))
+            for result in results
+        ]
+
+def letterbox(image, image_size, stride=0):
+    """
+    Resize a page to fit image_size x image_size and pad it, as Ultralytics does
+    The aspect ratio is kept; the padding is split evenly around the page
+    with the same rounding as the Ultralytics LetterBox, so boxes of the
+    exported model land where the PyTorch model puts them.
+    Args:
+        image: BGR array
+        image_size: Side of the square the page is fitted into
+        stride: Pad only up to a multiple of stride (the rectangular
+                letterbox of the PyTorch path) instead of to the full square
+    Returns:
+        tuple: (letterboxed BGR array, gain, (pad_x, pad_y))
+    """
+    height, width = image.shape[:2]
+    gain = min(image_size / height, image_size / width)
+    new_width, new_height = int(round(width * gain)), int(round(height * gain))
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    
+    pad_x = image_size - new_width
+    pad_y = image_size - new_height
+    if stride:
+        pad_x, pad_y = pad_x % stride, pad_y % stride
+    pad_x, pad_y = pad_x / 2, pad_y / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                               value=(LETTERBOX_COLOR,) * 3)
+    return image, gain, (left, top)
+
+class OnnxDetector:
+    def __init__(self, model_path, image_size=INFERENCE_IMAGE_SIZE, conf=INFERENCE_CONF, iou=INFERENCE_IOU,
+                 max_det=INFERENCE_MAX_DET, intra_op_threads=INFERENCE_INTRA_OP_THREADS,
+                 inter_op_threads=INFERENCE_INTER_OP_THREADS):
+        """
+        Exported YOLO detector run with ONNX Runtime on CPU
+        Needs only onnxruntime, OpenCV and NumPy: pages are letterboxed with
+        letterbox(), and the raw model output is decoded and suppressed with
+        merge_boxes instead of the PyTorch post-processing. Has the
+        predict(images) API of UltralyticsDetector, so it plugs into
+        BatchRunner and TiledDetector. Models exported with a fixed batch
+        size of 1 (the Ultralytics default) are run page by page; models
+        exported with dynamic=True get the same rectangular letterbox as the
+        PyTorch path.
+        Args:
+            model_path: Exported .onnx file (see train_model.ipynb)
+            image_size: Inference size; a model with a fixed input size uses its own
+            conf: Confidence threshold
+            iou: NMS IoU threshold
+            max_det: Maximum detections per page
+            intra_op_threads: Threads inside one operator (0 = onnxruntime default)
+            inter_op_threads: Operators run in parallel (0 or 1 = sequential)
+        """
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.float16 if model_input.type == "tensor(float16)" else np.float32
+        # Dynamic dimensions are names (or None) instead of ints
+        batch_dim, _, height_dim, width_dim = model_input.shape
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+        fixed_size = isinstance(height_dim, int) and height_dim == width_dim
+        self.image_size = height_dim if fixed_size else image_size
+        # Ultralytics writes the model stride into the export metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.stride = 0 if fixed_size else int(metadata.get('stride', MODEL_STRIDE))
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+    
+    def preprocess(self, images):
+        """
+        Letterbox pages into one NCHW RGB tensor scaled to [0, 1]
+        Returns:
+            tuple: (tensor, [(gain, (pad_x, pad_y)), ...] per page)
+        """
+        boxed_images = []
+        transforms = []
+        for image in images:
+            boxed, gain, pad = letterbox(image, self.image_size, self.stride)
+            boxed_images.append(boxed)
+            transforms.append((gain, pad))
+        
+        # BGR -> RGB and NHWC -> NCHW in one copy
+        tensor = np.ascontiguousarray(
+            np.stack(boxed_images)[..., ::-1].transpose(0, 3, 1, 2), dtype=self.input_dtype
+        )
+        tensor /= 255
+        return tensor, transforms
+    
+    def postprocess(self, output, gain, pad, width, height):
+        """
+        Decode the raw output of one page into page-pixel boxes
+        Args:
+            output: float array (4 + classes, anchors) of (cx, cy, w, h, class scores)
+            gain, pad: Letterbox transform of the page
+            width, height: Page size
+        Returns:
+            tuple: (boxes, scores) as UltralyticsDetector.predict
+        """
+        output = output.astype(np.float32, copy=False)
+        # Words are a single class; with several, the best class counts (class-agnostic NMS)
+        scores = output[4:].max(axis=0)
+        candidates = np.flatnonzero(scores > self.conf)
+        centers = output[:2, candidates].T
+        sizes = output[2:4, candidates].T
+        boxes = np.concatenate([centers - sizes / 2, centers + sizes / 2], axis=1)
+        boxes, scores = merge_boxes(boxes, scores[candidates], self.iou, "nms")
+        boxes, scores = boxes[:self.max_det], scores[:self.max_det]
+        
+        boxes = (boxes - np.array([pad[0], pad[1], pad[0], pad[1]], dtype=np.float32)) / gain
+        np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+        return boxes.astype(np.float32), scores.astype(np.float32)
+    
+    def predict(self, images):
+        """
+        Detect words on a batch of pages
+        Returns:
+            list: (boxes, scores) per page, as UltralyticsDetector.predict
+        """
+        tensor, transforms = self.preprocess(images)
+        step = self.fixed_batch or len(images)
+        outputs = []
+        for start in range(0, len(images), step):
+            outputs.extend(self.session.run(None, {self.input_name: tensor[start:start + step]})[0])
+        
+        return [
+            self.postprocess(output, gain, pad, image.shape[1], image.shape[0])
+            for output, (gain, pad), image in zip(outputs, transforms, images)
+        ]
+
+def create_detector(backend, model_path, image_size=INFERENCE_IMAGE_SIZE, conf=INFERENCE_CONF, iou=INFERENCE_IOU,
+                    max_det=INFERENCE_MAX_DET, device=INFERENCE_DEVICE, intra_op_threads=INFERENCE_INTRA_OP_THREADS,
+                    inter_op_threads=INFERENCE_INTER_OP_THREADS):
+    """
+    Detector of a backend: "ultralytics" (PyTorch) or "onnx" (ONNX Runtime, CPU only)
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == "ultralytics":
+        return UltralyticsDetector(model_path, image_size, conf, iou, max_det, device)
+    if backend == "onnx":
+        return OnnxDetector(model_path, image_size, conf, iou, max_det, intra_op_threads, inter_op_threads)
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+class BatchRunner:
+    def __init__(self, detector, batch_size=INFERENCE_BATCH_SIZE, decode_workers=INFERENCE_DECODE_WORKERS,
+                 stats=None):
+        """
+        Batched inference with decoding in a thread pool
+        Pages are decoded by decode_workers threads (OpenCV releases the
+        GIL) while the model runs on the previous batch. Decoded pages wait in
+        one bucket per page shape, and a bucket goes to the model once it
+        holds batch_size pages, so every batch is letterboxed the same way
+        (the PAGE_SIZES of the generator give a handful of buckets). At most
+        a few batches of decoded pages are held in memory.
+        Args:
+            detector: Object with predict(images) -> [(boxes, scores), ...],
+                      e.g. UltralyticsDetector
+            batch_size: Pages per model call
+            decode_workers: Decoding threads
+            stats: Optional PipelineStats receiving 'decode_wait' and 'model'
+                   timings and page/detection counters
+        """
+        self.detector = detector
+        self.batch_size = max(1, batch_size)
+        self.decode_workers = max(1, decode_workers)
+        self.stats = stats or PipelineStats()
+        self.errors = []
+    
+    def run_batch(self, batch):
+        """Run the detector on [(path, image), ...] and yield one result per page"""
+        with self.stats.timer('model'):
+            predictions = self.detector.predict([image for _, image in batch])
+        self.stats.count('batches')
+        for (path, image), (boxes, scores) in zip(batch, predictions):
+            self.stats.count('pages')
+            self.stats.count('detections', len(boxes))
+            yield {
+                'path': path,
+                'width': image.shape[1],
+                'height': image.shape[0],
+                'boxes': boxes,
+                'scores': scores
+            }
+    
+    def run(self, image_paths):
+        """
+        Run inference on images
+        Pages that cannot be decoded are skipped and listed in self.errors.
+        Yields:
+            dict: {'path', 'width', 'height', 'boxes', 'scores'} per page, in
+                  batch order (pages of one shape stay in input order)
+        """
+        buckets = {}
+        prefetch = self.batch_size * 2 + self.decode_workers
+        paths = iter(image_paths)
+        
+        with ThreadPoolExecutor(max_workers=self.decode_workers) as executor:
+            pending = deque()
+            while True:
+                while len(pending) < prefetch:
+                    path = next(paths, None)
+                    if path is None:
+                        break
+                    pending.append((path, executor.submit(load_image, path)))
+                if not pending:
+                    break
+                
+                path, future = pending.popleft()
+                try:
+                    with self.stats.timer('decode_wait'):
+                        image = future.result()
+                except (OSError, ValueError) as e:
+                    self.errors.append((path, str(e)))
+                    continue
+                
+                bucket = buckets.setdefault(image.shape, [])
+                bucket.append((path, image))
+                if len(bucket) >= self.batch_size:
+                    del buckets[image.shape]
+                    yield from self.run_batch(bucket)
+        
+        # Partially filled buckets at the end
+        for bucket in buckets.values():
+            yield from self.run_batch(bucket)
+
+def get_reading_order(boxes):
+    """
+    Sort detected boxes into lines and reading order
+    Boxes are sorted by vertical centre; a new line starts where the gap to
+    the previous centre exceeds half the median box height. Within a line,
+    boxes go left to right.
+    Args:
+        boxes: float array (n, 4) of (x1, y1, x2, y2)
+    Returns:
+        tuple: (order, line_ids): indices of boxes in reading order and the
+               1-based line id of each ordered box
+    """
+    if not len(boxes):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    
+    centers = (boxes[:, 1] + boxes[:, 3]) / 2
+    by_center = np.argsort(centers, kind="stable")
+    threshold = np.median(boxes[:, 3] - boxes[:, 1]) / 2
+    new_line = np.diff(centers[by_center]) > threshold
+    line_of_sorted = np.concatenate([[1], 1 + np.cumsum(new_line)])
+    
+    line_ids = np.empty(len(boxes), dtype=np.int64)
+    line_ids[by_center] = line_of_sorted
+    order = np.lexsort((boxes[:, 0], line_ids))
+    return order, line_ids[order]
+
+def format_prediction_label(boxes, scores, image_width, image_height, save_conf=True):
+    """
+    YOLO label of detections, with the confidence as sixth column by default
+    Same number format as the generated labels (and Ultralytics save_conf).
+    Returns:
+        str: One "class x_center y_center width height [conf]" line per box
+    """
+    if not len(boxes):
+        return ""
+    boxes = boxes.astype(np.float64)
+    columns = [
+        (boxes[:, 0] + boxes[:, 2]) / 2 / image_width,
+        (boxes[:, 1] + boxes[:, 3]) / 2 / image_height,
+        (boxes[:, 2] - boxes[:, 0]) / image_width,
+        (boxes[:, 3] - boxes[:, 1]) / image_height
+    ]
+    line_format = YOLO_LINE_FORMAT
+    if save_conf:
+        columns.append(scores.astype(np.float64))
+        line_format += " %.6f"
+    values = np.stack(columns, axis=1)
+    return "\n".join([line_format] * len(values)) % tuple(values.ravel().tolist())
+
+def get_prediction_word_boxes(boxes, line_ids):
+    """
+    WordBoxes of detections, for the XML label
+    Boxes are rounded to pixels; detections have no text, so every word is
+    written with an empty <text /> element.
+    Args:
+        boxes: float array (n, 4) in reading order
+        line_ids: Line id of every box (see get_reading_order)
+    """
+    return WordBoxes(
+        np.rint(boxes).astype(np.int32),
+        line_ids,
+        np.ones(len(boxes), dtype=np.int32),
+        np.zeros(len(boxes), dtype=np.int64),
+        [""]
+    )
+
+def write_prediction(result, label_dir, xml_dir, save_conf=True):
+    """
+    Write the YOLO and XML labels of one inference result
+    Boxes are written in reading order, so both files list words alike.
+    Returns:
+        tuple: (YOLO label path, XML label path)
+    """
+    image_name = os.path.basename(result['path'])
+    filename = os.path.splitext(image_name)[0]
+    width, height = result['width'], result['height']
+    
+    order, line_ids = get_reading_order(result['boxes'])
+    boxes, scores = result['boxes'][order], result['scores'][order]
+    
+    label_path = os.path.join(label_dir, f"{filename}.txt")
+    with open(label_path, "w", encoding="utf-8") as f:
+        f.write(format_prediction_label(boxes, scores, width, height, save_conf))
+    
+    xml_path = os.path.join(xml_dir, f"{filename}.xml")
+    with open(xml_path, "wb") as f:
+        f.write(XmlFormatter.format_xml_label(get_prediction_word_boxes(boxes, line_ids), image_name, width, height))
+    return label_path, xml_path
+
+def get_tiles(width, height, tile_size, overlap):
+    """
+    Origins of overlapping tiles covering a page
+    Tiles step by tile_size - overlap; the last row and column are moved
+    back inside the page, so every tile has the same size (one letterbox
+    shape per batch). A page side shorter than tile_size is one tile.
+    Returns:
+        np.ndarray: int array (m, 4) of tile (x1, y1, x2, y2)
+    """
+    def starts(length):
+        if length <= tile_size:
+            return np.array([0])
+        step = max(1, tile_size - overlap)
+        positions = np.arange(0, length - tile_size, step)
+        return np.append(positions, length - tile_size)
+    
+    xs, ys = starts(width), starts(height)
+    x1, y1 = np.meshgrid(xs, ys)
+    x1, y1 = x1.ravel(), y1.ravel()
+    return np.stack([x1, y1, np.minimum(x1 + tile_size, width), np.minimum(y1 + tile_size, height)], axis=1)
+
+def box_iou(boxes1, boxes2):
+    """
+    IoU matrix of two sets of (x1, y1, x2, y2) boxes
+    Returns:
+        np.ndarray: float array (len(boxes1), len(boxes2))
+    """
+    boxes1 = np.asarray(boxes1, dtype=np.float32)
+    boxes2 = np.asarray(boxes2, dtype=np.float32)
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    
+    width = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    height = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    union = area1[:, None] + area2[None, :] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+def get_overlapping_pairs(boxes):
+    """
+    Index pairs of boxes whose x ranges overlap, found with a sweep over x1
+    Word boxes on a page overlap only a few neighbours, so this is far
+    smaller than the full n x n matrix.
+    Returns:
+        tuple: (i, j) int arrays with i != j, each pair listed once
+    """
+    n = len(boxes)
+    by_x = np.argsort(boxes[:, 0], kind="stable")
+    x1 = boxes[by_x, 0]
+    # Boxes after position k in x1 order overlap box k while they start before its x2
+    ends = np.searchsorted(x1, boxes[by_x, 2], side="left")
+    counts = np.maximum(ends - np.arange(1, n + 1), 0)
+    first = np.repeat(np.arange(n), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return by_x[first], by_x[first + 1 + offsets]
+
+def pair_iou(boxes1, boxes2):
+    """IoU of boxes1[k] and boxes2[k] for every k"""
+    width = np.minimum(boxes1[:, 2], boxes2[:, 2]) - np.maximum(boxes1[:, 0], boxes2[:, 0])
+    height = np.minimum(boxes1[:, 3], boxes2[:, 3]) - np.maximum(boxes1[:, 1], boxes2[:, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    return intersection / np.maximum(area1 + area2 - intersection, 1e-9)
+
+def merge_boxes(boxes, scores, iou_threshold, mode="nms"):
+    """
+    Greedy non-maximum suppression, or fusion of the suppressed duplicates
+    Candidate pairs come from get_overlapping_pairs and their IoU is
+    computed in one vectorised step; the greedy pass then only visits boxes
+    that overlap a worse box, so a page of a few thousand boxes merges in
+    milliseconds. The result equals classic greedy NMS. With mode "fuse",
+    every kept box becomes the score-weighted mean of itself and the boxes
+    it suppressed, and keeps the highest score.
+    Args:
+        boxes: float array (n, 4)
+        scores: float array (n,)
+        iou_threshold: Boxes overlapping a better box above this are merged
+        mode: "nms" or "fuse"
+    Returns:
+        tuple: (boxes, scores) of the kept boxes, best first
+    """
+    if mode not in ("nms", "fuse"):
+        raise ValueError(f"Unknown merge mode: {mode}")
+    if not len(boxes):
+        return boxes, scores
+    
+    # Work in score order: a lower index is a better box
+    order = np.argsort(-scores, kind="stable")
+    boxes, scores = boxes[order], scores[order]
+    
+    i, j = get_overlapping_pairs(boxes)
+    duplicate = pair_iou(boxes[i], boxes[j]) > iou_threshold
+    better = np.minimum(i, j)[duplicate]
+    worse = np.maximum(i, j)[duplicate]
+    edges = np.argsort(better, kind="stable")
+    better, worse = better[edges], worse[edges]
+    sources, starts = np.unique(better, return_index=True)
+    stops = np.append(starts[1:], len(better))
+    
+    # cluster[k] = index of the kept box that absorbed box k
+    cluster = np.arange(len(boxes))
+    remaining = np.ones(len(boxes), dtype=bool)
+    for source, start, stop in zip(sources.tolist(), starts.tolist(), stops.tolist()):
+        if remaining[source]:
+            absorbed = worse[start:stop]
+            absorbed = absorbed[remaining[absorbed]]
+            cluster[absorbed] = source
+            remaining[absorbed] = False
+    
+    keep = np.flatnonzero(remaining)
+    if mode == "nms":
+        return boxes[keep], scores[keep]
+    
+    weighted = np.zeros(boxes.shape, dtype=np.float64)
+    weights = np.zeros(len(boxes), dtype=np.float64)
+    np.add.at(weighted, cluster, boxes * scores[:, None])
+    np.add.at(weights, cluster, scores)
+    weights = weights[keep][:, None]
+    # A cluster of zero-score boxes keeps its best box as it is
+    fused = np.where(weights > 0, weighted[keep] / np.maximum(weights, 1e-12), boxes[keep])
+    return fused.astype(boxes.dtype), scores[keep]
+
+class TiledDetector:
+    def __init__(self, detector, tile_size=INFERENCE_TILE_SIZE, overlap=INFERENCE_TILE_OVERLAP,
+                 tile_batch_size=INFERENCE_TILE_BATCH_SIZE, iou=INFERENCE_IOU, merge=INFERENCE_TILE_MERGE,
+                 edge_margin=2, stats=None):
+        """
+        Run a detector on overlapping native-resolution tiles of each page
+        A 300-DPI page downscaled to 640 pixels shrinks small words to a few
+        pixels; tiles keep them at full size. Boxes are mapped back to page
+        coordinates. A box touching an inner tile edge (a word cut by the
+        tile) is dropped when another tile holds the whole box; pieces of
+        words wider than the overlap, which no tile holds whole, are joined
+        (join_fragments). The remaining duplicates from the overlaps are
+        merged with merge_boxes.
+        Has the predict(images) API of UltralyticsDetector, so it plugs into
+        BatchRunner; the wrapped detector should run at image size tile_size.
+        Args:
+            detector: Detector run on the tiles
+            tile_size: Tile side in page pixels
+            overlap: Overlap of neighbouring tiles in pixels
+            tile_batch_size: Tiles per call of the wrapped detector
+            iou: IoU threshold of the duplicate merge
+            merge: "nms" or "fuse" (see merge_boxes)
+            edge_margin: Distance in pixels at which a box touches a tile edge
+            stats: Optional PipelineStats receiving 'tiles' and 'merge' timings
+        """
+        if overlap >= tile_size:
+            raise ValueError(f"Tile overlap {overlap} must be smaller than the tile size {tile_size}")
+        if merge not in ("nms", "fuse"):
+            raise ValueError(f"Unknown merge mode: {merge}")
+        self.detector = detector
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.tile_batch_size = max(1, tile_batch_size)
+        self.iou = iou
+        self.merge = merge
+        self.edge_margin = edge_margin
+        self.stats = stats or PipelineStats(enabled=False)
+    
+    def find_cut_boxes(self, boxes, tile, tiles, width, height):
+        """
+        Find the boxes cut by an inner edge of tile
+        Args:
+            boxes: Page-coordinate boxes (n, 4) found in tile
+            tile: (x1, y1, x2, y2) of the tile
+            tiles: All tiles of the page
+            width, height: Page size
+        Returns:
+            tuple: (keep, cut) boolean masks; cut boxes that another tile
+                   sees whole are not kept, the other cut boxes are fragments
+        """
+        margin = self.edge_margin
+        x1, y1, x2, y2 = tile
+        cut = np.zeros(len(boxes), dtype=bool)
+        if x1 > 0:
+            cut |= boxes[:, 0] <= x1 + margin
+        if y1 > 0:
+            cut |= boxes[:, 1] <= y1 + margin
+        if x2 < width:
+            cut |= boxes[:, 2] >= x2 - margin
+        if y2 < height:
+            cut |= boxes[:, 3] >= y2 - margin
+        if not cut.any():
+            return np.ones(len(boxes), dtype=bool), cut
+        
+        # A cut box is redundant if it lies well inside some other tile
+        others = tiles[np.any(tiles != np.asarray(tile), axis=1)]
+        cut_boxes = boxes[cut]
+        inside = (
+            (cut_boxes[:, None, 0] >= others[None, :, 0] + margin) &
+            (cut_boxes[:, None, 1] >= others[None, :, 1] + margin) &
+            (cut_boxes[:, None, 2] <= others[None, :, 2] - margin) &
+            (cut_boxes[:, None, 3] <= others[None, :, 3] - margin)
+        ).any(axis=1)
+        keep = np.ones(len(boxes), dtype=bool)
+        keep[np.flatnonzero(cut)[inside]] = False
+        return keep, cut & keep
+    
+    @staticmethod
+    def join_fragments(boxes, scores, tile_ids):
+        """
+        Join the pieces of words wider than the tile overlap
+        Such a word is cut in every tile; its pieces from different tiles
+        overlap in the overlap band and share their vertical extent, and are
+        replaced by their union with the best score.
+        Args:
+            boxes: Cut boxes (n, 4) left after find_cut_boxes
+            scores: Their scores
+            tile_ids: Tile index of each box
+        Returns:
+            tuple: (boxes, scores) with joined pieces
+        """
+        if len(boxes) < 2:
+            return boxes, scores
+        
+        i, j = get_overlapping_pairs(boxes)
+        vertical = np.minimum(boxes[i, 3], boxes[j, 3]) - np.maximum(boxes[i, 1], boxes[j, 1])
+        min_height = np.minimum(boxes[i, 3] - boxes[i, 1], boxes[j, 3] - boxes[j, 1])
+        same_word = (tile_ids[i] != tile_ids[j]) & (vertical > 0.5 * min_height)
+        i, j = i[same_word], j[same_word]
+        if not len(i):
+            return boxes, scores
+        
+        # Connected pieces share the smallest index as label
+        labels = np.arange(len(boxes))
+        while True:
+            joined = np.minimum(labels[i], labels[j])
+            updated = labels.copy()
+            np.minimum.at(updated, i, joined)
+            np.minimum.at(updated, j, joined)
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+        
+        groups, labels = np.unique(labels, return_inverse=True)
+        joined_boxes = np.empty((len(groups), 4), dtype=boxes.dtype)
+        joined_boxes[:, :2] = np.inf
+        joined_boxes[:, 2:] = -np.inf
+        np.minimum.at(joined_boxes[:, 0], labels, boxes[:, 0])
+        np.minimum.at(joined_boxes[:, 1], labels, boxes[:, 1])
+        np.maximum.at(joined_boxes[:, 2], labels, boxes[:, 2])
+        np.maximum.at(joined_boxes[:, 3], labels, boxes[:, 3])
+        joined_scores = np.full(len(groups), -np.inf, dtype=scores.dtype)
+        np.maximum.at(joined_scores, labels, scores)
+        return joined_boxes, joined_scores
+    
+    def predict(self, images):
+        """
+        Detect words on a batch of pages, tile by tile
+        Returns:
+            list: (boxes, scores) per page in page pixels, as UltralyticsDetector
+        """
+        # Tiles of all pages of the batch, run in tile batches
+        page_tiles = []
+        jobs = []
+        for page_index, image in enumerate(images):
+            height, width = image.shape[:2]
+            tiles = get_tiles(width, height, self.tile_size, self.overlap)
+            page_tiles.append(tiles)
+            jobs.extend((page_index, tile) for tile in tiles)
+        
+        found = [[] for _ in images]
+        for start in range(0, len(jobs), self.tile_batch_size):
+            batch = jobs[start:start + self.tile_batch_size]
+            crops = [
+                np.ascontiguousarray(images[page_index][tile[1]:tile[3], tile[0]:tile[2]])
+                for page_index, tile in batch
+            ]
+            with self.stats.timer('tiles'):
+                predictions = self.detector.predict(crops)
+            for (page_index, tile), (boxes, scores) in zip(batch, predictions):
+                found[page_index].append((tile, boxes, scores))
+        
+        results = []
+        for image, tiles, tile_results in zip(images, page_tiles, found):
+            height, width = image.shape[:2]
+            with self.stats.timer('merge'):
+                whole = ([], [])
+                pieces = ([], [], [])
+                for tile_index, (tile, boxes, scores) in enumerate(tile_results):
+                    boxes = boxes.astype(np.float32).reshape(-1, 4) + np.array(
+                        [tile[0], tile[1], tile[0], tile[1]], dtype=np.float32
+                    )
+                    scores = scores.astype(np.float32)
+                    keep, cut = self.find_cut_boxes(boxes, tile, tiles, width, height)
+                    whole[0].append(boxes[keep & ~cut])
+                    whole[1].append(scores[keep & ~cut])
+                    pieces[0].append(boxes[cut])
+                    pieces[1].append(scores[cut])
+                    pieces[2].append(np.full(int(cut.sum()), tile_index))
+                
+                piece_boxes, piece_scores = self.join_fragments(*(np.concatenate(part) for part in pieces))
+                boxes = np.concatenate(whole[0] + [piece_boxes.reshape(-1, 4)])
+                scores = np.concatenate(whole[1] + [piece_scores])
+                results.append(merge_boxes(boxes, scores, self.iou, self.merge))
+        return results
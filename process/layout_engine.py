@@ -0,0 +1,78 @@
+import numpy as np
+
+def layout_page(offsets, left_margin, usable_width, top_margin, bottom_limit, line_spacing):
+    """
+    Greedy line breaking for a whole page with NumPy
+    Same rules as the original word-by-word loop: a word wraps when
+    x + width > left_margin + usable_width, the first word of a line is always
+    placed, a wrap moves y down by the wrapping word's height plus line
+    spacing, and the page is full once a new line would cross bottom_limit.
+    Line ends are found with one searchsorted over the cumulative widths per
+    line instead of one Python step per word.
+    Args:
+        offsets: int array (n, 4) of (left, top, right, bottom) bbox offsets
+        left_margin: x of every line start
+        usable_width: Width available for text
+        top_margin: y of the first line
+        bottom_limit: Lowest y a word may reach (image height - bottom margin)
+        line_spacing: Extra spacing added on each wrap
+    Returns:
+        dict: 'xmin', 'ymin', 'xmax', 'ymax', 'line_id' arrays for the placed
+              words, plus 'words_used' and 'page_full'
+    """
+    offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 4)
+    n = len(offsets)
+    widths = offsets[:, 2] - offsets[:, 0]
+    heights = offsets[:, 3] - offsets[:, 1]
+    
+    cumulative = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(widths, out=cumulative[1:])
+    
+    line_starts = []
+    line_ys = []
+    y = top_margin
+    start = 0
+    page_full = False
+    
+    # A first word wider than the line wraps once onto an empty line
+    if n and widths[0] > usable_width:
+        y += int(heights[0]) + line_spacing
+        if y + heights[0] > bottom_limit:
+            page_full = True
+            n = 0
+    
+    while start < n:
+        line_starts.append(start)
+        line_ys.append(y)
+        
+        # Words start+1.. stay on the line while their right edge fits
+        end = int(np.searchsorted(cumulative, cumulative[start] + usable_width, side="right")) - 1
+        end = max(end, start + 1)
+        if end >= n:
+            start = n
+            break
+        
+        # Word `end` wraps onto the next line
+        y += int(heights[end]) + line_spacing
+        start = end
+        if y + heights[end] > bottom_limit:
+            page_full = True
+            break
+    
+    words_used = start
+    line_starts = np.asarray(line_starts, dtype=np.int64)
+    line_lengths = np.diff(np.append(line_starts, words_used))
+    line_index = np.repeat(np.arange(len(line_starts)), line_lengths)
+    
+    x = left_margin + cumulative[:words_used] - cumulative[line_starts][line_index]
+    y = np.asarray(line_ys, dtype=np.int64)[line_index]
+    
+    return {
+        'xmin': x,
+        'ymin': y,
+        'xmax': x + offsets[:words_used, 2],
+        'ymax': y + offsets[:words_used, 3],
+        'line_id': line_index + 1,
+        'words_used': words_used,
+        'page_full': page_full
+    }
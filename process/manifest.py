@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+
+HASH_BLOCK_SIZE = 1 << 20
+
+def get_file_info(path, data=None):
+    """
+    Size and SHA-256 of a file
+    Args:
+        path: Path of the file
+        data: Optional bytes already written to path (avoids reading it back)
+    Returns:
+        dict: {'path', 'size', 'sha256'}
+    """
+    if data is None:
+        # Hash in blocks: shards can be larger than memory should hold
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+                size += len(block)
+        return {'path': path, 'size': size, 'sha256': digest.hexdigest()}
+    return {
+        'path': path,
+        'size': len(data),
+        'sha256': hashlib.sha256(data).hexdigest()
+    }
+
+def sync_file(path):
+    """Flush a written file to disk, so it survives a crash of the machine"""
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class GenerationManifest:
+    def __init__(self, manifest_path):
+        """
+        Append-only JSON-lines record of completed images
+        The first line describes the generation plan; every following line is
+        one image whose image, YOLO and XML files were fully written. Records
+        are appended with a single O_APPEND write, so concurrent workers never
+        interleave and a crash can at most leave a truncated last line.
+        Args:
+            manifest_path: Path of the manifest file
+        """
+        self.manifest_path = manifest_path
+        self.fd = None
+    
+    def start(self, plan_info):
+        """Start a new manifest for a fresh run"""
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({'type': 'plan', **plan_info}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def append(self, record):
+        """Append the record of one completed image"""
+        if self.fd is None:
+            self.fd = os.open(self.manifest_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        
+        line = json.dumps({'type': 'image', **record}, ensure_ascii=False) + "\n"
+        os.write(self.fd, line.encode("utf-8"))
+        os.fsync(self.fd)
+    
+    def close(self):
+        """Close the append handle"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+    
+    def load(self):
+        """
+        Read the manifest
+        Returns:
+            tuple: (plan_info or None, {image_number: record})
+        """
+        plan_info = None
+        records = {}
+        if not os.path.exists(self.manifest_path):
+            return plan_info, records
+        
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Truncated line from an interrupted append
+                    continue
+                
+                entry_type = entry.pop('type', None)
+                if entry_type == 'plan':
+                    plan_info = entry
+                elif entry_type == 'image':
+                    records[entry['image_number']] = entry
+        
+        return plan_info, records
+    
+    def is_complete(self, record, verify_hashes=False):
+        """
+        Check that all files of a record exist with the recorded size (and hash)
+        """
+        for file_info in record['files'].values():
+            path = file_info['path']
+            if not os.path.exists(path) or os.path.getsize(path) != file_info['size']:
+                return False
+            if verify_hashes and get_file_info(path)['sha256'] != file_info['sha256']:
+                return False
+        return True
+    
+    def load_completed(self, plan_info, verify_hashes=False):
+        """
+        Find the images of this plan that are already complete on disk
+        Args:
+            plan_info: Description of the current plan
+            verify_hashes: Re-hash every file instead of checking sizes only
+        Returns:
+            dict: {image_number: record} of images that can be skipped
+        """
+        saved_plan_info, records = self.load()
+        if saved_plan_info is None:
+            raise Exception(f"No generation manifest to resume from: {self.manifest_path}")
+        
+        if saved_plan_info != plan_info:
+            changed = sorted(k for k in set(plan_info) | set(saved_plan_info)
+                             if plan_info.get(k) != saved_plan_info.get(k))
+            raise Exception(f"Cannot resume: generation plan changed ({', '.join(changed)})")
+        
+        return {
+            image_number: record
+            for image_number, record in records.items()
+            if self.is_complete(record, verify_hashes)
+        }
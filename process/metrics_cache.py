@@ -0,0 +1,133 @@
+import os
+import json
+import tempfile
+from collections import OrderedDict
+from PIL import Image, ImageDraw, features
+import PIL
+
+class WordMetricsCache:
+    def __init__(self, max_entries=200000, cache_dir=None, read_only=False):
+        """
+        LRU cache of word bounding-box offsets keyed by (font file, font size, word)
+        Offsets are relative to the draw origin, so a cached bbox at (x, y) is
+        (x + left, y + top, x + right, y + bottom), exactly what draw.textbbox returns.
+        Args:
+            max_entries: Maximum number of in-memory entries before LRU eviction
+            cache_dir: Optional directory with one JSON file per font
+            read_only: Never write the on-disk store (e.g. shared by workers)
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.read_only = read_only
+        self.entries = OrderedDict()
+        self.pending = {}  # font_path -> {(size, word): offsets} not yet on disk
+        self.loaded_fonts = set()
+        self.hits = 0
+        self.misses = 0
+        
+        # Metrics depend on the shaping engine, so the store is tagged with it
+        layout = "raqm" if features.check("raqm") else "basic"
+        self.version = f"pillow-{PIL.__version__}-{layout}"
+        
+        # Scratch surface for measuring; textbbox never draws
+        self.draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+        
+        if self.cache_dir and not self.read_only:
+            os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def get_offsets(self, font, font_path, font_size, word):
+        """
+        Return the (left, top, right, bottom) offsets of a word
+        Args:
+            font: FreeTypeFont used to measure on a miss
+            font_path: Path of the font file (part of the key)
+            font_size: Size of the font (part of the key)
+            word: Word to measure
+        Returns:
+            tuple: Bounding box relative to the draw origin
+        """
+        if font_path not in self.loaded_fonts:
+            self.load_font(font_path)
+        
+        key = (font_path, font_size, word)
+        offsets = self.entries.get(key)
+        if offsets is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return offsets
+        
+        self.misses += 1
+        offsets = self.draw.textbbox((0, 0), word, font=font)
+        self.put(key, offsets)
+        
+        if self.cache_dir and not self.read_only:
+            self.pending.setdefault(font_path, {})[(font_size, word)] = offsets
+        
+        return offsets
+    
+    def put(self, key, offsets):
+        """Insert an entry, evicting the least recently used ones"""
+        self.entries[key] = offsets
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def get_store_path(self, font_path):
+        """Path of the on-disk store of a font"""
+        font_name = os.path.splitext(os.path.basename(font_path))[0]
+        return os.path.join(self.cache_dir, f"{font_name}.json")
+    
+    def read_store(self, font_path):
+        """Read the on-disk store of a font as {size: {word: offsets}}"""
+        store_path = self.get_store_path(font_path)
+        if not os.path.exists(store_path):
+            return {}
+        
+        try:
+            with open(store_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        # Drop stores written by another Pillow/shaping engine
+        if data.get("version") != self.version:
+            return {}
+        
+        return data.get("sizes", {})
+    
+    def load_font(self, font_path):
+        """Warm the in-memory cache from the on-disk store of a font"""
+        self.loaded_fonts.add(font_path)
+        if not self.cache_dir:
+            return
+        
+        for size, words in self.read_store(font_path).items():
+            for word, offsets in words.items():
+                if len(self.entries) >= self.max_entries:
+                    return
+                self.entries[(font_path, int(size), word)] = tuple(offsets)
+    
+    def save(self):
+        """
+        Merge newly measured words into the on-disk stores
+        Each store is rewritten atomically, so concurrent readers never see a
+        partial file and concurrent writers only lose each other's new words.
+        """
+        if not self.cache_dir or self.read_only:
+            return
+        
+        for font_path, new_entries in self.pending.items():
+            sizes = self.read_store(font_path)
+            for (size, word), offsets in new_entries.items():
+                sizes.setdefault(str(size), {})[word] = list(offsets)
+            
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "sizes": sizes}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.get_store_path(font_path))
+        
+        self.pending = {}
+    
+    def get_pending_count(self):
+        """Number of measured words not yet written to disk"""
+        return sum(len(entries) for entries in self.pending.values())
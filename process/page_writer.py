@@ -0,0 +1,174 @@
+import os
+import queue
+import threading
+from process.config import OUTPUT_IMAGE_DIR, WRITER_THREADS, WRITER_QUEUE_SIZE
+from process.manifest import get_file_info, sync_file
+from process.pipeline_stats import PipelineStats
+
+class PageWriter:
+    def __init__(self, image_encoder, yolo_formatter, xml_formatter,
+                 num_threads=WRITER_THREADS, max_pending=WRITER_QUEUE_SIZE, manifest=None,
+                 stats=None, shard_writer=None):
+        """
+        Write-behind stage for finished pages
+        Encoding and the image, YOLO and XML writes run on background threads
+        (OpenCV and file I/O release the GIL), so rendering continues while a
+        page is being written. The queue is bounded: submit blocks once
+        max_pending pages are waiting, which keeps memory bounded.
+        Args:
+            image_encoder: ImageEncoder instance
+            yolo_formatter: YoloFormatter instance
+            xml_formatter: XmlFormatter instance
+            num_threads: Number of writer threads (0 = write synchronously)
+            max_pending: Maximum number of pages waiting to be written
+            manifest: Optional GenerationManifest; a record is appended once
+                      all three files of a page are written
+            stats: Optional PipelineStats receiving write timings and byte counts
+            shard_writer: Optional ShardWriter; pages are packed into shards
+                          instead of loose files and the shard writer records
+                          them in its manifest
+        """
+        self.image_encoder = image_encoder
+        self.yolo_formatter = yolo_formatter
+        self.xml_formatter = xml_formatter
+        self.manifest = manifest
+        self.stats = stats or PipelineStats(enabled=False)
+        self.shard_writer = shard_writer
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.closed = False
+        self.pages_written = 0
+        self.lock = threading.Lock()
+        
+        self.threads = [
+            threading.Thread(target=self.run, name=f"page-writer-{i}", daemon=True)
+            for i in range(num_threads)
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def submit(self, img_cv, word_boxes, image_name, output_filename, image_width, image_height, record=None):
+        """
+        Queue a finished page for writing, blocking while the queue is full
+        Raises the first error of a previous write, if any.
+        record is the page's manifest entry, completed with its file info.
+        """
+        if self.closed:
+            raise RuntimeError("PageWriter is closed")
+        self.raise_error()
+        
+        job = (img_cv, word_boxes, image_name, output_filename, image_width, image_height, record)
+        if not self.threads:
+            self.write(*job)
+            return
+        
+        self.queue.put(job)
+    
+    def write(self, img_cv, word_boxes, image_name, output_filename, image_width, image_height, record=None):
+        """
+        Encode and write the image, YOLO and XML files of one page
+        img_cv may be None for layout-only pages; only labels are written then.
+        """
+        if self.shard_writer is not None:
+            self.write_shard(img_cv, word_boxes, image_name, output_filename, image_width, image_height, record)
+            return
+        
+        stats = self.stats
+        if img_cv is not None:
+            image_path = os.path.join(OUTPUT_IMAGE_DIR, image_name)
+            with stats.timer('encode'):
+                image_data = self.image_encoder.encode(img_cv)
+            with stats.timer('write_image'):
+                with open(image_path, "wb") as f:
+                    f.write(image_data)
+            stats.count('image_bytes', len(image_data))
+        with stats.timer('yolo'):
+            yolo_path = self.yolo_formatter.generate_yolo_label(word_boxes, output_filename, image_width, image_height)
+        with stats.timer('xml'):
+            xml_path = self.xml_formatter.generate_xml_label(word_boxes, image_name, output_filename, image_width, image_height)
+        if stats.enabled:
+            stats.count('label_bytes', os.path.getsize(yolo_path) + os.path.getsize(xml_path))
+        
+        # Only pages whose files are all on disk make it into the manifest;
+        # they are synced first, so a record never outlives its files
+        if self.manifest is not None and record is not None:
+            with stats.timer('manifest'):
+                files = {}
+                if img_cv is not None:
+                    sync_file(image_path)
+                    files['image'] = get_file_info(image_path, image_data)
+                sync_file(yolo_path)
+                sync_file(xml_path)
+                files['yolo'] = get_file_info(yolo_path)
+                files['xml'] = get_file_info(xml_path)
+                record['files'] = files
+        
+        with self.lock:
+            if self.manifest is not None and record is not None:
+                self.manifest.append(record)
+            self.pages_written += 1
+    
+    def write_shard(self, img_cv, word_boxes, image_name, output_filename, image_width, image_height, record=None):
+        """Encode the image and labels of one page and add them to the shard writer"""
+        stats = self.stats
+        image_data = None
+        if img_cv is not None:
+            with stats.timer('encode'):
+                image_data = self.image_encoder.encode(img_cv)
+        with stats.timer('yolo'):
+            yolo_data = self.yolo_formatter.format_yolo_label(word_boxes, image_width, image_height).encode("utf-8")
+        with stats.timer('xml'):
+            xml_data = self.xml_formatter.format_xml_label(word_boxes, image_name, image_width, image_height)
+        
+        with stats.timer('write_shard'):
+            self.shard_writer.add(output_filename, image_name, image_data, yolo_data, xml_data, record)
+        if stats.enabled:
+            stats.count('image_bytes', len(image_data or b""))
+            stats.count('label_bytes', len(yolo_data) + len(xml_data))
+        
+        with self.lock:
+            self.pages_written += 1
+    
+    def run(self):
+        """Writer thread: write queued pages until the close sentinel arrives"""
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                self.write(*job)
+            except BaseException as e:
+                # Keep writing the other pages; the error surfaces on submit/close
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
+            finally:
+                self.queue.task_done()
+    
+    def raise_error(self):
+        """Re-raise the first error of a writer thread in the caller"""
+        if self.error is not None:
+            raise RuntimeError(f"Failed to write page: {self.error}") from self.error
+    
+    def close(self):
+        """Write all queued pages and stop the writer threads"""
+        if self.closed:
+            return
+        self.closed = True
+        
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        
+        if self.shard_writer is not None:
+            self.shard_writer.close()
+        if self.manifest is not None:
+            self.manifest.close()
+        self.raise_error()
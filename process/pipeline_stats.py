@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+# Shared do-nothing context of disabled timers
+_NULL_TIMER = nullcontext()
+
+class StageTimer:
+    """Context manager adding its elapsed time to a stage of PipelineStats"""
+    __slots__ = ("stats", "stage", "start")
+    
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.add_time(self.stage, time.perf_counter() - self.start)
+
+class PipelineStats:
+    def __init__(self, enabled=True):
+        """
+        Per-stage timers and counters of the generation pipeline
+        Stages are timed per page (not per word), so the cost is a few
+        perf_counter calls per page; when disabled, timer() returns a shared
+        no-op context and count() returns immediately. Writer threads update
+        the same instance, so updates take a lock.
+        Args:
+            enabled: Collect timings and counters
+        """
+        self.enabled = enabled
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+    
+    def timer(self, stage):
+        """Time a `with` block as one call of stage"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return StageTimer(self, stage)
+    
+    def add_time(self, stage, seconds):
+        """Add one call of stage that took seconds"""
+        with self.lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+    
+    def count(self, name, value=1):
+        """Add value to counter name"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def to_dict(self):
+        """Timings and counters as a JSON-serialisable dict"""
+        with self.lock:
+            return {
+                'stages': {
+                    stage: {
+                        'seconds': round(seconds, 6),
+                        'calls': self.calls[stage],
+                        'mean_ms': round(seconds / self.calls[stage] * 1000, 3)
+                    }
+                    for stage, seconds in self.seconds.items()
+                },
+                'counters': dict(self.counters)
+            }
+    
+    def merge(self, data):
+        """Add the timings and counters of a to_dict() result"""
+        with self.lock:
+            for stage, entry in data['stages'].items():
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + entry['seconds']
+                self.calls[stage] = self.calls.get(stage, 0) + entry['calls']
+            for name, value in data['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+    
+    def dump(self, path):
+        """Write to_dict() to path, e.g. when a worker process exits"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+class ThroughputReporter:
+    def __init__(self, total_pages, interval, completed_pages=0):
+        """
+        Periodic pages/sec, words/sec and ETA line for long runs
+        Args:
+            total_pages: Pages in the whole plan
+            interval: Seconds between reports (0 disables reporting)
+            completed_pages: Pages already done before this run (resume)
+        """
+        self.total_pages = total_pages
+        self.interval = interval
+        self.completed_pages = completed_pages
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.pages = 0
+        self.words = 0
+    
+    def update(self, words):
+        """Record one finished page and print a report when one is due"""
+        self.pages += 1
+        self.words += words
+        if not self.interval:
+            return
+        
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            print(f"  {self.format_report(now)}")
+    
+    def format_report(self, now=None):
+        """Throughput and ETA so far as one line"""
+        elapsed = (now or time.perf_counter()) - self.start
+        pages_per_sec = self.pages / elapsed if elapsed else 0.0
+        words_per_sec = self.words / elapsed if elapsed else 0.0
+        remaining = self.total_pages - self.completed_pages - self.pages
+        eta = remaining / pages_per_sec if pages_per_sec else 0.0
+        return (f"[throughput] {pages_per_sec:.2f} pages/s | {words_per_sec:.0f} words/s | "
+                f"elapsed {format_duration(elapsed)} | ETA {format_duration(eta)}")
+    
+    def get_elapsed(self):
+        """Seconds since the reporter was created"""
+        return time.perf_counter() - self.start
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
@@ -1,9 +1,25 @@
 import os
-from process.config import FONT_DIR
+from collections import OrderedDict
+from PIL import ImageFont
+from process.config import FONT_DIR, FONT_POOL_SIZE
+
+class SharedFontBytes:
+    """File-like wrapper that hands Pillow the same bytes object on every read"""
+    def __init__(self, data):
+        self.data = data
+    
+    def read(self):
+        return self.data
 
 class FontManager:
-    def __init__(self):
+    def __init__(self, verbose=True, pool_size=FONT_POOL_SIZE):
         self.all_fonts = []
+        self.verbose = verbose
+        self.pool_size = pool_size
+        self.font_bytes = {}  # font_path -> raw file bytes, read once
+        self.font_pool = OrderedDict()  # (font_path, font_size) -> FreeTypeFont
+        self.pool_hits = 0
+        self.pool_misses = 0
         self.load_fonts()
     
     def load_fonts(self):
@@ -17,6 +33,9 @@ class FontManager:
         if not self.all_fonts:
             raise Exception(f"No .ttf fonts found in {FONT_DIR} folder!")
         
+        if not self.verbose:
+            return
+        
         print(f"Loaded {len(self.all_fonts)} fonts from {FONT_DIR}")
         for i, font_path in enumerate(self.all_fonts, 1):
             print(f"  {i}. {os.path.basename(font_path)}")
@@ -31,4 +50,54 @@ class FontManager:
     
     def get_font_name(self, font_path):
         """Get font filename without extension"""
-        return os.path.splitext(os.path.basename(font_path))[0]
\ No newline at end of file
+        return os.path.splitext(os.path.basename(font_path))[0]
+    
+    def get_font_bytes(self, font_path):
+        """Return the bytes of a font file, reading it from disk only once"""
+        data = self.font_bytes.get(font_path)
+        if data is None:
+            with open(font_path, "rb") as f:
+                data = f.read()
+            self.font_bytes[font_path] = data
+        return data
+    
+    def get_font(self, font_path, font_size):
+        """
+        Get a pooled FreeTypeFont for a font file and size
+        Args:
+            font_path: Path to the font file
+            font_size: Size of the font
+        Returns:
+            FreeTypeFont: Cached instance, least recently used ones are evicted
+        """
+        key = (font_path, font_size)
+        font = self.font_pool.get(key)
+        if font is not None:
+            self.pool_hits += 1
+            self.font_pool.move_to_end(key)
+            return font
+        
+        self.pool_misses += 1
+        font = ImageFont.truetype(SharedFontBytes(self.get_font_bytes(font_path)), font_size)
+        self.font_pool[key] = font
+        while len(self.font_pool) > self.pool_size:
+            self.font_pool.popitem(last=False)
+        return font
+    
+    def warm_up(self, font_paths, font_sizes):
+        """
+        Preload font bytes and pooled fonts, e.g. in the parent before forking
+        Forked workers inherit the loaded fonts; only as many as fit in the
+        pool are created. Warm-up loads are not counted as hits or misses.
+        """
+        for font_path in font_paths:
+            self.get_font_bytes(font_path)
+        
+        for font_path in font_paths:
+            for font_size in font_sizes:
+                if len(self.font_pool) >= self.pool_size:
+                    return
+                key = (font_path, font_size)
+                if key not in self.font_pool:
+                    data = self.get_font_bytes(font_path)
+                    self.font_pool[key] = ImageFont.truetype(SharedFontBytes(data), font_size)
@@ -0,0 +1,221 @@
+import io
+import os
+import glob
+import json
+import time
+import tarfile
+import threading
+from process.config import SHARD_DIR, SHARD_MAX_PAGES, SHARD_MAX_MB
+from process.manifest import get_file_info, sync_file
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx.json"
+
+# Member directories inside a shard, same as the loose-file layout
+MEMBER_DIRS = {'image': "images", 'yolo': "labels", 'xml': "xml_labels"}
+
+def get_index_path(shard_path):
+    """Path of the index written next to a shard"""
+    return shard_path + INDEX_SUFFIX
+
+class ShardWriter:
+    def __init__(self, shard_dir=SHARD_DIR, max_pages=SHARD_MAX_PAGES, max_bytes=SHARD_MAX_MB * 1024 * 1024,
+                 manifest=None):
+        """
+        Write pages into packed shards instead of loose files
+        A shard is a plain uncompressed tar holding images/<name>,
+        labels/<name>.txt and xml_labels/<name>.xml of each page, so `tar -x`
+        restores the usual directory layout. Next to it, <shard>.idx.json maps
+        every page to the byte offset and size of its members for random
+        access. The index is written after the tar is closed: a shard without
+        index is incomplete and ignored by readers. Shards are named after the
+        first page they hold, so concurrent workers never collide.
+        Args:
+            shard_dir: Directory of the shards
+            max_pages: Pages per shard before starting the next one
+            max_bytes: Shard size in bytes before starting the next one
+            manifest: Optional GenerationManifest; records of a shard's pages
+                      are appended once the shard and its index are complete
+        """
+        self.shard_dir = shard_dir
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.manifest = manifest
+        self.lock = threading.Lock()
+        self.tar = None
+        self.shard_path = None
+        self.pages = []
+        self.records = []
+        self.shards_written = 0
+        os.makedirs(shard_dir, exist_ok=True)
+    
+    def add_member(self, name, data):
+        """Append one member to the open tar and return its (offset, size)"""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tar.addfile(info, io.BytesIO(data))
+        # The tar offset is now at the end of the 512-byte padded member data
+        return [self.tar.offset - (len(data) + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE,
+                len(data)]
+    
+    def add(self, output_filename, image_name, image_data, yolo_data, xml_data, record=None):
+        """
+        Add the encoded image (None in layout-only mode) and labels of a page
+        """
+        with self.lock:
+            if self.tar is None:
+                self.shard_path = os.path.join(self.shard_dir, f"shard_{output_filename}.tar")
+                # An index left by an earlier run would describe the old tar
+                if os.path.exists(get_index_path(self.shard_path)):
+                    os.remove(get_index_path(self.shard_path))
+                self.tar = tarfile.open(self.shard_path, "w", format=tarfile.GNU_FORMAT)
+            
+            members = {}
+            if image_data is not None:
+                members['image'] = self.add_member(f"{MEMBER_DIRS['image']}/{image_name}", image_data)
+            members['yolo'] = self.add_member(f"{MEMBER_DIRS['yolo']}/{output_filename}.txt", yolo_data)
+            members['xml'] = self.add_member(f"{MEMBER_DIRS['xml']}/{output_filename}.xml", xml_data)
+            
+            self.pages.append({
+                'name': output_filename,
+                'image_name': image_name,
+                'members': members
+            })
+            if record is not None:
+                self.records.append(record)
+            
+            if len(self.pages) >= self.max_pages or self.tar.offset >= self.max_bytes:
+                self.finish_shard()
+    
+    def finish_shard(self):
+        """Close the open shard, write its index and record its pages"""
+        if self.tar is None:
+            return
+        
+        self.tar.close()
+        self.tar = None
+        index = {
+            'version': INDEX_VERSION,
+            'shard': os.path.basename(self.shard_path),
+            'size': os.path.getsize(self.shard_path),
+            'pages': self.pages
+        }
+        index_path = get_index_path(self.shard_path)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+        
+        if self.manifest is not None and self.records:
+            # Records only point at shards already flushed to disk
+            sync_file(self.shard_path)
+            sync_file(index_path)
+            files = {'shard': get_file_info(self.shard_path), 'index': get_file_info(index_path)}
+            for record in self.records:
+                record['files'] = files
+                self.manifest.append(record)
+        
+        self.pages = []
+        self.records = []
+        self.shards_written += 1
+    
+    def close(self):
+        """Finish the last, partially filled shard"""
+        with self.lock:
+            self.finish_shard()
+
+class ShardReader:
+    def __init__(self, shard_path):
+        """
+        Random-access reader of one shard through its index
+        Members are read with os.pread, so one reader can be shared by threads.
+        Args:
+            shard_path: Path of the .tar shard
+        """
+        self.shard_path = shard_path
+        with open(get_index_path(shard_path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index['version'] != INDEX_VERSION:
+            raise Exception(f"Unsupported shard index version {index['version']}: {shard_path}")
+        self.pages = {page['name']: page for page in index['pages']}
+        self.fd = os.open(shard_path, os.O_RDONLY)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def __len__(self):
+        return len(self.pages)
+    
+    def __contains__(self, name):
+        return name in self.pages
+    
+    def names(self):
+        """Base filenames (e.g. img_00001) of the pages in the shard"""
+        return list(self.pages)
+    
+    def read_member(self, name, kind):
+        """
+        Read one member of a page
+        Args:
+            name: Base filename of the page
+            kind: "image", "yolo" or "xml"
+        Returns:
+            bytes: Member data, or None if the page has no such member
+        """
+        member = self.pages[name]['members'].get(kind)
+        if member is None:
+            return None
+        offset, size = member
+        return os.pread(self.fd, size, offset)
+    
+    def get_page(self, name):
+        """
+        Read all members of a page
+        Returns:
+            dict: {'name', 'image_name', 'image' (bytes or None), 'yolo' (str), 'xml' (bytes)}
+        """
+        return {
+            'name': name,
+            'image_name': self.pages[name]['image_name'],
+            'image': self.read_member(name, 'image'),
+            'yolo': self.read_member(name, 'yolo').decode("utf-8"),
+            'xml': self.read_member(name, 'xml')
+        }
+    
+    def __iter__(self):
+        """Iterate over the pages in shard order"""
+        return (self.get_page(name) for name in self.pages)
+    
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def find_shards(shard_dir=SHARD_DIR):
+    """Paths of all complete shards (those with an index), sorted by name"""
+    return sorted(
+        path for path in glob.glob(os.path.join(shard_dir, "*.tar"))
+        if os.path.exists(get_index_path(path))
+    )
+
+def unpack_shard(shard_path, output_dir="."):
+    """
+    Write the pages of a shard back as images/, labels/ and xml_labels/ files
+    Returns:
+        int: Number of pages unpacked
+    """
+    with ShardReader(shard_path) as reader:
+        for kind in MEMBER_DIRS.values():
+            os.makedirs(os.path.join(output_dir, kind), exist_ok=True)
+        
+        for name, page in reader.pages.items():
+            for kind, filename in (('image', page['image_name']), ('yolo', f"{name}.txt"), ('xml', f"{name}.xml")):
+                data = reader.read_member(name, kind)
+                if data is None:
+                    continue
+                with open(os.path.join(output_dir, MEMBER_DIRS[kind], filename), "wb") as f:
+                    f.write(data)
+        return len(reader)
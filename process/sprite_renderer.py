@@ -0,0 +1,87 @@
+from collections import OrderedDict
+import numpy as np
+from PIL import Image, ImageDraw
+
+class SpriteRenderer:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """
+        Render each (font file, font size, word) once and blit it onto pages
+        A sprite is the word's grayscale coverage mask, i.e. exactly the mask
+        ImageDraw.text blends onto the page. Blitting uses Pillow's own integer
+        blend, so pages are pixel-identical to drawing every word with draw.text.
+        Args:
+            max_bytes: Memory bound of the cached masks, evicted LRU first
+        """
+        self.max_bytes = max_bytes
+        self.sprites = OrderedDict()  # (font_path, font_size, word) -> (offsets, inverse mask)
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        
+        # Scratch surface for measuring words when no metrics cache is used
+        self.draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    
+    def new_page(self, image_width, image_height):
+        """Return a blank white single-channel page buffer"""
+        return np.full((image_height, image_width), 255, dtype=np.uint8)
+    
+    def get_sprite(self, word, font, font_path, font_size):
+        """
+        Get the cached sprite of a word, rendering it on a miss
+        Returns:
+            tuple: ((left, top) offsets, uint16 array of 255 - coverage)
+        """
+        key = (font_path, font_size, word)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return sprite
+        
+        self.misses += 1
+        left, top, right, bottom = self.draw.textbbox((0, 0), word, font=font)
+        
+        # Drawing white on black yields the coverage mask itself
+        mask = Image.new("L", (max(right - left, 0), max(bottom - top, 0)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), word, font=font, fill=255)
+        
+        # Store 255 - coverage, the factor every page pixel is scaled by
+        inverse = 255 - np.asarray(mask, dtype=np.uint16)
+        sprite = ((left, top), inverse)
+        
+        self.sprites[key] = sprite
+        self.cached_bytes += inverse.nbytes
+        while self.cached_bytes > self.max_bytes and len(self.sprites) > 1:
+            _, (_, evicted) = self.sprites.popitem(last=False)
+            self.cached_bytes -= evicted.nbytes
+        
+        return sprite
+    
+    def draw_word(self, page, xy, word, font, font_path, font_size):
+        """
+        Blit a black word onto the page at xy, like draw.text(xy, word, fill=0)
+        Args:
+            page: uint8 page buffer from new_page
+            xy: Draw origin of the word
+            word: Word to draw
+            font: FreeTypeFont used to render the sprite on a miss
+            font_path: Path of the font file (part of the key)
+            font_size: Size of the font (part of the key)
+        """
+        (left, top), inverse = self.get_sprite(word, font, font_path, font_size)
+        x0, y0 = xy[0] + left, xy[1] + top
+        x1, y1 = x0 + inverse.shape[1], y0 + inverse.shape[0]
+        
+        # Clip to the page like ImageDraw does
+        page_height, page_width = page.shape
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, page_width), min(y1, page_height)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+        
+        region = page[cy0:cy1, cx0:cx1]
+        factor = inverse[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+        
+        # Pillow's BLEND with black ink: DIV255(pixel * (255 - coverage))
+        tmp = region * factor + 128
+        region[:] = ((tmp >> 8) + tmp) >> 8
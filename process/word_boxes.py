@@ -0,0 +1,109 @@
+import numpy as np
+
+class WordBoxes:
+    def __init__(self, bboxes, line_ids, paragraph_ids, text_ids, vocab):
+        """
+        Columnar word boxes of a page
+        One row per placed word, in reading order. Instead of one dict per
+        word, boxes, line and paragraph ids live in NumPy arrays and the words
+        are a text index into a vocabulary: for a corpus window that is the
+        corpus vocabulary itself, so no strings are copied per page.
+        Iterating (or indexing) yields the usual word box dictionaries
+        ('text', 'bbox', 'line_id', 'paragraph_id') for older callers.
+        Args:
+            bboxes: int array (n, 4) of (xmin, ymin, xmax, ymax)
+            line_ids: int array (n,) of line ids
+            paragraph_ids: int array (n,) of paragraph ids
+            text_ids: int array (n,) indexing vocab
+            vocab: Sequence of word strings
+        """
+        self.bboxes = np.asarray(bboxes, dtype=np.int32).reshape(-1, 4)
+        self.line_ids = np.asarray(line_ids, dtype=np.int32)
+        self.paragraph_ids = np.asarray(paragraph_ids, dtype=np.int32)
+        self.text_ids = np.asarray(text_ids, dtype=np.int64)
+        self.vocab = vocab
+    
+    @classmethod
+    def from_layout(cls, words, layout, paragraph_id=1):
+        """
+        Word boxes of the words placed by layout_page
+        Args:
+            words: CorpusWindow or list of words the layout was computed for
+            layout: Layout dict from layout_page
+            paragraph_id: Paragraph id of every word
+        """
+        n = layout['words_used']
+        bboxes = np.stack([layout['xmin'], layout['ymin'], layout['xmax'], layout['ymax']], axis=1)
+        if hasattr(words, 'ids') and hasattr(words, 'vocab'):
+            # Corpus window: its token ids already index the vocabulary
+            text_ids, vocab = words.ids[:n], words.vocab
+        else:
+            text_ids, vocab = np.arange(n), [words[i] for i in range(n)]
+        return cls(bboxes, layout['line_id'], np.full(n, paragraph_id), text_ids, vocab)
+    
+    @classmethod
+    def from_dicts(cls, word_boxes):
+        """Build from a list of word box dictionaries"""
+        if isinstance(word_boxes, cls):
+            return word_boxes
+        word_boxes = list(word_boxes)
+        return cls(
+            [word_data['bbox'] for word_data in word_boxes],
+            [word_data['line_id'] for word_data in word_boxes],
+            [word_data['paragraph_id'] for word_data in word_boxes],
+            np.arange(len(word_boxes)),
+            [word_data['text'] for word_data in word_boxes]
+        )
+    
+    def __len__(self):
+        return len(self.bboxes)
+    
+    @property
+    def texts(self):
+        """Words of the rows, as a list"""
+        vocab = self.vocab
+        return [vocab[text_id] for text_id in self.text_ids.tolist()]
+    
+    def __getitem__(self, index):
+        return {
+            'text': self.vocab[int(self.text_ids[index])],
+            'bbox': tuple(self.bboxes[index].tolist()),
+            'line_id': int(self.line_ids[index]),
+            'paragraph_id': int(self.paragraph_ids[index])
+        }
+    
+    def __iter__(self):
+        return iter(self.to_dicts())
+    
+    def to_dicts(self):
+        """List of word box dictionaries, as returned before the columnar layout"""
+        return [
+            {
+                'text': text,
+                'bbox': tuple(bbox),
+                'line_id': line_id,
+                'paragraph_id': paragraph_id
+            }
+            for text, bbox, line_id, paragraph_id in zip(
+                self.texts, self.bboxes.tolist(), self.line_ids.tolist(), self.paragraph_ids.tolist()
+            )
+        ]
+    
+    def reading_order(self):
+        """
+        Rows sorted by paragraph, then line, keeping word order within a line
+        Returns self when the rows are already in that order.
+        """
+        para_step = np.diff(self.paragraph_ids)
+        line_step = np.diff(self.line_ids)
+        if not np.any((para_step < 0) | ((para_step == 0) & (line_step < 0))):
+            return self
+        order = np.lexsort((self.line_ids, self.paragraph_ids))
+        return WordBoxes(
+            self.bboxes[order], self.line_ids[order], self.paragraph_ids[order],
+            self.text_ids[order], self.vocab
+        )
+    
+    def nbytes(self):
+        """Bytes held by the columns (the shared vocabulary excluded)"""
+        return self.bboxes.nbytes + self.line_ids.nbytes + self.paragraph_ids.nbytes + self.text_ids.nbytes
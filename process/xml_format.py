@@ -1,6 +1,20 @@
+import io
 import os
 import xml.etree.ElementTree as ET
 from process.config import OUTPUT_XML_DIR
+from process.word_boxes import WordBoxes
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+def escape_text(text):
+    """Escape element text exactly like ElementTree"""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
 
 class XmlFormatter:
     @staticmethod
@@ -8,12 +22,75 @@ class XmlFormatter:
         """
         Generate XML format label file
         Args:
-            word_boxes: List of word box dictionaries
+            word_boxes: WordBoxes or list of word box dictionaries
             image_name: Name of the image file
             filename: Base filename (without extension)
             image_width: Width of the image
             image_height: Height of the image
         """
+        xml_data = XmlFormatter.format_xml_label(word_boxes, image_name, image_width, image_height)
+        
+        # Write XML file
+        xml_path = os.path.join(OUTPUT_XML_DIR, f"{filename}.xml")
+        with open(xml_path, "wb") as f:
+            f.write(xml_data)
+        
+        return xml_path
+    
+    @staticmethod
+    def format_xml_label(word_boxes, image_name, image_width, image_height):
+        """
+        Serialise the XML label of a page
+        Streams the document in one pass over the word box columns, which the
+        generator already fills in paragraph and line order, without building
+        an element tree. The bytes are identical to format_xml_label_etree.
+        Args:
+            word_boxes: WordBoxes or list of word box dictionaries
+        Returns:
+            bytes: UTF-8 XML document, as written by generate_xml_label
+        """
+        # Same grouping as the tree builder: by paragraph, then line, words in order
+        word_boxes = WordBoxes.from_dicts(word_boxes).reading_order()
+        
+        # Empty text is written as a self-closing element, like ElementTree
+        parts = [
+            XML_DECLARATION,
+            f"<metadata>\n<image>{escape_text(image_name)}</image>" if image_name else "<metadata>\n<image />",
+            "\n<width>", str(image_width),
+            "</width>\n<height>", str(image_height), "</height>"
+        ]
+        current_para = current_line = None
+        for text, (xmin, ymin, xmax, ymax), line_id, para_id in zip(
+            word_boxes.texts, word_boxes.bboxes.tolist(),
+            word_boxes.line_ids.tolist(), word_boxes.paragraph_ids.tolist()
+        ):
+            if para_id != current_para:
+                if current_para is not None:
+                    parts.append("\n</line>\n</paragraph>")
+                parts.append(f'\n<paragraph id="{para_id}">' if para_id > 0 else "\n<paragraph>")
+                current_para, current_line = para_id, None
+            if line_id != current_line:
+                if current_line is not None:
+                    parts.append("\n</line>")
+                parts.append(f'\n<line id="{line_id}">')
+                current_line = line_id
+            
+            parts.append(
+                f'\n<word>\n<text>{escape_text(text)}</text>' if text else "\n<word>\n<text />"
+            )
+            parts.append(f'\n<bbox x1="{xmin}" y1="{ymin}" x2="{xmax}" y2="{ymax}" />\n</word>')
+        
+        if current_para is not None:
+            parts.append("\n</line>\n</paragraph>")
+        parts.append("\n</metadata>")
+        return "".join(parts).encode("utf-8")
+    
+    @staticmethod
+    def format_xml_label_etree(word_boxes, image_name, image_width, image_height):
+        """
+        Reference serialisation with ElementTree and ET.indent
+        Slower; kept to check format_xml_label against (see benchmark.py).
+        """
         # Create root element
         root = ET.Element("metadata")
         ET.SubElement(root, "image").text = image_name
@@ -54,10 +131,9 @@ class XmlFormatter:
                     bbox_elem.set("x2", str(int(xmax)))
                     bbox_elem.set("y2", str(int(ymax)))
         
-        # Write XML file
         tree = ET.ElementTree(root)
         ET.indent(tree, space="", level=0)  # Python 3.9+
-        xml_path = os.path.join(OUTPUT_XML_DIR, f"{filename}.xml")
-        tree.write(xml_path, encoding="utf-8", xml_declaration=True)
+        buffer = io.BytesIO()
+        tree.write(buffer, encoding="utf-8", xml_declaration=True)
         
-        return xml_path
\ No newline at end of file
+        return buffer.getvalue()
\ No newline at end of file
@@ -1,5 +1,9 @@
 import os
+import numpy as np
 from process.config import OUTPUT_YOLO_DIR
+from process.word_boxes import WordBoxes
+
+YOLO_LINE_FORMAT = "0 %.6f %.6f %.6f %.6f"
 
 class YoloFormatter:
     @staticmethod
@@ -7,28 +11,39 @@ class YoloFormatter:
         """
         Generate YOLO format label file
         Args:
-            word_boxes: List of word box dictionaries
+            word_boxes: WordBoxes or list of word box dictionaries
             filename: Base filename (without extension)
             image_width: Width of the image
             image_height: Height of the image
         """
-        yolo_lines = []
-        
-        for word_data in word_boxes:
-            xmin, ymin, xmax, ymax = word_data['bbox']
-            
-            # Convert to YOLO format (normalized center x, center y, width, height)
-            x_center = ((xmin + xmax) / 2) / image_width
-            y_center = ((ymin + ymax) / 2) / image_height
-            width = (xmax - xmin) / image_width
-            height = (ymax - ymin) / image_height
-            
-            # Class 0 for all words
-            yolo_lines.append(f"0 {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}")
-        
         # Write YOLO label file
         yolo_path = os.path.join(OUTPUT_YOLO_DIR, f"{filename}.txt")
         with open(yolo_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(yolo_lines))
+            f.write(YoloFormatter.format_yolo_label(word_boxes, image_width, image_height))
+        
+        return yolo_path
+    
+    @staticmethod
+    def format_yolo_label(word_boxes, image_width, image_height):
+        """
+        Build the YOLO label of a page
+        All boxes are normalised in one NumPy operation and formatted with a
+        single string format over the whole page.
+        Args:
+            word_boxes: WordBoxes or list of word box dictionaries
+        Returns:
+            str: One "class x_center y_center width height" line per word
+        """
+        bboxes = WordBoxes.from_dicts(word_boxes).bboxes.astype(np.float64)
+        if not len(bboxes):
+            return ""
+        
+        # Convert to YOLO format (normalized center x, center y, width, height)
+        yolo = np.empty_like(bboxes)
+        yolo[:, 0] = (bboxes[:, 0] + bboxes[:, 2]) / 2 / image_width
+        yolo[:, 1] = (bboxes[:, 1] + bboxes[:, 3]) / 2 / image_height
+        yolo[:, 2] = (bboxes[:, 2] - bboxes[:, 0]) / image_width
+        yolo[:, 3] = (bboxes[:, 3] - bboxes[:, 1]) / image_height
         
-        return yolo_path
\ No newline at end of file
+        # Class 0 for all words
+        return "\n".join([YOLO_LINE_FORMAT] * len(yolo)) % tuple(yolo.ravel().tolist())
@@ -0,0 +1,189 @@
+import shutil
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from process.evaluation import match_predictions
+from process.inference import letterbox, OnnxDetector, UltralyticsDetector, LETTERBOX_COLOR
+
+PAGE_SIZES = [(794, 1123), (1123, 794), (640, 640), (301, 97), (2480, 3508)]
+MODEL_IMAGE_SIZE = 320
+MODEL_CONF = 0.0      # A randomly initialised model scores every anchor low
+PARITY_IOU = 0.9      # Boxes of the two backends must overlap at least this much
+PARITY_MIN_MATCH = 0.95
+
+def make_onnx_detector(image_size=640, stride=0, conf=0.25, iou=0.7, max_det=300):
+    """OnnxDetector without a session: only pre- and post-processing are run"""
+    detector = object.__new__(OnnxDetector)
+    detector.image_size = image_size
+    detector.stride = stride
+    detector.input_dtype = np.float32
+    detector.conf = conf
+    detector.iou = iou
+    detector.max_det = max_det
+    return detector
+
+def make_word_boxes(rng, width, height, count):
+    """Non-overlapping word boxes laid out in lines, like a generated page"""
+    columns = int(np.ceil(np.sqrt(count)))
+    cell_width, cell_height = width / columns, height / columns
+    cells = np.arange(count)
+    x1 = cells % columns * cell_width + rng.uniform(0, 0.2, count) * cell_width
+    y1 = cells // columns * cell_height + rng.uniform(0, 0.2, count) * cell_height
+    x2 = x1 + rng.uniform(0.3, 0.7, count) * cell_width
+    y2 = y1 + rng.uniform(0.3, 0.7, count) * cell_height
+    return np.stack([x1, y1, x2, y2], axis=1)
+
+def encode_output(boxes, scores):
+    """Raw single-class model output (5, anchors) of boxes in letterbox pixels"""
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    sizes = boxes[:, 2:] - boxes[:, :2]
+    return np.concatenate([centers.T, sizes.T, scores[None]]).astype(np.float32)
+
+def render_page(width, height, seed):
+    """BGR page with rows of dark word-like blocks"""
+    rng = np.random.default_rng(seed)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for y in range(20, height - 30, 30):
+        x = 20
+        while x < width - 60:
+            word_width = int(rng.integers(15, 60))
+            draw.rectangle((x, y, x + word_width, y + 16), fill=int(rng.integers(0, 80)))
+            x += word_width + int(rng.integers(8, 20))
+    return np.repeat(np.asarray(image)[..., None], 3, axis=2)
+
+@pytest.mark.parametrize("width, height", PAGE_SIZES)
+@pytest.mark.parametrize("stride", [0, 32])
+def test_letterbox_round_trip(width, height, stride):
+    page = np.zeros((height, width, 3), dtype=np.uint8)
+    boxed, gain, (pad_x, pad_y) = letterbox(page, 640, stride)
+    boxed_height, boxed_width = boxed.shape[:2]
+    if stride:
+        assert boxed_height % stride == 0 and boxed_width % stride == 0
+        assert max(boxed_height, boxed_width) == 640
+    else:
+        assert (boxed_height, boxed_width) == (640, 640)
+    
+    # The page lands at the padding offset, surrounded by letterbox gray
+    content = np.argwhere(boxed[..., 0] != LETTERBOX_COLOR)
+    top, left = content.min(axis=0)
+    bottom, right = content.max(axis=0) + 1
+    assert (left, top) == (pad_x, pad_y)
+    assert (right - left, bottom - top) == (round(width * gain), round(height * gain))
+    
+    # Page corners map onto the content corners and back
+    corners = np.array([0, 0, width, height], dtype=np.float64)
+    mapped = corners * gain + np.array([pad_x, pad_y, pad_x, pad_y])
+    assert np.abs(mapped - np.array([left, top, right, bottom])).max() <= 0.5
+    restored = (np.array([left, top, right, bottom]) - np.array([pad_x, pad_y, pad_x, pad_y])) / gain
+    assert np.abs(restored - corners).max() <= 0.5 / gain
+
+@pytest.mark.parametrize("width, height", PAGE_SIZES)
+@pytest.mark.parametrize("stride", [0, 32])
+def test_decode_round_trip(width, height, stride):
+    rng = np.random.default_rng(width * height + stride)
+    detector = make_onnx_detector(stride=stride)
+    _, gain, (pad_x, pad_y) = letterbox(np.zeros((height, width, 3), dtype=np.uint8), 640, stride)
+    pad = np.array([pad_x, pad_y, pad_x, pad_y])
+    
+    gt_boxes = make_word_boxes(rng, width, height, 150)
+    gt_scores = rng.uniform(0.5, 1.0, len(gt_boxes))
+    model_boxes = gt_boxes * gain + pad
+    # Shifted duplicates for NMS to remove, and background anchors under conf
+    duplicates = model_boxes + rng.uniform(-0.3, 0.3, model_boxes.shape)
+    background = make_word_boxes(rng, 640, 640, 400)
+    output = np.concatenate([
+        encode_output(model_boxes, gt_scores),
+        encode_output(duplicates, gt_scores * 0.5),
+        encode_output(background, rng.uniform(0, detector.conf, len(background)))
+    ], axis=1)
+    output = output[:, rng.permutation(output.shape[1])]
+    
+    boxes, scores = detector.postprocess(output, gain, (pad_x, pad_y), width, height)
+    order = np.argsort(-gt_scores)
+    assert len(boxes) == len(gt_boxes)
+    np.testing.assert_allclose(scores, gt_scores[order], rtol=1e-6)
+    np.testing.assert_allclose(boxes, gt_boxes[order], atol=0.02)
+    assert match_predictions(gt_boxes, boxes).all()
+
+def test_decode_clips_and_limits():
+    detector = make_onnx_detector(max_det=2)
+    _, gain, pad = letterbox(np.zeros((400, 800, 3), dtype=np.uint8), 640)
+    # The first box reaches into the padding above the page
+    model_boxes = np.array([[10, pad[1] - 20, 50, pad[1] + 10], [100, 300, 150, 320], [200, 300, 260, 330]], float)
+    output = encode_output(model_boxes, np.array([0.9, 0.8, 0.3]))
+    
+    boxes, scores = detector.postprocess(output, gain, pad, 800, 400)
+    np.testing.assert_allclose(scores, [0.9, 0.8])
+    assert boxes[0, 1] == 0
+    assert (boxes[:, 0::2] <= 800).all() and (boxes[:, 1::2] <= 400).all()
+
+def test_preprocess_layout():
+    detector = make_onnx_detector(stride=32)
+    page = np.zeros((290, 500, 3), dtype=np.uint8)
+    page[..., 0], page[..., 1], page[..., 2] = 10, 20, 30  # BGR
+    
+    tensor, transforms = detector.preprocess([page, page])
+    assert tensor.dtype == np.float32 and tensor.flags.c_contiguous
+    assert tensor.shape == (2, 3, 384, 640)
+    gain, (pad_x, pad_y) = transforms[0]
+    assert gain == pytest.approx(640 / 500) and pad_y > 0
+    # RGB channel order, scaled to [0, 1], letterbox gray in the padding
+    np.testing.assert_allclose(tensor[0, :, pad_y + 10, 10], np.array([30, 20, 10]) / 255, rtol=1e-6)
+    np.testing.assert_allclose(tensor[1, :, 0, 0], LETTERBOX_COLOR / 255, rtol=1e-6)
+
+@pytest.fixture(scope="module")
+def tiny_models(tmp_path_factory):
+    """A randomly initialised one-class YOLOv8n, as .pt and as dynamic and fixed-size .onnx"""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("ultralytics")
+    import yaml
+    from ultralytics import YOLO
+    from ultralytics.nn.tasks import yaml_model_load
+    
+    directory = tmp_path_factory.mktemp("models")
+    config = yaml_model_load("yolov8n.yaml")
+    config['nc'] = 1
+    config_path = directory / "yolov8n.yaml"
+    config_path.write_text(yaml.safe_dump(config))
+    
+    torch.manual_seed(0)
+    pt_path = str(directory / "tiny.pt")
+    YOLO(str(config_path)).save(pt_path)
+    dynamic_path = shutil.move(
+        YOLO(pt_path).export(format="onnx", imgsz=MODEL_IMAGE_SIZE, dynamic=True, simplify=False),
+        str(directory / "tiny_dynamic.onnx")
+    )
+    static_path = YOLO(pt_path).export(format="onnx", imgsz=MODEL_IMAGE_SIZE, simplify=False)
+    return pt_path, dynamic_path, static_path
+
+@pytest.mark.parametrize("width, height", [(500, 300), (300, 520)])
+def test_onnx_matches_ultralytics(tiny_models, width, height):
+    pt_path, dynamic_path, _ = tiny_models
+    pages = [render_page(width, height, seed) for seed in range(3)]
+    reference = UltralyticsDetector(pt_path, MODEL_IMAGE_SIZE, conf=MODEL_CONF, device="cpu").predict(pages)
+    detector = OnnxDetector(dynamic_path, MODEL_IMAGE_SIZE, conf=MODEL_CONF)
+    assert detector.stride == 32 and detector.fixed_batch is None
+    
+    for (reference_boxes, _), (boxes, scores) in zip(reference, detector.predict(pages)):
+        assert len(boxes)
+        assert abs(len(boxes) - len(reference_boxes)) <= (1 - PARITY_MIN_MATCH) * len(reference_boxes)
+        order = np.argsort(-scores, kind="stable")
+        matched = match_predictions(reference_boxes, boxes[order], np.array([PARITY_IOU]))
+        assert matched.mean() >= PARITY_MIN_MATCH
+
+def test_fixed_size_model(tiny_models):
+    _, _, static_path = tiny_models
+    detector = OnnxDetector(static_path, image_size=640, conf=MODEL_CONF, max_det=50)
+    assert detector.image_size == MODEL_IMAGE_SIZE and detector.stride == 0
+    assert detector.fixed_batch == 1
+    
+    pages = [render_page(500, 300, seed) for seed in range(3)]
+    results = detector.predict(pages)
+    assert len(results) == len(pages)
+    for boxes, scores in results:
+        assert 0 < len(boxes) <= 50
+        assert (np.diff(scores) <= 0).all()
+        assert (boxes >= 0).all() and (boxes[:, 0::2] <= 500).all() and (boxes[:, 1::2] <= 300).all()
@@ -0,0 +1,77 @@
+import os
+import random
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from process.image_processing import ImageGenerator
+from process.random_fonts import FontManager
+from process.sprite_renderer import SpriteRenderer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONTS = [
+    os.path.join(REPO_ROOT, "fonts", name)
+    for name in ("KhmerDigital-Regular.ttf", "KhmerDigital-Black.ttf", "KhmerDigital-Thin.ttf", "KhmerDigitalMax.ttf")
+]
+FONT_SIZES = [9, 16, 27]
+WORDS = ["កម្ពុជា", "ភាសាខ្មែរ", "ព្រះរាជាណាចក្រ", "ស្ត្រី", "123", "Word", "។"]
+
+@pytest.fixture
+def repo_dir(monkeypatch):
+    """FontManager reads FONT_DIR relative to the repository root"""
+    monkeypatch.chdir(REPO_ROOT)
+
+@pytest.mark.parametrize("font_path", FONTS)
+@pytest.mark.parametrize("font_size", FONT_SIZES)
+@pytest.mark.parametrize("background", [255, 200, 97])
+def test_sprites_match_draw_text(font_path, font_size, background):
+    font = ImageFont.truetype(font_path, font_size)
+    renderer = SpriteRenderer()
+    rng = random.Random(font_size * 1000 + background)
+    width, height = 160, 90
+    
+    expected = Image.new("L", (width, height), background)
+    draw = ImageDraw.Draw(expected)
+    page = np.full((height, width), background, dtype=np.uint8)
+    
+    # Random positions overlap words and clip them at every page edge;
+    # each word is drawn twice so that the second one is a cache hit
+    for word in WORDS * 2:
+        xy = (rng.randint(-40, width - 10), rng.randint(-20, height - 5))
+        draw.text(xy, word, font=font, fill=0)
+        renderer.draw_word(page, xy, word, font, font_path, font_size)
+    
+    assert (page < background).any()
+    np.testing.assert_array_equal(page, np.asarray(expected))
+    assert renderer.hits >= len(WORDS)
+
+def test_eviction_keeps_output_identical():
+    font_path = FONTS[0]
+    font = ImageFont.truetype(font_path, 16)
+    renderer = SpriteRenderer(max_bytes=1)
+    
+    expected = Image.new("L", (200, 40), 255)
+    draw = ImageDraw.Draw(expected)
+    page = renderer.new_page(200, 40)
+    for i, word in enumerate(WORDS * 2):
+        draw.text((i * 13, 5), word, font=font, fill=0)
+        renderer.draw_word(page, (i * 13, 5), word, font, font_path, 16)
+    
+    np.testing.assert_array_equal(page, np.asarray(expected))
+    assert len(renderer.sprites) == 1
+
+@pytest.mark.parametrize("color_mode", ["RGB", "L", "1"])
+@pytest.mark.parametrize("font_size", [12, 22])
+def test_generated_pages_match(repo_dir, color_mode, font_size):
+    font_manager = FontManager(verbose=False)
+    draw_generator = ImageGenerator(font_manager, render_engine="draw", color_mode=color_mode)
+    sprite_generator = ImageGenerator(font_manager, render_engine="sprite", color_mode=color_mode)
+    words = [random.Random(i).choice(WORDS) for i in range(400)]
+    
+    for font_path in font_manager.get_all_fonts()[:3]:
+        expected = draw_generator.generate_image(words, font_path, font_size, random.Random(7), (600, 400))
+        actual = sprite_generator.generate_image(words, font_path, font_size, random.Random(7), (600, 400))
+        
+        assert actual[0].shape == expected[0].shape
+        np.testing.assert_array_equal(actual[0], expected[0])
+        assert actual[2] == expected[2]
+        np.testing.assert_array_equal(actual[1].bboxes, expected[1].bboxes)
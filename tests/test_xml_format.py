@@ -0,0 +1,57 @@
+import random
+import pytest
+from process.word_boxes import WordBoxes
+from process.xml_format import XmlFormatter
+
+# Khmer, Latin, markup characters, quotes, whitespace and characters outside the BMP
+TEXTS = ["", " ", "កម្ពុជា", "ស្ត្រី", "word", "a&b", "<tag>", "x > y", "&amp;", "\"quoted\"",
+         "it's", "tab\there", "line\nbreak", "១២៣", "🙂", "]]>", "​"]
+IMAGE_NAMES = ["", "page_1.png", "ឯកសារ 1.png", "a&b<c>.jpg", "\"name\" 'x'.webp", "dir/sub name.png"]
+
+def random_page(rng):
+    """Word box dicts of a random page, in generator order"""
+    word_boxes = []
+    for para_id in range(rng.choice([0, 1]), rng.randint(1, 4)):
+        for line_id in range(1, rng.randint(2, 6)):
+            for _ in range(rng.randint(1, 8)):
+                x1, y1 = rng.randint(-5, 800), rng.randint(-5, 1100)
+                word_boxes.append({
+                    'text': rng.choice(TEXTS) + rng.choice(TEXTS),
+                    'bbox': (x1, y1, x1 + rng.randint(0, 120), y1 + rng.randint(0, 40)),
+                    'line_id': line_id,
+                    'paragraph_id': para_id
+                })
+    return word_boxes
+
+@pytest.mark.parametrize("seed", range(200))
+def test_streamed_xml_matches_etree(seed):
+    rng = random.Random(seed)
+    word_boxes = random_page(rng)
+    image_name = rng.choice(IMAGE_NAMES)
+    width, height = rng.randint(1, 3000), rng.randint(1, 3000)
+    
+    expected = XmlFormatter.format_xml_label_etree(word_boxes, image_name, width, height)
+    assert XmlFormatter.format_xml_label(word_boxes, image_name, width, height) == expected
+    assert XmlFormatter.format_xml_label(WordBoxes.from_dicts(word_boxes), image_name, width, height) == expected
+
+@pytest.mark.parametrize("seed", range(20))
+def test_words_out_of_order(seed):
+    rng = random.Random(seed)
+    word_boxes = random_page(rng)
+    rng.shuffle(word_boxes)
+    
+    # The tree builder groups by paragraph and line but keeps the word order
+    expected = XmlFormatter.format_xml_label_etree(word_boxes, "page.png", 794, 1123)
+    assert XmlFormatter.format_xml_label(word_boxes, "page.png", 794, 1123) == expected
+
+@pytest.mark.parametrize("image_name", IMAGE_NAMES)
+def test_empty_page(image_name):
+    expected = XmlFormatter.format_xml_label_etree([], image_name, 794, 1123)
+    assert XmlFormatter.format_xml_label([], image_name, 794, 1123) == expected
+    assert XmlFormatter.format_xml_label(WordBoxes.from_dicts([]), image_name, 794, 1123) == expected
+
+def test_empty_elements_are_self_closing():
+    word_boxes = [{'text': "", 'bbox': (1, 2, 3, 4), 'line_id': 1, 'paragraph_id': 1}]
+    data = XmlFormatter.format_xml_label(word_boxes, "", 10, 20).decode("utf-8")
+    assert "<image />" in data
+    assert "<text />" in data
@@ -0,0 +1,42 @@
+import os
+import argparse
+from process.config import SHARD_DIR
+from process.shards import find_shards, unpack_shard
+
+def main(shard_paths, output_dir):
+    """
+    Unpack shards back into images/, labels/ and xml_labels/
+    Args:
+        shard_paths: Shards to unpack
+        output_dir: Directory receiving the three folders
+    """
+    print("=" * 70)
+    print("SHARD UNPACKER")
+    print("=" * 70)
+    
+    if not shard_paths:
+        print("No complete shards found.")
+        return
+    
+    total_pages = 0
+    for i, shard_path in enumerate(shard_paths, 1):
+        pages = unpack_shard(shard_path, output_dir)
+        total_pages += pages
+        print(f"  [{i}/{len(shard_paths)}] {os.path.basename(shard_path)}: {pages} pages")
+    
+    print(f"\nUnpacked {total_pages} pages from {len(shard_paths)} shard(s) into {os.path.abspath(output_dir)}")
+
+def parse_args():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Unpack generated shards into loose image and label files")
+    parser.add_argument("shards", nargs="*",
+                        help="shard .tar files (default: all complete shards in --shard-dir)")
+    parser.add_argument("--shard-dir", default=SHARD_DIR,
+                        help=f"directory of the shards (default: {SHARD_DIR})")
+    parser.add_argument("--output-dir", default=".",
+                        help="directory receiving images/, labels/ and xml_labels/ (default: .)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.shards or find_shards(args.shard_dir), args.output_dir)